@@ -4,11 +4,12 @@ Module for some management needs.
 import asyncio
 import pathlib
 import json
+import time
 from datetime import datetime, timedelta
-from typing import List, Union, AsyncGenerator, Tuple
+from typing import Awaitable, List, Union, AsyncGenerator, Dict, AsyncIterator, Optional, Set
 
+from discord.ext import tasks
 from discord.ext.commands import Context, Cog, Bot, command
-from discord.ext.commands.errors import CommandInvokeError
 from discord import (
     Embed,
     Color,
@@ -23,17 +24,29 @@ from discord import (
     Interaction,
     ButtonClick,
     TextChannel,
+    Object,
+    RawMessageDeleteEvent,
+    RawBulkMessageDeleteEvent,
 )
+from discord.utils import time_snowflake, snowflake_time
 from loguru import logger
 
 from .. import CogRepresentation
+from ..message_index import MessageIndex, open_index, get_index, close_index
+from .purge_jobs import PurgeJob, PurgeJobs
 
 
-config_path = pathlib.Path(__file__).parent.joinpath("config.json")
+ROOT = pathlib.Path(__file__).parent
+config_path = ROOT.joinpath("config.json")
 config = json.loads(config_path.read_text())
 
 command_whitelist_roles: List[int]
 log_channel: int
+purge_scanners: int = 4
+purge_deleters: int = 2
+purge_max_retries: int = 5
+message_index: bool = False
+message_index_retention_days: int = 0
 
 locals().update(config)
 
@@ -95,91 +108,490 @@ def generate_target_embed(member: Member, reason: str):
     return embed
 
 
-async def purge(
-    guild: Guild, member: Member, reason: str, log_channel_id: Union[int, None] = None
-):
-    logger.info(f"Purging started for user id {member.id}")
+class PurgeIncomplete(Exception):
+    """
+    Some channels couldn't be scanned this run, job is checkpointed and can be resumed.
+    """
 
-    join_diff = datetime.utcnow() - member.joined_at
 
-    logger.info(f"Banned user id {member.id}")
+class PurgeEngine:
+    """
+    Finds and deletes all messages of a purge job's target in guild.
 
-    await guild.ban(member, reason=reason, delete_message_days=7)
+    Channels are scanned concurrently, found messages go to a queue consumed by deleter workers.
+    Messages younger than 14 days are deleted in bulk of up to 100, older ones one by one.
+    Each delete request is retried with backoff a bounded number of times.
+
+    If message index is given, channels it covers are looked up there instead of scanned.
+
+    Progress is written back to job on checkpoint(), so job can be resumed by new engine.
+    """
+
+    # discord refuses bulk delete for messages older than 14 days, keep some margin.
+    bulk_max_age = timedelta(days=13, hours=12)
+    bulk_size = 100
+
+    def __init__(self, guild: Guild, job: PurgeJob, index: Optional[MessageIndex] = None):
+        self.guild = guild
+        self.job = job
+        self.member_id = job.target_id
+        self.index = index
+
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.bulk_size * 10)
 
-    if join_diff.days >= 7:
+        # channel id: id of last scanned message
+        self.scan_pos: Dict[int, int] = {}
 
-        # if not user was in server longer than that. prepare to remove.
-        # prepare end time. a minor gap between utcnow at top and this one will be enough margin.
-        until_ = datetime.utcnow() - timedelta(days=7)
+        # channel id: {id of request: newest message id in it}, for queued requests not done yet.
+        self.in_flight: Dict[int, Dict[int, int]] = {}
 
-        logger.info("User was in server longer than 7 days. Purging older messages.")
+        self.scan_finished: Set[int] = set()
+        self.last_checkpoint = time.monotonic()
 
-        counter = 0
+    def cursor(self, channel_id: int) -> int:
+        """
+        Returns message id scan should continue below, so nothing not yet deleted is skipped.
+        """
+
+        in_flight = self.in_flight.get(channel_id)
+
+        if in_flight:
+            return max(in_flight.values()) + 1
 
         try:
-            async for message in chat_history_gen(guild, member.joined_at, until_):
-                if message.author == member:
-                    counter += 1
+            return self.scan_pos[channel_id]
+        except KeyError:
+            return self.job.cursors.get(channel_id, self.job.before_id)
+
+    def checkpoint(self):
+        """
+        Writes channel cursors and elapsed time to job.
+        """
+
+        for channel_id in self.scan_pos.keys() | self.in_flight.keys():
+            if channel_id in self.scan_finished and not self.in_flight.get(channel_id):
+                self.job.done_channels.add(channel_id)
+                self.job.cursors.pop(channel_id, None)
+            else:
+                self.job.cursors[channel_id] = self.cursor(channel_id)
+
+        now = time.monotonic()
+        self.job.elapsed += now - self.last_checkpoint
+        self.last_checkpoint = now
+
+    async def queue_messages(self, channel: TextChannel, messages: AsyncIterator[Message]):
+        """
+        Groups member's messages, yielded newest first, into delete requests and queues them.
+        """
+
+        in_flight = self.in_flight.setdefault(channel.id, {})
+
+        bulk: List[Message] = []
+        bulk_limit = datetime.utcnow() - self.bulk_max_age
+
+        try:
+            async for message in messages:
+                if message.created_at < bulk_limit:
+                    request = [message]
+                    in_flight[id(request)] = message.id
+
+                    await self.queue.put((channel, request))
+                    continue
+
+                if not bulk:
+                    in_flight[id(bulk)] = message.id
+
+                bulk.append(message)
+
+                if len(bulk) == self.bulk_size:
+                    await self.queue.put((channel, bulk))
+                    bulk = []
+
+        finally:
+            if bulk:
+                await self.queue.put((channel, bulk))
+
+    async def scan_channel(self, channel: TextChannel, after: int, before: int):
+        async def authored_gen():
+            async for message in channel.history(
+                after=Object(id=after), before=Object(id=before), limit=None, oldest_first=False
+            ):
+                self.job.scanned += 1
+                self.scan_pos[channel.id] = message.id
+
+                if message.author.id == self.member_id:
+                    yield message
+
+        await self.queue_messages(channel, authored_gen())
+
+    async def collect_channel(self, channel: TextChannel):
+        after = self.job.after_id
+        before = self.cursor(channel.id)
+
+        start = self.index.coverage_start(channel.id) if self.index else None
+
+        if start is not None and before > start:
+            ids = self.index.message_ids(self.guild.id, self.member_id, channel.id, after, before)
+            self.job.indexed += len(ids)
+
+            async def partial_gen():
+                for _, message_id in ids:
+                    self.scan_pos[channel.id] = message_id
+                    yield channel.get_partial_message(message_id)
+
+            await self.queue_messages(channel, partial_gen())
+
+            # index only knows messages since start, scan the part older than that.
+            before = self.scan_pos[channel.id] = max(start, after)
+
+        if before > after:
+            await self.scan_channel(channel, after, before)
+
+    async def delete(self, channel: TextChannel, messages: List[Message]):
+        for attempt in range(purge_max_retries):
+            try:
+                if len(messages) > 1:
+                    await channel.delete_messages(messages)
+                else:
+                    await messages[0].delete()
+
+            except errors.NotFound:
+                if len(messages) == 1:
+                    # already gone, good as deleted.
+                    self.job.deleted += 1
+                    return
+
+                # one of bulk is gone, fall back to one by one.
+                for message in messages:
+                    await self.delete(channel, [message])
+                return
+
+            except errors.Forbidden as err:
+                logger.critical("Bot has no permission to delete in '{}'.\nDetails: {}", channel.name, err)
+                break
+
+            except errors.HTTPException as err:
+                # discord.py already waits out rate limits, this is for 5xx and such.
+                delay = 0.5 * 2 ** attempt
+                logger.warning("Got {} deleting messages, retry in {}s.", err.status, delay)
+                await asyncio.sleep(delay)
+
+            else:
+                self.job.deleted += len(messages)
+                return
+
+        self.job.failed += len(messages)
+
+    async def delete_worker(self):
+        while True:
+            channel, messages = await self.queue.get()
+
+            try:
+                await self.delete(channel, messages)
+            except Exception as err:
+                # dead worker would leave run() waiting on queue forever, count it failed and go on.
+                logger.warning("Failed deleting {} message(s) in '{}': {!r}", len(messages), channel.name, err)
+                self.job.failed += len(messages)
+            finally:
+                self.queue.task_done()
+
+            # not reached when cancelled midway, so cursor stays before this request.
+            self.in_flight[channel.id].pop(id(messages), None)
+
+    @staticmethod
+    async def wait_with(awaitable: Awaitable, workers: List[asyncio.Task]):
+        """
+        Awaits given while watching delete workers, raising if one stops instead of waiting for it forever.
+        """
+
+        future = asyncio.ensure_future(awaitable)
+        done, _ = await asyncio.wait((future, *workers), return_when=asyncio.FIRST_COMPLETED)
+
+        if future in done:
+            return future.result()
+
+        future.cancel()
+
+        for worker in done:
+            worker.result()
 
-                    await asyncio.sleep(0.1)
+        raise RuntimeError("Purge delete worker stopped.")
 
+    async def run(self):
+        channels = [channel for channel in self.guild.text_channels if channel.id not in self.job.done_channels]
+        self.job.channels_total = len(self.guild.text_channels)
+
+        workers = [asyncio.create_task(self.delete_worker()) for _ in range(purge_deleters)]
+        semaphore = asyncio.Semaphore(purge_scanners)
+
+        async def guarded_scan(channel_: TextChannel):
+            async with semaphore:
+                for attempt in range(purge_max_retries):
                     try:
-                        await message.delete()
-                    except CommandInvokeError:
-                        while True:
-                            await asyncio.sleep(0.5)
-                            try:
-                                await message.delete()
-                            except CommandInvokeError:
-                                pass
-                            else:
-                                break
-
-        except errors.Forbidden as err:
-            logger.critical(f"Bot has no permission to perform task.\nDetails: {err}")
-            return
+                        await self.collect_channel(channel_)
 
-        logger.info(
-            f"Deleted {counter} message(s) sent by [{member.display_name}/{member.id}]"
-        )
+                    except errors.Forbidden:
+                        logger.warning("Cannot access to channel '{}' - ID: {}", channel_.name, channel_.id)
+
+                    except errors.HTTPException as err:
+                        # cursor keeps where scan got, so retry continues from there.
+                        delay = 0.5 * 2 ** attempt
+                        logger.warning("Got {} scanning '{}', retry in {}s.", err.status, channel_.name, delay)
+                        await asyncio.sleep(delay)
+                        continue
+
+                    self.scan_finished.add(channel_.id)
+                    return
+
+            logger.warning("Gave up scanning '{}' for this run.", channel_.name)
+
+        scans = [asyncio.ensure_future(guarded_scan(channel)) for channel in channels]
+
+        try:
+            await self.wait_with(asyncio.gather(*scans), workers)
+            await self.wait_with(self.queue.join(), workers)
+        finally:
+            # gather doesn't cancel other scans when one raises.
+            for task in (*scans, *workers):
+                task.cancel()
+
+            self.checkpoint()
+
+        unfinished = [channel.name for channel in channels if channel.id not in self.scan_finished]
+
+        if unfinished:
+            raise PurgeIncomplete(f"Could not scan {len(unfinished)} channel(s): {', '.join(unfinished)}")
+
+
+def progress_text(job: PurgeJob) -> str:
+    return (
+        f"Channels {len(job.done_channels)}/{job.channels_total} | Scanned {job.scanned} | Indexed {job.indexed} | "
+        f"Deleted {job.deleted} | Failed {job.failed} | {int(job.elapsed)}s"
+    )
+
+
+async def purge(guild: Guild, member: Member, reason: str, report_message: Message) -> Optional[PurgeJob]:
+    """
+    Bans member, removing last 7 days of messages.
+
+    :return: PurgeJob for older messages, None if member joined within 7 days.
+    """
+
+    logger.info(f"Purging started for user id {member.id}")
+
+    join_diff = datetime.utcnow() - member.joined_at
+
+    logger.info(f"Banned user id {member.id}")
+
+    await guild.ban(member, reason=reason, delete_message_days=7)
+
+    if join_diff.days < 7:
+        return None
+
+    # if not user was in server longer than that. prepare to remove.
+    # prepare end time. a minor gap between utcnow at top and this one will be enough margin.
+    until_ = datetime.utcnow() - timedelta(days=7)
+
+    logger.info("User was in server longer than 7 days. Queued purging older messages.")
+
+    return PurgeJob(
+        guild.id,
+        member.id,
+        member.display_name,
+        reason,
+        time_snowflake(member.joined_at),
+        time_snowflake(until_),
+        report_message.channel.id,
+        report_message.id,
+    )
+
+
+async def report_purge(guild: Guild, target_id: int, target_name: str, reason: str, days: int, result: str = ""):
+    """
+    Reports purge to log channel, if any.
+    """
 
     # If logging channel was not given, pass.
-    if not log_channel_id:
+    if not log_channel:
         return
 
     # else get channel
-    channel: TextChannel = guild.get_channel(log_channel_id)
+    channel: TextChannel = guild.get_channel(log_channel)
 
     if not channel:
-        logger.critical(f"No channel with id {log_channel_id} exists!")
+        logger.critical(f"No channel with id {log_channel} exists!")
         return
 
     # report to channel.
     embed = Embed(
         title=f"Purge report {datetime.utcnow()}",
-        description=f"User is banned, all messages for last {join_diff.days} day(s) were removed.",
+        description=f"User is banned, all messages for last {days} day(s) were removed.",
     )
 
     embed.timestamp = datetime.utcnow()
-    embed.add_field(name="User ID", value=f"{member.id}", inline=False)
-    embed.add_field(name="User Name", value=f"{member.display_name}", inline=False)
+    embed.add_field(name="User ID", value=f"{target_id}", inline=False)
+    embed.add_field(name="User Name", value=f"{target_name}", inline=False)
     embed.add_field(name="Reason", value=reason)
 
+    if result:
+        embed.add_field(name="Progress", value=result, inline=False)
+
     await channel.send(embed=embed)
 
 
 class PurgeCog(Cog):
+    report_interval = 5
+
+    # incomplete job is resumed after a while, up to this many times before giving up.
+    resume_delay = 60
+    max_resumes = 3
+
     def __init__(self, bot: Bot):
         self.bot = bot
 
         logger.info(f"[{type(self).__name__}] Init")
 
-        self.pending_purges: List[Tuple[int, int, Member]] = []
-        # Dict[target user id: purge issuer's id]
+        # nested in directory so module reload's file hashing doesn't pick it up.
+        self.jobs = PurgeJobs(ROOT.joinpath("cache", "purge_jobs.json"))
+        self.engine: Optional[PurgeEngine] = None
+        self.wakeup = asyncio.Event()
+
+        self.job_worker.start()
 
     def cog_unload(self):
         logger.info(f"[{type(self).__name__}] Unloading")
 
+        self.job_worker.cancel()
+
+        # save where running job got, next worker picks up from there.
+        if self.engine:
+            self.engine.checkpoint()
+
+        self.jobs.save()
+
+    @tasks.loop(count=1)
+    async def job_worker(self):
+        while True:
+            pending = self.jobs.pending()
+
+            if not pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            job = pending[0]
+
+            # worker must outlive any one job, or every queued job stalls until reload.
+            try:
+                await self.run_job(job)
+            except Exception as err:
+                logger.critical("Purge job for user id {} crashed: {}", job.target_id, err)
+
+                if not job.finished:
+                    job.error = job.error or f"{type(err).__name__}: {err}"
+                    job.finished = datetime.utcnow().isoformat()
+                    self.jobs.save()
+
+    @job_worker.before_loop
+    async def wait_ready(self):
+        await self.bot.wait_until_ready()
+
+    async def fetch_report_message(self, job: PurgeJob) -> Optional[Message]:
+        channel: TextChannel = self.bot.get_channel(job.report_channel_id)
+
+        try:
+            return await channel.fetch_message(job.report_message_id)
+        except (AttributeError, errors.HTTPException):
+            return None
+
+    async def report_progress(self, job: PurgeJob, message: Optional[Message]):
+        """
+        Saves job and keeps confirmation embed's footer updated with progress.
+        """
+
+        while True:
+            await asyncio.sleep(self.report_interval)
+
+            self.engine.checkpoint()
+            self.jobs.save()
+
+            if not message or not message.embeds:
+                continue
+
+            try:
+                await message.edit(embed=message.embeds[0].set_footer(text=f"Purging... {progress_text(job)}"))
+            except errors.HTTPException as err:
+                logger.warning("Failed to update purge progress: {}", err)
+
+    async def run_job(self, job: PurgeJob):
+        guild: Guild = self.bot.get_guild(job.guild_id)
+
+        if not guild:
+            logger.critical("Bot is not a part of guild {}, dropping purge job.", job.guild_id)
+
+            job.error = "Guild not found"
+            job.finished = datetime.utcnow().isoformat()
+            self.jobs.save()
+            return
+
+        logger.info("Running purge job for user id {}, {} channel(s) done.", job.target_id, len(job.done_channels))
+
+        message = await self.fetch_report_message(job)
+
+        self.engine = PurgeEngine(guild, job, get_index())
+        reporter = asyncio.create_task(self.report_progress(job, message))
+
+        incomplete = False
+
+        try:
+            await self.engine.run()
+        except PurgeIncomplete as err:
+            logger.warning("Purge job for user id {} incomplete: {}", job.target_id, err)
+
+            if job.resumes < self.max_resumes:
+                job.resumes += 1
+                incomplete = True
+            else:
+                job.error = f"Incomplete after {job.resumes} resume(s): {err}"
+        except Exception as err:
+            logger.critical("Purge job for user id {} failed: {}", job.target_id, err)
+            job.error = f"{type(err).__name__}: {err}"
+        finally:
+            reporter.cancel()
+            self.engine = None
+
+        if incomplete:
+            # left pending, so worker picks it up again from checkpoint.
+            self.jobs.save()
+            await asyncio.sleep(self.resume_delay)
+            return
+
+        job.finished = datetime.utcnow().isoformat()
+        self.jobs.save()
+
+        logger.info(
+            f"Deleted {job.deleted} message(s) sent by [{job.target_name}/{job.target_id}], {job.failed} failed"
+        )
+
+        days = (datetime.utcnow() - snowflake_time(job.after_id)).days
+
+        try:
+            await report_purge(guild, job.target_id, job.target_name, job.reason, days, progress_text(job))
+        except errors.HTTPException as err:
+            logger.warning("Failed to report purge: {}", err)
+
+        if not message or not message.embeds:
+            return
+
+        embed = message.embeds[0]
+        embed.add_field(name="Result", value=job.error or progress_text(job), inline=False)
+
+        try:
+            await message.edit(embed=embed.set_footer(text="All done! Message will be removed in 10 seconds."))
+            await message.delete(delay=10)
+        except errors.HTTPException as err:
+            logger.warning("Failed to update purge confirmation: {}", err)
+
     @command(name="purge", descriptions="Show prompt to purge target user.")
     async def purge(
         self,
@@ -245,26 +657,204 @@ class PurgeCog(Cog):
 
         await interaction.defer()
 
+        # cleanup command.
+        await context.message.delete(delay=10)
+
         if purge_confirm:
             await interaction.edit(
                 embed=embed.set_footer(text="Purge started. This may take some time."),
                 components=[components[0].disable_all_buttons()]
             )
+
             try:
-                await purge(context.guild, target, reason, log_channel)
+                job = await purge(context.guild, target, reason, message)
             except Exception as err:
                 await context.reply(f"Got error while processing: {err}")
+                job = None
+
+            else:
+                if job:
+                    # worker reports progress to this message and removes it when done.
+                    self.jobs.add(job)
+                    self.wakeup.set()
+                    return
+
+                join_diff = datetime.utcnow() - target.joined_at
+                await report_purge(context.guild, target.id, target.display_name, reason, join_diff.days)
 
         await interaction.edit(
             embed=embed.set_footer(text="All done! Message will be removed in 10 seconds."),
             components=[components[0].disable_all_buttons()]
         )
 
-        # cleanup command and message.
-        await context.message.delete(delay=10)
+        # cleanup message.
         await message.delete(delay=10)
 
+    @command(name="purgestatus", descriptions="Show progress of purge jobs.")
+    async def purge_status(self, context: Context):
+        if context.author.top_role.id not in command_whitelist_roles:
+            return
+
+        if self.engine:
+            self.engine.checkpoint()
+
+        embed = Embed(title="Purge jobs", colour=Color.red())
+
+        if not self.jobs:
+            embed.description = "No purge jobs."
+
+        for job in reversed(self.jobs.jobs):
+            embed.add_field(
+                name=f"{job.target_name} ({job.target_id}) - {job.status}",
+                value=f"{progress_text(job)}\n{job.throughput:.1f} deleted/min",
+                inline=False,
+            )
+
+        await context.reply(embed=embed)
+
+
+class MessageIndexCog(Cog):
+    """
+    Keeps message index filled from on_message and catches up what was sent while bot was away.
+    """
+
+    flush_interval = 5
+    retention_interval = timedelta(hours=1)
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+
+        logger.info(f"[{type(self).__name__}] Init")
+
+        # nested in directory so module reload's file hashing doesn't pick it up.
+        self.index = open_index(ROOT.joinpath("cache", "message_index.sqlite3"), message_index_retention_days)
+        self.last_retention = datetime.min
+
+        self.flush_loop.start()
+        self.catch_up.start()
+
+    def cog_unload(self):
+        logger.info(f"[{type(self).__name__}] Unloading")
+
+        self.flush_loop.cancel()
+        self.catch_up.cancel()
+
+        self.index.flush()
+
+        # messages sent while unloaded won't be seen, so coverage needs catching up again.
+        self.index.synced.clear()
+
+    @Cog.listener()
+    async def on_message(self, message: Message):
+        if message.guild:
+            self.index.add(message.guild.id, message.channel.id, message.author.id, message.id)
+
+    @Cog.listener()
+    async def on_raw_message_delete(self, payload: RawMessageDeleteEvent):
+        self.index.remove((payload.message_id,))
+
+    @Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: RawBulkMessageDeleteEvent):
+        self.index.remove(payload.message_ids)
+
+    @tasks.loop(seconds=flush_interval)
+    async def flush_loop(self):
+        self.index.flush()
+
+        if datetime.utcnow() - self.last_retention > self.retention_interval:
+            self.last_retention = datetime.utcnow()
+
+            dropped = self.index.apply_retention()
+            if dropped:
+                logger.info("Dropped {} message index entries past retention.", dropped)
+
+    async def index_history(self, channel: TextChannel, after: Union[datetime, Object, None]) -> int:
+        count = 0
+
+        async for message in channel.history(after=after, limit=None):
+            self.index.add(message.guild.id, channel.id, message.author.id, message.id)
+            count += 1
+
+            if not count % 1000:
+                self.index.flush()
+
+        return count
+
+    @tasks.loop(count=1)
+    async def catch_up(self):
+        for guild in self.bot.guilds:
+            for channel in guild.text_channels:
+                range_ = self.index.channel_range(channel.id)
+
+                # not backfilled, nothing to catch up on.
+                if not range_:
+                    continue
+
+                try:
+                    count = await self.index_history(channel, Object(id=range_[1]) if range_[1] else None)
+                except errors.Forbidden:
+                    logger.warning("Cannot access to channel '{}' - ID: {}", channel.name, channel.id)
+                    continue
+
+                self.index.mark_synced(channel.id)
+
+                if count:
+                    logger.info("Caught up {} message(s) in '{}'.", count, channel.name)
+
+    @catch_up.before_loop
+    async def wait_ready(self):
+        await self.bot.wait_until_ready()
+
+    @command(name="msgindex", descriptions="Show message index status, or backfill it with 'backfill'.")
+    async def msgindex(self, context: Context, action: str = "status"):
+        if context.author.top_role.id not in command_whitelist_roles:
+            return
+
+        if action == "backfill":
+            await self.backfill(context)
+
+        entries, channels, size = self.index.stats()
+
+        embed = Embed(title="Message index", colour=Color.dark_teal())
+        embed.add_field(name="Entries", value=f"{entries}")
+        embed.add_field(name="Backfilled channels", value=f"{channels}")
+        embed.add_field(name="Synced channels", value=f"{len(self.index.synced)}")
+        embed.add_field(name="Size", value=f"{size / 1024 ** 2:.1f} MiB")
+        embed.add_field(name="Retention", value=f"{self.index.retention_days or 'Unlimited'} day(s)")
+
+        await context.reply(embed=embed)
+
+    async def backfill(self, context: Context):
+        """
+        Indexes whole history of channels not indexed yet. This is one-time and really expensive.
+        """
+
+        channels = [ch for ch in context.guild.text_channels if not self.index.channel_range(ch.id)]
+        message: Message = await context.reply(f"Backfilling {len(channels)} channel(s).")
+
+        oldest = None
+
+        if self.index.retention_days:
+            oldest = datetime.utcnow() - timedelta(days=self.index.retention_days)
+
+        for idx, channel in enumerate(channels, 1):
+            try:
+                count = await self.index_history(channel, oldest)
+            except errors.Forbidden:
+                logger.warning("Cannot access to channel '{}' - ID: {}", channel.name, channel.id)
+                continue
+
+            self.index.mark_synced(channel.id, time_snowflake(oldest) if oldest else 0)
+
+            logger.info("Backfilled {} message(s) in '{}'.", count, channel.name)
+            await message.edit(content=f"Backfilled {idx}/{len(channels)} channel(s), last '{channel.name}'.")
+
 
 __all__ = [
     CogRepresentation(PurgeCog)
 ]
+
+if message_index:
+    __all__.append(CogRepresentation(MessageIndexCog))
+else:
+    close_index()
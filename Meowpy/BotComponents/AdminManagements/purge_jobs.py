@@ -0,0 +1,142 @@
+"""
+On-disk table of purge jobs, so purge in progress survives module reloads and bot restarts.
+
+Channels are scanned newest to oldest, so each channel's cursor is the message id below which
+scanning continues - everything above it is already deleted.
+"""
+
+import json
+import pathlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+
+class PurgeJob:
+    def __init__(
+        self,
+        guild_id: int,
+        target_id: int,
+        target_name: str,
+        reason: str,
+        after_id: int,
+        before_id: int,
+        report_channel_id: int = 0,
+        report_message_id: int = 0,
+        cursors: Optional[Dict[int, int]] = None,
+        done_channels: Optional[List[int]] = None,
+        channels_total: int = 0,
+        scanned: int = 0,
+        indexed: int = 0,
+        deleted: int = 0,
+        failed: int = 0,
+        elapsed: float = 0.0,
+        resumes: int = 0,
+        created: str = "",
+        finished: str = "",
+        error: str = "",
+    ):
+        self.guild_id = guild_id
+        self.target_id = target_id
+        self.target_name = target_name
+        self.reason = reason
+
+        # message id range to purge, exclusive.
+        self.after_id = after_id
+        self.before_id = before_id
+
+        # confirmation message to show progress on.
+        self.report_channel_id = report_channel_id
+        self.report_message_id = report_message_id
+
+        # json keys are always string
+        self.cursors = {int(key): val for key, val in (cursors or {}).items()}
+        self.done_channels = set(done_channels or ())
+        self.channels_total = channels_total
+
+        self.scanned = scanned
+        self.indexed = indexed
+        self.deleted = deleted
+        self.failed = failed
+
+        # seconds spent running, summed across resumes.
+        self.elapsed = elapsed
+
+        # times job was left incomplete and resumed later.
+        self.resumes = resumes
+
+        self.created = created or datetime.utcnow().isoformat()
+        self.finished = finished
+        self.error = error
+
+    @property
+    def status(self) -> str:
+        if self.error:
+            return "Failed"
+
+        if self.finished:
+            return "Done"
+
+        return "Running" if self.elapsed else "Pending"
+
+    @property
+    def throughput(self) -> float:
+        """
+        Deleted messages per minute.
+        """
+
+        return self.deleted / self.elapsed * 60 if self.elapsed else 0.0
+
+    def to_dict(self) -> dict:
+        data = dict(vars(self))
+        data["done_channels"] = sorted(self.done_channels)
+
+        return data
+
+
+class PurgeJobs:
+    """
+    Purge jobs in creation order, persisted to json file. Only last few finished jobs are kept.
+    """
+
+    keep_finished = 10
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.jobs: List[PurgeJob] = []
+
+        self._load()
+
+    def _load(self):
+        try:
+            self.jobs = [PurgeJob(**job) for job in json.loads(self.path.read_text())]
+        except FileNotFoundError:
+            return
+        except Exception as err:
+            logger.critical("Could not load purge jobs from {}: {}", self.path.name, err)
+
+    def save(self):
+        finished = [job for job in self.jobs if job.finished]
+
+        for job in finished[:-self.keep_finished]:
+            self.jobs.remove(job)
+
+        try:
+            self.path.parent.mkdir(exist_ok=True)
+            self.path.write_text(json.dumps([job.to_dict() for job in self.jobs], indent=2))
+        except OSError as err:
+            logger.critical("Could not save purge jobs: {}", err)
+
+    def add(self, job: PurgeJob):
+        self.jobs.append(job)
+        self.save()
+
+    def pending(self) -> List[PurgeJob]:
+        return [job for job in self.jobs if not job.finished]
+
+    def __iter__(self):
+        return iter(self.jobs)
+
+    def __len__(self):
+        return len(self.jobs)
@@ -2,6 +2,7 @@ import json
 import pathlib
 import asyncio
 import unicodedata
+from bisect import bisect_right
 from datetime import datetime, timedelta
 from typing import Union, Dict, List
 
@@ -9,10 +10,12 @@ import pytz
 from dateutil import parser
 from discord.ext.commands import Context
 from discord.ext.commands.errors import EmojiNotFound
-from discord import Embed, Member, Role, Asset, Emoji, errors, Message
+from discord import Embed, Member, Role, Asset, Emoji, errors, Message, Object
+from discord.utils import time_snowflake
 from loguru import logger
 
 from BotComponents import CommandRepresentation
+from BotComponents.message_index import get_index
 
 
 ROOT = pathlib.Path(__file__).parent
@@ -136,6 +139,35 @@ async def member_chat_history_gen(channel, target_member: Member, max_date=3):
     else:
         after_date = datetime.now() - max_duration
 
+    # use message index if it has complete record of this range.
+    index = get_index()
+    start = index.coverage_start(channel.id) if index else None
+
+    if start is not None and time_snowflake(after_date) >= start:
+        ids = sorted(message_id for _, message_id in index.message_ids(
+            channel.guild.id, target_member.id, channel.id, after=after_date
+        ))
+        wanted = set(ids)
+        pos = 0
+
+        # each page starts at next indexed message not yet seen, so sparse messages don't page whole channel,
+        # and dense ones are fetched 100 per request rather than one by one.
+        while pos < len(ids):
+            last_id = None
+
+            async for message in channel.history(limit=100, after=Object(ids[pos] - 1), oldest_first=True):
+                last_id = message.id
+
+                if message.id in wanted:
+                    yield message
+
+            if last_id is None:
+                break
+
+            pos = bisect_right(ids, last_id, pos)
+
+        return
+
     def filter_(message_):
         return message_.author == target_member
 
@@ -0,0 +1,191 @@
+"""
+Renders stream record's `data` series to PNG.
+
+Each series is drawn in it's own panel. Series longer than image width are downsampled to
+min/max per pixel column, so drawing cost only depends on image size, not on sample count.
+"""
+
+import json
+import pathlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+BACKGROUND = (32, 34, 37)
+GRID = (64, 68, 75)
+TEXT = (220, 221, 222)
+COLORS = ((24, 255, 255), (255, 115, 115), (122, 196, 92), (255, 204, 77), (170, 130, 255))
+
+MARGIN = 8
+LABEL_HEIGHT = 14
+
+# panel below this is unreadable, series that don't fit are left out.
+MIN_PANEL_HEIGHT = LABEL_HEIGHT + MARGIN + 16
+
+CACHE_SIZE = 32
+
+# (record name, json mtime, width, height): png bytes
+_cache: "OrderedDict[Tuple[str, int, int, int], bytes]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load_series(json_path: pathlib.Path) -> Dict[str, np.ndarray]:
+    """
+    Loads numeric series in record's `data` as float arrays, missing samples as NaN.
+    Series that aren't numeric, like timestamps, are skipped.
+    """
+
+    data: dict = json.loads(json_path.read_text())["data"]
+    output = {}
+
+    for key, values in data.items():
+        if not isinstance(values, list) or not values:
+            continue
+
+        try:
+            array = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            # failed samples are recorded as null
+            try:
+                array = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            except (TypeError, ValueError):
+                continue
+
+        if array.ndim == 1:
+            output[key] = array
+
+    return output
+
+
+def min_max_buckets(series: np.ndarray, width: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Downsamples series to at most `width` buckets, keeping min and max of each so spikes survive.
+
+    :return: Tuple of (x positions 0~1, bucket min, bucket max)
+    """
+
+    length = len(series)
+
+    if length <= width:
+        x = np.linspace(0, 1, length) if length > 1 else np.zeros(1)
+        return x, series, series
+
+    starts = np.linspace(0, length, width + 1).astype(np.intp)[:-1]
+
+    # fmin/fmax ignore NaN unless whole bucket is NaN
+    mins = np.fmin.reduceat(series, starts)
+    maxs = np.fmax.reduceat(series, starts)
+
+    return np.linspace(0, 1, width), mins, maxs
+
+
+def draw_panel(draw: ImageDraw.ImageDraw, box: Tuple[int, int, int, int], name: str, series: np.ndarray, color):
+    left, top, right, bottom = box
+
+    plot_top = top + LABEL_HEIGHT
+    plot_width = right - left
+    plot_height = bottom - plot_top
+
+    if plot_height < 2 or plot_width < 2:
+        draw.text((left, top), name, fill=TEXT)
+        return
+
+    draw.rectangle((left, plot_top, right, bottom), outline=GRID)
+
+    valid = series[~np.isnan(series)]
+
+    if not valid.size:
+        draw.text((left, top), f"{name}: no data", fill=TEXT)
+        return
+
+    low, high = float(valid.min()), float(valid.max())
+    span = (high - low) or 1.0
+
+    draw.text((left, top), f"{name}: {low:,.0f} ~ {high:,.0f}, last {valid[-1]:,.0f}", fill=TEXT)
+
+    x, mins, maxs = min_max_buckets(series, plot_width)
+
+    xs = left + x * (plot_width - 1)
+    y_min = bottom - (mins - low) / span * (plot_height - 1)
+    y_max = bottom - (maxs - low) / span * (plot_height - 1)
+
+    # zig-zag through each column's min and max, this draws both envelope and trend in one polyline.
+    points = np.empty((len(xs) * 2, 2))
+    points[0::2, 0] = xs
+    points[1::2, 0] = xs
+    points[0::2, 1] = y_min
+    points[1::2, 1] = y_max
+
+    # split on missing samples so gaps stay visible
+    finite = np.isfinite(points[:, 1])
+    breaks = np.flatnonzero(np.diff(finite.astype(np.int8)))
+
+    for segment in np.split(np.arange(len(points)), breaks + 1):
+        if not finite[segment[0]]:
+            continue
+
+        coords = points[segment].ravel().tolist()
+
+        if len(segment) == 1:
+            draw.point(coords, fill=color)
+        else:
+            draw.line(coords, fill=color, width=1)
+
+
+def render(json_path: pathlib.Path, width: int, height: int) -> bytes:
+    """
+    Renders record to PNG. This is blocking, run it in executor.
+    """
+
+    series = load_series(json_path)
+
+    image = Image.new("RGB", (width, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+
+    if not series:
+        draw.text((MARGIN, MARGIN), "No data", fill=TEXT)
+
+    panels = min(len(series), max(1, (height - MARGIN) // MIN_PANEL_HEIGHT))
+    panel_height = (height - MARGIN) // max(1, panels)
+
+    for idx, (name, values) in enumerate(list(series.items())[:panels]):
+        top = MARGIN + idx * panel_height
+        box = (MARGIN, top, width - MARGIN, top + panel_height - MARGIN)
+
+        draw_panel(draw, box, name, values, COLORS[idx % len(COLORS)])
+
+    buffer = BytesIO()
+    # speed matters more than size for a one-off attachment.
+    image.save(buffer, "PNG", compress_level=1)
+
+    return buffer.getvalue()
+
+
+def render_cached(name: str, json_path: pathlib.Path, mtime_ns: int, width: int, height: int) -> bytes:
+    """
+    render() with LRU cache by record, it's modification time and image size.
+    """
+
+    key = (name, mtime_ns, width, height)
+
+    with _cache_lock:
+        try:
+            _cache.move_to_end(key)
+            return _cache[key]
+        except KeyError:
+            pass
+
+    png = render(json_path, width, height)
+
+    with _cache_lock:
+        _cache[key] = png
+
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return png
@@ -1,7 +1,10 @@
 import json
+import time
+import asyncio
 import pathlib
-from datetime import datetime, timezone
-from typing import Union, List
+from io import BytesIO
+from datetime import datetime, timezone, timedelta
+from typing import Union, List, Dict
 
 from dateutil.parser import isoparse
 from discord.ext.commands import Context, Cog, Bot, command
@@ -19,7 +22,9 @@ from discord import (
 )
 from loguru import logger
 
-from .youtube_api_client import GoogleClient
+from .youtube_api_client import AsyncGoogleClient, shared_client, QUOTA_TZ
+from .record_index import shared_index, StreamRecord
+from .graph_render import render_cached
 from .. import CommandRepresentation, CogRepresentation
 
 
@@ -27,11 +32,29 @@ google_api = ""
 record_absolute_path = ""
 subscription_role_id: int = 0
 yt_channels: List[str]
+api_workers: int = 4
+api_timeout_sec: float = 10
+cache_ttl_sec: Dict[str, float] = {}
+sub_notify_guild_id: int = 0
+sub_notify_channel_id: int = 0
+sub_notify_thumbnail = ""
+sub_poll_min_sec: float = 15
+sub_poll_max_sec: float = 900
+sub_daily_quota: int = 2000
 
 config_path = pathlib.Path(__file__).parent.joinpath("config.json")
 loaded_config = json.loads(config_path.read_text())
 locals().update(loaded_config)
 
+PLOT_DEFAULT_SIZE = (1200, 600)
+PLOT_MIN_SIZE = 200
+PLOT_MAX_SIZE = 4000
+
+# shared by all commands and cogs in this module, kept across reloads unless api key changes.
+client: Union[AsyncGoogleClient, None] = (
+    shared_client(google_api, api_workers, api_timeout_sec, cache_ttl_sec) if google_api else None
+)
+
 
 async def run_literally(context: Context):
     logger.info("called by {}", context.author.id)
@@ -44,27 +67,36 @@ async def run_literally(context: Context):
 # --------------------------------------
 
 
-async def get_stream_image(context: Context, index: int = 0):
-    logger.info("called by {}, index {}", context.author.id, index)
-
-    files = [f for f in record_path.iterdir() if f.suffix == ".png"]
-
-    sorted_files = sorted(files, reverse=True)
+def _find_record(index: int) -> Union[StreamRecord, None]:
+    record_index.refresh()
 
     try:
-        target = sorted_files[index]
+        return record_index[index]
     except IndexError:
-        index = len(sorted_files) - 1
-        target = sorted_files[index]
+        if not len(record_index):
+            return None
+
+        return record_index[len(record_index) - 1]
+
+
+async def find_record(index: int) -> Union[StreamRecord, None]:
+    # first refresh parses every record json, keep that off event loop.
+    return await asyncio.get_running_loop().run_in_executor(None, _find_record, index)
+
+
+async def render_record(record: StreamRecord, width: int, height: int) -> bytes:
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(
+        None, render_cached, record.name, record_index.json_path(record), record.json_mtime_ns, width, height
+    )
 
-    target_json = target.with_suffix(".json")
-    loaded_json = json.loads(target_json.read_text())
 
-    date, timestamp, video_id = target.stem.split("_", 2)
+async def send_record(context: Context, record: StreamRecord, png: bytes):
+    timestamp, video_id = record.timestamp, record.video_id
     link = f"https://youtu.be/{video_id}"
 
-    with open(target, "rb") as fp:
-        file = File(fp, f"{timestamp}.png")
+    file = File(BytesIO(png), f"{timestamp}.png")
 
     embed = Embed(
         title=f"Stream at {timestamp} epoch time",
@@ -73,12 +105,12 @@ async def get_stream_image(context: Context, index: int = 0):
     )
 
     embed.add_field(
-        name="Stream title", value=loaded_json["stream_title"], inline=False
+        name="Stream title", value=record.title, inline=False
     )
 
     embed.add_field(
         name="Sample count / interval",
-        value=f"{len(loaded_json['data']['viewCount'])} / {loaded_json['interval']}",
+        value=f"{record.samples} / {record.interval}",
     )
 
     embed.set_image(url=f"attachment://{timestamp}.png")
@@ -87,6 +119,40 @@ async def get_stream_image(context: Context, index: int = 0):
     await context.reply(file=file, embed=embed)
 
 
+async def get_stream_image(context: Context, index: int = 0):
+    logger.info("called by {}, index {}", context.author.id, index)
+
+    if (record := await find_record(index)) is None:
+        await context.reply("No stream records yet!")
+        return
+
+    # use recorder's graph if there is one, else draw it here.
+    if record.has_png:
+        png = record_index.png_path(record).read_bytes()
+    else:
+        png = await render_record(record, *PLOT_DEFAULT_SIZE)
+
+    await send_record(context, record, png)
+
+
+# --------------------------------------
+
+
+async def plot_stream(context: Context, index: int = 0, width: int = 0, height: int = 0):
+    logger.info("called by {}, index {}, size {}x{}", context.author.id, index, width, height)
+
+    if (record := await find_record(index)) is None:
+        await context.reply("No stream records yet!")
+        return
+
+    default_width, default_height = PLOT_DEFAULT_SIZE
+
+    width = min(PLOT_MAX_SIZE, max(PLOT_MIN_SIZE, width or default_width))
+    height = min(PLOT_MAX_SIZE, max(PLOT_MIN_SIZE, height or default_height))
+
+    await send_record(context, record, await render_record(record, width, height))
+
+
 # --------------------------------------
 
 
@@ -101,13 +167,17 @@ async def get_latest(context: Context):
 
     logger.info("called by {}", context.author.id)
 
-    client = GoogleClient(google_api)
+    try:
+        latest_videos = await client.get_latest_videos_batch(yt_channels, 1)
 
-    vid_infos = [client.get_latest_videos(id_, 1)[0] for id_ in yt_channels]
+        # fetch statistics of every candidate in one request, then pick latest.
+        candidates = [videos[0].video_id for videos in latest_videos.values() if videos]
 
-    latest = sorted(vid_infos, key=lambda x: x.pub_date)[-1]
+        new_ = max(await client.get_videos_info(*candidates), key=lambda x: x.pub_date)
 
-    new_ = client.get_videos_info(latest.video_id)[0]
+    except asyncio.TimeoutError:
+        await context.reply("YouTube API took too long to respond, try again later!")
+        return
 
     diff = datetime.now(timezone.utc) - isoparse(new_.published_at)
 
@@ -137,6 +207,29 @@ async def get_latest(context: Context):
 # --------------------------------------
 
 
+async def api_usage(context: Context):
+
+    logger.info("called by {}", context.author.id)
+
+    quota = client.quota
+    cache = client.cache
+
+    embed = Embed(title=f"YouTube API usage for {quota.day}", colour=Colour.from_rgb(24, 255, 255))
+
+    used = "\n".join(f"{method}: {units}" for method, units in quota.used.most_common()) or "None"
+
+    embed.add_field(name="Quota units", value=f"{used}\nTotal: {quota.total}", inline=False)
+    embed.add_field(
+        name="Response cache",
+        value=f"Hits: {cache.hits}\nStale hits: {cache.stale_hits}\nMisses: {cache.misses}",
+    )
+
+    await context.reply(embed=embed)
+
+
+# --------------------------------------
+
+
 async def subscribe(context: Context):
 
     logger.info("called by {}", context.author.id)
@@ -189,55 +282,194 @@ async def unsubscribe(context: Context):
 # --------------------------------------
 
 
+class SubscriberState:
+    """
+    Poll state of single youtube channel.
+    """
+
+    def __init__(self, channel_id: str):
+        self.channel_id = channel_id
+
+        self.last_sub = 0
+
+        # milestone already reached, None until first successful sample so startup isn't announced.
+        self.last_sub_factor: Union[int, None] = None
+
+        # subscribers per second, estimated from last two samples.
+        self.rate = 0.0
+        self.last_time: Union[float, None] = None
+
+        self.interval = sub_poll_min_sec
+        self.next_poll = 0.0
+
+    def update(self, count: int, now: float):
+        if self.last_time is not None and now > self.last_time:
+            self.rate = max(0.0, (count - self.last_sub) / (now - self.last_time))
+
+        self.last_sub = count
+        self.last_time = now
+
+
 class CheckSubscribersCount(Cog):
+    """
+    Polls subscribers count of all channels in yt_channels and announces every div_factor milestone.
+
+    Poll interval widens when count is far from next milestone and tightens as it approaches,
+    while keeping total requests under daily quota budget.
+    """
+
     div_factor = 1000
 
     def __init__(self, bot: Bot):
         logger.info("[CheckSub] Starting.")
 
         self.bot = bot
-        self.channel_id = yt_channels[0]
-        self.client = GoogleClient(google_api)
-        self.last_sub = self.get_subs()
-        self.last_sub_factor = self.last_sub // self.div_factor
+        self.client = client
+        self.states = {channel_id: SubscriberState(channel_id) for channel_id in yt_channels}
 
-        self.task.start()
+        # request count in current quota day, and earliest time next request is allowed by budget.
+        self.quota_day = datetime.now(QUOTA_TZ).date()
+        self.requests_today = 0
+        self.next_request = 0.0
 
-    def get_subs(self) -> int:
-        return self.client.get_subscribers_count(self.channel_id)
+        self.task.start()
 
     def cog_unload(self):
         logger.info("[CheckSub] Stopping.")
         self.task.stop()
 
-    @tasks.loop(seconds=15)
-    async def task(self):
-        self.last_sub = self.get_subs()
+    def next_interval(self, state: SubscriberState) -> float:
+        """
+        Picks poll interval of a channel depending on distance to next milestone.
+        """
 
-        factor = self.last_sub // self.div_factor
+        if state.last_sub_factor is None:
+            return sub_poll_min_sec
 
-        if factor > self.last_sub_factor:
-            self.last_sub_factor = factor
+        distance = (state.last_sub_factor + 1) * self.div_factor - state.last_sub
 
-            message = Embed(title=f"{factor * self.div_factor} reached!")
+        if state.rate > 0:
+            # check about twice before milestone is expected to be reached.
+            interval = distance / state.rate / 2
+        else:
+            interval = sub_poll_max_sec * distance / self.div_factor
 
-            message.add_field(name="Subscribers", value=f"{self.last_sub}")
+        return min(sub_poll_max_sec, max(sub_poll_min_sec, interval))
 
-            message.set_thumbnail(
-                url="https://cdn.discordapp.com/avatars/757307928012259419/cfce0470f52118f947b93eb78f2033f9.webp?size=1024"
-            )
+    def budget_interval(self) -> float:
+        """
+        Minimum seconds between requests so remaining quota budget lasts until quota reset.
+        """
+
+        now = datetime.now(QUOTA_TZ)
+
+        if now.date() != self.quota_day:
+            self.quota_day = now.date()
+            self.requests_today = 0
+
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=QUOTA_TZ)
+        seconds_left = (tomorrow - now).total_seconds()
+
+        remaining = sub_daily_quota - self.requests_today
 
-            target_server: Guild = self.bot.get_guild(757313446730793101)
-            target_channel: TextChannel = target_server.get_channel(854206017147371541)
+        return seconds_left if remaining <= 0 else seconds_left / remaining
 
+    async def poll(self, states: List[SubscriberState]) -> bool:
+        """
+        Fetches subscribers counts of given channels in single request.
+
+        :return: True if fetched successfully.
+        """
+
+        try:
+            counts = await self.client.get_subscribers_counts(*(state.channel_id for state in states), fresh=True)
+        except Exception as err:
+            logger.warning("[CheckSub] Got {} fetching subscribers count, skipping.\nDetails: {}", type(err).__name__, err)
+            return False
+
+        self.requests_today += 1
+        now = time.monotonic()
+
+        for state in states:
+            try:
+                state.update(counts[state.channel_id], now)
+            except KeyError:
+                logger.warning("[CheckSub] No such channel {}", state.channel_id)
+
+        return True
+
+    async def announce(self, state: SubscriberState, factor: int):
+        message = Embed(title=f"{factor * self.div_factor} reached!")
+
+        message.add_field(name="Subscribers", value=f"{state.last_sub}")
+        message.add_field(name="Channel", value=f"https://youtube.com/channel/{state.channel_id}")
+
+        if sub_notify_thumbnail:
+            message.set_thumbnail(url=sub_notify_thumbnail)
+
+        target_server: Guild = self.bot.get_guild(sub_notify_guild_id)
+
+        try:
+            target_channel: TextChannel = target_server.get_channel(sub_notify_channel_id)
             await target_channel.send(embed=message)
 
+        except AttributeError:
+            logger.critical(
+                "[CheckSub] Unknown guild {} or channel {}, check configuration!",
+                sub_notify_guild_id,
+                sub_notify_channel_id,
+            )
+
+    @tasks.loop(seconds=sub_poll_min_sec)
+    async def task(self):
+        now = time.monotonic()
+
+        if now < self.next_request:
+            return
+
+        due = [state for state in self.states.values() if state.next_poll <= now]
+
+        if not due or not await self.poll(due):
+            return
+
+        self.next_request = now + self.budget_interval()
+
+        for state in due:
+            factor = state.last_sub // self.div_factor
+
+            # never sampled, e.g. channel is missing from response.
+            if state.last_time is None:
+                pass
+
+            elif state.last_sub_factor is None:
+                state.last_sub_factor = factor
+
+            elif factor > state.last_sub_factor:
+                state.last_sub_factor = factor
+                await self.announce(state, factor)
+
+            state.interval = self.next_interval(state)
+            state.next_poll = now + state.interval
+
+    @task.before_loop
+    async def load(self):
+        await self.poll(list(self.states.values()))
+
+        for state in self.states.values():
+            if state.last_time is not None:
+                state.last_sub_factor = state.last_sub // self.div_factor
+
+            state.interval = self.next_interval(state)
+            state.next_poll = time.monotonic() + state.interval
+
     @command()
     async def subs(self, context: Context):
 
         logger.info("called by {}", context.author.id)
 
-        await context.reply(f"Last reported subscribers: {self.last_sub}")
+        lines = "\n".join(f"{state.channel_id}: {state.last_sub}" for state in self.states.values())
+
+        await context.reply(f"Last reported subscribers:\n{lines}")
 
     @command()
     async def check_sub_debug(self, context: Context):
@@ -246,11 +478,19 @@ class CheckSubscribersCount(Cog):
 
         message = Embed(title=f"Debug data for {type(self).__name__}")
 
-        string_key = f"channel_id\nlast_sub\nlast_sub_factor\ndiv_factor"
-        string_val = f"{self.channel_id}\n{self.last_sub}\n{self.last_sub_factor}\n{self.div_factor}"
+        for state in self.states.values():
+            message.add_field(
+                name=state.channel_id,
+                value=f"last_sub {state.last_sub}\nlast_sub_factor {state.last_sub_factor}\n"
+                f"rate {state.rate * 3600:.1f}/h\ninterval {state.interval:.0f}s",
+            )
 
-        message.add_field(name="Key", value=string_key)
-        message.add_field(name="Value", value=string_val)
+        message.add_field(
+            name="Budget",
+            value=f"div_factor {self.div_factor}\nrequests today {self.requests_today} / {sub_daily_quota}\n"
+            f"min spacing {self.budget_interval():.0f}s",
+            inline=False,
+        )
 
         await context.reply(embed=message)
 
@@ -277,16 +517,18 @@ if subscription_role_id:
 if google_api:
     __all__.append(
         CommandRepresentation(
-            get_stream_image,
-            name="streamgraph",
-            help="Get stream's public statistics graph."
-            "Due to check interval and http errors, file may either be incomplete or not graphed at all.",
-            err_handler=get_stream_image_error,
+            get_latest, name="latest", help="Shows latest uploaded video."
         )
     )
 
     __all__.append(CogRepresentation(CheckSubscribersCount))
 
+    __all__.append(
+        CommandRepresentation(
+            api_usage, name="apiusage", help="Shows YouTube API quota spent today and cache stats."
+        )
+    )
+
 # Add if path is provided
 if record_absolute_path:
     record_path = pathlib.Path(record_absolute_path)
@@ -297,8 +539,24 @@ if record_absolute_path:
         )
 
     else:
+        # nested in directory so module reload's file hashing doesn't pick it up.
+        record_index = shared_index(record_path, pathlib.Path(__file__).parent.joinpath("cache", "record_index.json"))
+
+        __all__.append(
+            CommandRepresentation(
+                get_stream_image,
+                name="streamgraph",
+                help="Get stream's public statistics graph."
+                "Due to check interval and http errors, file may either be incomplete or not graphed at all.",
+                err_handler=get_stream_image_error,
+            )
+        )
+
         __all__.append(
             CommandRepresentation(
-                get_latest, name="latest", help="Shows latest uploaded video."
+                plot_stream,
+                name="streamplot",
+                help="Draw stream's statistics graph from recorded data. Params: <index> <width> <height>",
+                err_handler=get_stream_image_error,
             )
         )
@@ -0,0 +1,177 @@
+"""
+Persistent index of stream records made by stream recorder.
+
+Each record is `<date>_<timestamp>_<video_id>.json` in record directory, with optional `.png` graph of same stem.
+Index is only rescanned when directory's mtime changes, and only new records' json are parsed.
+Scanning and parsing is blocking, so index is meant to be used from executor threads.
+"""
+
+import json
+import os
+import pathlib
+import threading
+from typing import Dict, List
+
+from loguru import logger
+
+
+class StreamRecord:
+    def __init__(self, name: str, title: str, samples: int, interval, json_mtime_ns: int, has_png: bool):
+        self.name = name
+        self.date, self.timestamp, self.video_id = name.split("_", 2)
+
+        self.title = title
+        self.samples = samples
+        self.interval = interval
+        self.json_mtime_ns = json_mtime_ns
+        self.has_png = has_png
+
+    @classmethod
+    def from_file(cls, json_path: pathlib.Path, has_png: bool) -> "StreamRecord":
+        mtime_ns = json_path.stat().st_mtime_ns
+        loaded = json.loads(json_path.read_text())
+
+        return cls(
+            json_path.stem,
+            loaded["stream_title"],
+            len(loaded["data"]["viewCount"]),
+            loaded["interval"],
+            mtime_ns,
+            has_png,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "title": self.title,
+            "samples": self.samples,
+            "interval": self.interval,
+            "json_mtime_ns": self.json_mtime_ns,
+            "has_png": self.has_png,
+        }
+
+
+class RecordIndex:
+    """
+    Newest first list of stream records in record directory, persisted to index file.
+    """
+
+    def __init__(self, record_dir: pathlib.Path, index_path: pathlib.Path):
+        self.record_dir = record_dir
+        self.index_path = index_path
+
+        self.dir_mtime_ns = 0
+        self.records: List[StreamRecord] = []
+
+        # concurrent commands may refresh from different executor threads.
+        self._lock = threading.Lock()
+
+        self._load()
+
+    def _load(self):
+        try:
+            loaded = json.loads(self.index_path.read_text())
+            records = [StreamRecord(**record) for record in loaded["records"]]
+        except FileNotFoundError:
+            return
+        except Exception as err:
+            logger.warning("Discarding broken record index {}: {}", self.index_path.name, err)
+            return
+
+        self.dir_mtime_ns = loaded["dir_mtime_ns"]
+        self.records = records
+
+    def _save(self):
+        data = {"dir_mtime_ns": self.dir_mtime_ns, "records": [record.to_dict() for record in self.records]}
+
+        try:
+            self.index_path.parent.mkdir(exist_ok=True)
+            self.index_path.write_text(json.dumps(data))
+        except OSError as err:
+            logger.warning("Could not save record index: {}", err)
+
+    def refresh(self):
+        """
+        Rescans record directory if it changed since last scan, parsing only newly added records.
+        """
+
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        mtime_ns = self.record_dir.stat().st_mtime_ns
+
+        if mtime_ns == self.dir_mtime_ns:
+            return
+
+        with os.scandir(self.record_dir) as entries:
+            file_names = [entry.name for entry in entries]
+
+        names = {name[:-5] for name in file_names if name.endswith(".json")}
+        pngs = {name[:-4] for name in file_names if name.endswith(".png")}
+
+        # keep already indexed records unless removed, or got it's graph added/removed.
+        known: Dict[str, StreamRecord] = {
+            record.name: record
+            for record in self.records
+            if record.name in names and record.has_png == (record.name in pngs)
+        }
+
+        for name in names - known.keys():
+            try:
+                known[name] = StreamRecord.from_file(self.record_dir.joinpath(name + ".json"), name in pngs)
+            except Exception as err:
+                logger.warning("Skipping record {}: {}", name, err)
+
+        logger.debug("Record index rescanned, {} -> {} records.", len(self.records), len(known))
+
+        self.records = sorted(known.values(), key=lambda x: x.name, reverse=True)
+        self.dir_mtime_ns = mtime_ns
+
+        self._save()
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index: int) -> StreamRecord:
+        """
+        Returns record at index, re-reading it's json only if it changed since indexed.
+        Recorder keeps appending to latest record's json, so this keeps sample count accurate.
+        """
+
+        with self._lock:
+            record = self.records[index]
+            json_path = self.json_path(record)
+
+            try:
+                mtime_ns = json_path.stat().st_mtime_ns
+            except FileNotFoundError:
+                return record
+
+            if mtime_ns != record.json_mtime_ns:
+                record = StreamRecord.from_file(json_path, record.has_png)
+                self.records[index] = record
+                self._save()
+
+            return record
+
+    def png_path(self, record: StreamRecord) -> pathlib.Path:
+        return self.record_dir.joinpath(record.name + ".png")
+
+    def json_path(self, record: StreamRecord) -> pathlib.Path:
+        return self.record_dir.joinpath(record.name + ".json")
+
+
+_indexes: Dict[pathlib.Path, RecordIndex] = {}
+
+
+def shared_index(record_dir: pathlib.Path, index_path: pathlib.Path) -> RecordIndex:
+    """
+    Returns index of given directory, kept across module reloads as this file isn't reloaded.
+    """
+
+    try:
+        return _indexes[record_dir]
+    except KeyError:
+        index = _indexes[record_dir] = RecordIndex(record_dir, index_path)
+        return index
@@ -6,13 +6,23 @@ You can manually specify it when building resource file.
 Readability is 'amazing', even I can't read well. Will add docstrings when I can.
 """
 
+import asyncio
+import json
 import pathlib
 import datetime
-from typing import Tuple
+import functools
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Dict, Iterable, Any, Callable, Awaitable, Union
 
 from dateutil.parser import isoparse
-from googleapiclient.discovery import build
+from dateutil.tz import gettz
+from googleapiclient.discovery import build, build_from_document
 from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
+from loguru import logger
 
 
 assert HttpError
@@ -20,8 +30,37 @@ assert HttpError
 
 YOUTUBE_API_SERVICE = "youtube"
 YOUTUBE_API_VERSION = "v3"
+# videos.list and channels.list accept at most this many ids per request.
+MAX_IDS_PER_REQUEST = 50
+# quota cost per api method, anything else costs 1 unit.
+QUOTA_COST = {"youtube.search.list": 100}
+# daily quota resets at midnight pacific time.
+QUOTA_TZ = gettz("America/Los_Angeles")
+
+# seconds each GoogleClient method's response is cached for. 0 disables caching.
+CACHE_TTL = {
+    "get_latest_videos": 60,
+    "get_videos_info": 60,
+    "get_stream_status": 15,
+    "get_video_title": 3600,
+    "get_video_description": 3600,
+    "get_channel_id": 86400,
+    "get_subscribers_count": 10,
+    "get_subscribers_counts": 10,
+    "get_upcoming_streams": 300,
+    "get_live_streams": 60,
+    "get_start_time": 300,
+}
+# expired responses younger than ttl * this are returned immediately while being refreshed in background.
+STALE_FACTOR = 5
+
 API_FILE = pathlib.Path(__file__).parent.joinpath("api_key").absolute()
 
+# nested in directory so module reload's file hashing doesn't pick it up.
+DISCOVERY_CACHE = pathlib.Path(__file__).parent.joinpath(
+    "cache", f"{YOUTUBE_API_SERVICE}_{YOUTUBE_API_VERSION}.json"
+)
+
 
 def build_youtube_resource(api_key=None):
     if api_key is None:
@@ -29,7 +68,22 @@ def build_youtube_resource(api_key=None):
         with open(API_FILE) as _fp:
             api_key = _fp.read()
 
+    # try cached discovery document first, skips fetching & parsing it again.
+    try:
+        return build_from_document(DISCOVERY_CACHE.read_text(encoding="utf8"), developerKey=api_key)
+    except FileNotFoundError:
+        pass
+    except Exception as err:
+        logger.warning("Discarding broken discovery cache {}: {}", DISCOVERY_CACHE.name, err)
+
     youtube = build(YOUTUBE_API_SERVICE, YOUTUBE_API_VERSION, developerKey=api_key)
+
+    try:
+        DISCOVERY_CACHE.parent.mkdir(exist_ok=True)
+        DISCOVERY_CACHE.write_text(json.dumps(youtube._rootDesc), encoding="utf8")
+    except (AttributeError, OSError) as err:
+        logger.warning("Could not cache discovery document: {}", err)
+
     return youtube
 
 
@@ -82,6 +136,37 @@ class VideoInfo:
         return self._thumbnail[table[quality]]["url"]
 
 
+class QuotaCounter:
+    """
+    Counts quota units spent per api method for current quota day. Thread safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.day = self._today()
+        self.used: Counter = Counter()
+
+    @staticmethod
+    def _today() -> datetime.date:
+        return datetime.datetime.now(QUOTA_TZ).date()
+
+    def _roll_over(self):
+        if (today := self._today()) != self.day:
+            self.day = today
+            self.used.clear()
+
+    def add(self, method_id: str):
+        with self._lock:
+            self._roll_over()
+            self.used[method_id] += QUOTA_COST.get(method_id, 1)
+
+    @property
+    def total(self) -> int:
+        with self._lock:
+            self._roll_over()
+            return sum(self.used.values())
+
+
 class GoogleClient:
     def __init__(self, api_key=None):
         self.youtube_client = build_youtube_resource(api_key)
@@ -90,6 +175,21 @@ class GoogleClient:
         self.search_api = self.youtube_client.search()
         self.playlist_item_api = self.youtube_client.playlistItems()
 
+        self.quota = QuotaCounter()
+
+        # httplib2.Http is not thread safe, so each thread keeps it's own keep-alive connection.
+        self._local = threading.local()
+
+    def _execute(self, req) -> dict:
+        try:
+            http = self._local.http
+        except AttributeError:
+            http = self._local.http = build_http()
+
+        self.quota.add(req.methodId)
+
+        return req.execute(http=http)
+
     def get_latest_videos(self, channel_id, fetch=3) -> Tuple[VideoInfo, ...]:
         # https://stackoverflow.com/a/55373181/10909029
 
@@ -99,16 +199,21 @@ class GoogleClient:
             playlistId="UU" + channel_id[2:]
         )
 
-        return tuple(map(VideoInfo, req.execute()["items"]))
+        return tuple(map(VideoInfo, self._execute(req)["items"]))
 
     def get_videos_info(self, *video_ids) -> Tuple[VideoInfo, ...]:
 
-        req = self.video_api.list(
-            part="snippet,contentDetails,statistics",
-            id=",".join(video_ids)
-        )
+        output = []
+
+        for idx in range(0, len(video_ids), MAX_IDS_PER_REQUEST):
+            req = self.video_api.list(
+                part="snippet,contentDetails,statistics",
+                id=",".join(video_ids[idx:idx + MAX_IDS_PER_REQUEST])
+            )
+
+            output.extend(map(VideoInfo, self._execute(req)["items"]))
 
-        return tuple(map(VideoInfo, req.execute()["items"]))
+        return tuple(output)
 
     def get_stream_status(self, video_id) -> str:
         # This is most inefficient out of these methods.. but it's way simpler than first code.
@@ -117,7 +222,7 @@ class GoogleClient:
             id=video_id, part="snippet", fields="items/snippet/liveBroadcastContent"
         )
 
-        return req.execute()["items"][0]["snippet"]["liveBroadcastContent"]
+        return self._execute(req)["items"][0]["snippet"]["liveBroadcastContent"]
 
     def get_video_title(self, video_id) -> str:
 
@@ -125,7 +230,7 @@ class GoogleClient:
             id=video_id, part="snippet", fields="items/snippet/title"
         )
 
-        return req.execute()["items"][0]["snippet"]["title"]
+        return self._execute(req)["items"][0]["snippet"]["title"]
 
     def get_video_description(self, video_id) -> str:
 
@@ -133,7 +238,7 @@ class GoogleClient:
             id=video_id, part="snippet", fields="items/snippet/description"
         )
 
-        return req.execute()["items"][0]["snippet"]["description"]
+        return self._execute(req)["items"][0]["snippet"]["description"]
 
     def get_channel_id(self, video_id) -> str:
 
@@ -141,7 +246,7 @@ class GoogleClient:
             id=video_id, part="snippet", fields="items/snippet/channelId"
         )
 
-        return req.execute()["items"][0]["snippet"]["channelId"]
+        return self._execute(req)["items"][0]["snippet"]["channelId"]
 
     def get_subscribers_count(self, channel_id) -> int:
 
@@ -151,7 +256,28 @@ class GoogleClient:
             fields="items/statistics/subscriberCount",
         )
 
-        return int(req.execute()["items"][0]["statistics"]["subscriberCount"])
+        return int(self._execute(req)["items"][0]["statistics"]["subscriberCount"])
+
+    def get_subscribers_counts(self, *channel_ids) -> Dict[str, int]:
+        """
+        Fetches subscribers count of multiple channels, costing single quota unit per 50 channels.
+
+        :return: Dict of channel id: subscribers count
+        """
+
+        output = {}
+
+        for idx in range(0, len(channel_ids), MAX_IDS_PER_REQUEST):
+            req = self.channel_api.list(
+                id=",".join(channel_ids[idx:idx + MAX_IDS_PER_REQUEST]),
+                part="statistics",
+                fields="items(id,statistics/subscriberCount)",
+            )
+
+            for item in self._execute(req)["items"]:
+                output[item["id"]] = int(item["statistics"]["subscriberCount"])
+
+        return output
 
     def get_upcoming_streams(self, channel_id: str) -> Tuple[VideoInfo, ...]:
 
@@ -159,7 +285,7 @@ class GoogleClient:
             channelId=channel_id, part="snippet", type="video", eventType="upcoming"
         )
 
-        return tuple(vid_info for vid_info in map(VideoInfo, req.execute()["items"]) if vid_info.is_upcoming)
+        return tuple(vid_info for vid_info in map(VideoInfo, self._execute(req)["items"]) if vid_info.is_upcoming)
 
     def get_live_streams(self, channel_id: str) -> Tuple[VideoInfo, ...]:
 
@@ -167,7 +293,7 @@ class GoogleClient:
             channelId=channel_id, part="snippet", type="video", eventType="live"
         )
 
-        return tuple(vid_info for vid_info in map(VideoInfo, req.execute()["items"]) if vid_info.is_live)
+        return tuple(vid_info for vid_info in map(VideoInfo, self._execute(req)["items"]) if vid_info.is_live)
 
     def get_start_time(self, video_id) -> datetime.datetime:
 
@@ -177,10 +303,202 @@ class GoogleClient:
             fields="items/liveStreamingDetails/scheduledStartTime",
         )
 
-        time_string = req.execute()["items"][0]["liveStreamingDetails"][
+        time_string = self._execute(req)["items"][0]["liveStreamingDetails"][
             "scheduledStartTime"
         ]
 
         start_time = isoparse(time_string)
 
         return start_time
+
+
+class ResponseCache:
+    """
+    TTL cache for coroutine results. Concurrent requests of same key share single fetch,
+    and recently expired entries are served stale while being refreshed in background.
+    """
+
+    def __init__(self):
+        # key: (value, fetched monotonic time)
+        self._entries: Dict[Any, Tuple[Any, float]] = {}
+        self._inflight: Dict[Any, asyncio.Task] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def _refresh(self, key, fetch: Callable[[], Awaitable]) -> asyncio.Task:
+        try:
+            return self._inflight[key]
+        except KeyError:
+            pass
+
+        async def runner():
+            try:
+                value = await fetch()
+                self._entries[key] = value, time.monotonic()
+                return value
+            finally:
+                del self._inflight[key]
+
+        def log_failure(task_: asyncio.Task):
+            # also retrieves exception, so background refresh failures aren't reported as never retrieved.
+            if not task_.cancelled() and (err := task_.exception()):
+                logger.warning("Refreshing {} failed: {}", key[0], repr(err))
+
+        task = self._inflight[key] = asyncio.get_running_loop().create_task(runner())
+        task.add_done_callback(log_failure)
+
+        return task
+
+    async def get(self, key, ttl: float, fetch: Callable[[], Awaitable]):
+        if not ttl:
+            return await fetch()
+
+        try:
+            value, fetched = self._entries[key]
+        except KeyError:
+            pass
+        else:
+            age = time.monotonic() - fetched
+
+            if age < ttl:
+                self.hits += 1
+                return value
+
+            if age < ttl * STALE_FACTOR:
+                self.stale_hits += 1
+                self._refresh(key, fetch)
+                return value
+
+        self.misses += 1
+
+        # shield so one caller timing out doesn't cancel fetch others are waiting on.
+        return await asyncio.shield(self._refresh(key, fetch))
+
+    def clear(self):
+        self._entries.clear()
+
+
+class AsyncGoogleClient:
+    """
+    Awaitable version of GoogleClient. Requests run on a small worker thread pool
+    so blocking http calls don't freeze the event loop, and responses are cached per CACHE_TTL.
+    """
+
+    def __init__(self, api_key=None, workers=4, timeout=10.0, cache_ttl: Union[Dict[str, float], None] = None):
+        self.client = GoogleClient(api_key)
+        self.timeout = timeout
+
+        self.cache = ResponseCache()
+        self.cache_ttl = dict(CACHE_TTL, **(cache_ttl or {}))
+
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="youtube_api")
+
+    @property
+    def quota(self) -> QuotaCounter:
+        return self.client.quota
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+        return await asyncio.wait_for(future, self.timeout)
+
+    async def _run(self, func, *args, fresh=False):
+        name = func.__name__
+        ttl = 0 if fresh else self.cache_ttl.get(name, 0)
+
+        return await self.cache.get((name, args), ttl, lambda: self._call(func, *args))
+
+    async def get_latest_videos(self, channel_id, fetch=3) -> Tuple[VideoInfo, ...]:
+        return await self._run(self.client.get_latest_videos, channel_id, fetch)
+
+    async def get_latest_videos_batch(self, channel_ids: Iterable[str], fetch=1) -> Dict[str, Tuple[VideoInfo, ...]]:
+        """
+        Fetches latest videos of all given channels concurrently.
+
+        :return: Dict of channel id: latest videos
+        """
+
+        channel_ids = tuple(channel_ids)
+        results = await asyncio.gather(*(self.get_latest_videos(id_, fetch) for id_ in channel_ids))
+
+        return dict(zip(channel_ids, results))
+
+    async def get_videos_info(self, *video_ids) -> Tuple[VideoInfo, ...]:
+
+        # each chunk is single request, run them concurrently.
+        chunks = [
+            video_ids[idx:idx + MAX_IDS_PER_REQUEST] for idx in range(0, len(video_ids), MAX_IDS_PER_REQUEST)
+        ]
+        results = await asyncio.gather(*(self._run(self.client.get_videos_info, *chunk) for chunk in chunks))
+
+        return tuple(info for result in results for info in result)
+
+    async def get_stream_status(self, video_id) -> str:
+        return await self._run(self.client.get_stream_status, video_id)
+
+    async def get_video_title(self, video_id) -> str:
+        return await self._run(self.client.get_video_title, video_id)
+
+    async def get_video_description(self, video_id) -> str:
+        return await self._run(self.client.get_video_description, video_id)
+
+    async def get_channel_id(self, video_id) -> str:
+        return await self._run(self.client.get_channel_id, video_id)
+
+    async def get_subscribers_count(self, channel_id) -> int:
+        return await self._run(self.client.get_subscribers_count, channel_id)
+
+    async def get_subscribers_counts(self, *channel_ids, fresh=False) -> Dict[str, int]:
+        """
+        :param fresh: Bypass cache, for pollers that need every sample to be current.
+        """
+
+        return await self._run(self.client.get_subscribers_counts, *channel_ids, fresh=fresh)
+
+    async def get_upcoming_streams(self, channel_id: str) -> Tuple[VideoInfo, ...]:
+        return await self._run(self.client.get_upcoming_streams, channel_id)
+
+    async def get_live_streams(self, channel_id: str) -> Tuple[VideoInfo, ...]:
+        return await self._run(self.client.get_live_streams, channel_id)
+
+    async def get_start_time(self, video_id) -> datetime.datetime:
+        return await self._run(self.client.get_start_time, video_id)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+# api key: client. This file isn't reloaded with module.py, so client survives module reloads.
+_shared_clients: Dict[str, AsyncGoogleClient] = {}
+
+
+def shared_client(
+    api_key: str, workers=4, timeout=10.0, cache_ttl: Union[Dict[str, float], None] = None
+) -> AsyncGoogleClient:
+    """
+    Returns client shared by all users of given api key.
+    Client is built on first call, and rebuilt only when api key changes.
+    """
+
+    try:
+        client = _shared_clients[api_key]
+    except KeyError:
+        pass
+    else:
+        client.timeout = timeout
+        client.cache_ttl = dict(CACHE_TTL, **(cache_ttl or {}))
+        return client
+
+    # key changed, old client won't be used anymore.
+    for old_client in _shared_clients.values():
+        old_client.close()
+
+    _shared_clients.clear()
+
+    client = AsyncGoogleClient(api_key, workers, timeout, cache_ttl)
+    _shared_clients[api_key] = client
+
+    return client
@@ -1,21 +1,234 @@
 """
 Linux Command sets for showing system information where bot is running.
+
+Built-in information is read from /proc and /etc, so no process is spawned for it.
+Extra fields can be configured per guild as shell commands in `commands`, which run concurrently
+with `command_timeout_sec` timeout each and have their output cached for `cache_ttl_sec`.
 """
 import asyncio
 import json
+import os
 import pathlib
+import shutil
+import signal
+import time
+from datetime import timedelta
+from typing import Dict, Tuple, Optional
 
-from discord.ext.commands import Context
+from discord.ext import tasks
+from discord.ext.commands import Context, Cog, Bot
 from discord import Embed
 from loguru import logger
 
-from .. import CommandRepresentation
+from .. import CommandRepresentation, CogRepresentation
+from ..instrumentation import registry
+from .proc_metrics import (
+    ProcCollector,
+    shared_collector,
+    read_uptime,
+    read_os_release,
+    read_cpu_model,
+    count_routes,
+    read_mounts,
+    read_updates_available,
+)
 
 
 config_path = pathlib.Path(__file__).parent.joinpath("config.json")
 loaded_config = json.loads(config_path.read_text())
 
 
+# metrics sampling, 10 minutes of history by default.
+SAMPLE_INTERVAL = 5
+HISTORY = 120
+RATE_WINDOW = 60
+
+# embed limits
+DESCRIPTION_LIMIT = 4096
+FIELD_LIMIT = 1024
+EMBED_LIMIT = 6000
+
+# command: (expire time in monotonic, task running or ran it)
+_output_cache: Dict[str, Tuple[float, asyncio.Task]] = {}
+
+
+def truncate(text: str, limit: int) -> str:
+    text = text.strip()
+
+    if not text:
+        # discord rejects empty field values
+        return "\u200b"
+
+    if len(text) <= limit:
+        return text
+
+    return text[:limit - 3] + "..."
+
+
+async def run_command(command: str, timeout: float) -> str:
+    # own session, so timeout can kill whole pipeline rather than just the shell.
+    proc = await asyncio.create_subprocess_shell(
+        command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, start_new_session=True
+    )
+
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+
+    except asyncio.TimeoutError:
+        logger.warning("Command timed out after {}s: {}", timeout, command)
+
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+        await proc.wait()
+        return f"Timed out after {timeout}s"
+
+    output = stdout.decode(errors="replace")
+    logger.debug(output)
+
+    return output
+
+
+async def cached_output(command: str, timeout: float, ttl: float) -> str:
+    """
+    Runs command, or returns it's output if it ran within ttl. Concurrent calls share a single run.
+    """
+
+    now = time.monotonic()
+
+    try:
+        expires, task = _output_cache[command]
+    except KeyError:
+        pass
+    else:
+        if expires > now:
+            return await asyncio.shield(task)
+
+    task = asyncio.create_task(run_command(command, timeout))
+    _output_cache[command] = now + ttl, task
+
+    return await asyncio.shield(task)
+
+
+def format_bytes(size: Optional[float], suffix="") -> str:
+    if size is None:
+        return "N/A"
+
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f}{unit}{suffix}"
+
+        size /= 1024
+
+    return f"{size:.1f}TiB{suffix}"
+
+
+def format_percent(value: Optional[float]) -> str:
+    return "N/A" if value is None else f"{value:.1f}%"
+
+
+def metrics_fields(collector: ProcCollector) -> Dict[str, str]:
+    """
+    Renders collected metrics, rates are averaged over RATE_WINDOW.
+    """
+
+    latest = collector.latest
+
+    if not latest:
+        return {}
+
+    rates = collector.rates(RATE_WINDOW)
+    fields = {}
+
+    if latest.load:
+        fields["Load"] = " / ".join(f"{load:.2f}" for load in latest.load) + f" | CPU {format_percent(rates.get('cpu'))}"
+
+    if latest.mem_total:
+        used = latest.mem_total - latest.mem_available
+        fields["Memory"] = (
+            f"{format_bytes(used)} / {format_bytes(latest.mem_total)} ({used / latest.mem_total * 100:.1f}%)"
+        )
+
+        if latest.swap_total:
+            swap_used = latest.swap_total - latest.swap_free
+            fields["Memory"] += f" | Swap {format_bytes(swap_used)} / {format_bytes(latest.swap_total)}"
+
+    disks = []
+
+    try:
+        mount_points = read_mounts()
+    except (OSError, ValueError) as err:
+        logger.warning("Failed to read mounts: {}", err)
+        mount_points = []
+
+    for mount_point in mount_points:
+        try:
+            usage = shutil.disk_usage(mount_point)
+        except OSError:
+            continue
+
+        disks.append(f"{mount_point} {format_bytes(usage.used)} / {format_bytes(usage.total)} used")
+
+    disks.append(
+        f"Read {format_bytes(rates.get('disk_read'), '/s')} | Write {format_bytes(rates.get('disk_write'), '/s')}"
+    )
+    fields["Disk"] = "\n".join(disks)
+
+    if rates:
+        fields["Network"] = f"In {format_bytes(rates['net_rx'], '/s')} | Out {format_bytes(rates['net_tx'], '/s')}"
+
+    fields["Bot process"] = f"RSS {format_bytes(latest.proc_rss)} | CPU {format_percent(rates.get('proc_cpu'))}"
+
+    # measured by instrumentation's lag monitor
+    lags = registry.lag_since(time.monotonic() - RATE_WINDOW)
+
+    if lags:
+        fields["Bot process"] += f" | Loop lag avg {sum(lags) / len(lags) * 1000:.1f}ms max {max(lags) * 1000:.1f}ms"
+
+    return fields
+
+
+def safe_read(func, *args) -> str:
+    try:
+        result = func(*args)
+    except (OSError, ValueError, IndexError) as err:
+        logger.warning("Failed to read system info with {}: {}", func.__name__, err)
+        return "N/A"
+
+    return "N/A" if result is None else str(result)
+
+
+def system_description() -> str:
+    """
+    Same information as motd header and update notice.
+    """
+
+    release = read_os_release()
+    uname = os.uname()
+
+    lines = [
+        f"Welcome to {release.get('PRETTY_NAME', uname.sysname)} ({uname.sysname} {uname.release} {uname.machine})",
+        f"Host {uname.nodename}, up {safe_read(lambda: timedelta(seconds=int(read_uptime())))}",
+    ]
+
+    updates = read_updates_available()
+
+    if updates:
+        lines.append(updates)
+
+    return "\n".join(lines)
+
+
+def info_fields() -> Dict[str, str]:
+    return {
+        "CPU Model": safe_read(read_cpu_model),
+        "IPv4 route count": safe_read(count_routes),
+        "IPv6 route count": safe_read(count_routes, True),
+    }
+
+
 async def system_information(context: Context):
     logger.debug("Called")
 
@@ -28,30 +241,62 @@ async def system_information(context: Context):
         await context.reply("You're not in whitelist!")
         return
 
-    description_proc = await asyncio.create_subprocess_shell(
-        loaded_config[guild_id]["linux_info_command"],
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-    stdout, _ = await description_proc.communicate()
+    guild_config = loaded_config[guild_id]
 
-    description = stdout.decode()
+    timeout = guild_config.get("command_timeout_sec", 5)
+    ttl = guild_config.get("cache_ttl_sec", 30)
 
-    logger.debug(description)
+    commands: Dict[str, str] = guild_config.get("commands", {})
+    outputs = await asyncio.gather(*(cached_output(command, timeout, ttl) for command in commands.values()))
 
-    embed = Embed(title="Brief System information", description=description)
+    embed = Embed(title="Brief System information", description=truncate(system_description(), DESCRIPTION_LIMIT))
 
-    for key, val in loaded_config[guild_id]["commands"].items():
-        proc = await asyncio.create_subprocess_shell(
-            val, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-        )
-        stdout, _ = await proc.communicate()
+    # whole embed has it's own limit on top of per field ones.
+    budget = EMBED_LIMIT - len(embed.title) - len(embed.description)
+
+    fields = metrics_fields(shared_collector(HISTORY))
+    fields.update(info_fields())
+    fields.update(zip(commands, outputs))
+
+    for key, output in fields.items():
+        remaining = budget - len(key)
 
-        logger.debug(dec := stdout.decode())
+        if remaining < 4:
+            logger.warning("Embed size limit reached, dropping fields from '{}'.", key)
+            break
 
-        embed.add_field(name=key, value=dec, inline=False)
+        value = truncate(output, min(FIELD_LIMIT, remaining))
+        budget = remaining - len(value)
+
+        embed.add_field(name=key, value=value, inline=False)
 
     await context.reply(embed=embed)
 
 
-__all__ = [CommandRepresentation(system_information, name="sysinfo", help="Get general system info. But why?")]
+class MetricsCog(Cog):
+    """
+    Samples system metrics every SAMPLE_INTERVAL.
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.collector = shared_collector(HISTORY)
+
+        logger.info(f"[{type(self).__name__}] Init")
+
+        self.sample.start()
+
+    def cog_unload(self):
+        logger.info(f"[{type(self).__name__}] Unloading")
+
+        self.sample.cancel()
+
+    @tasks.loop(seconds=SAMPLE_INTERVAL)
+    async def sample(self):
+        self.collector.sample()
+
+
+__all__ = [
+    CommandRepresentation(system_information, name="sysinfo", help="Get general system info. But why?"),
+    CogRepresentation(MetricsCog),
+]
@@ -0,0 +1,329 @@
+"""
+In-process system metrics sampled from /proc into fixed-size ring buffer.
+
+Counters (cpu time, network and disk bytes) are kept raw, rates are computed over requested window
+when rendering. Sampling only reads a few small files, so it's cheap enough to run on event loop.
+
+This file is not reloaded with module.py, so collected history survives module reloads.
+"""
+
+import os
+import pathlib
+import re
+import resource
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+
+PAGE_SIZE = resource.getpagesize()
+SECTOR_SIZE = 512
+
+# filesystems without disk behind them, df leaves these out too.
+VIRTUAL_FS = frozenset((
+    "autofs", "binfmt_misc", "bpf", "cgroup", "cgroup2", "configfs", "debugfs", "devpts", "devtmpfs", "efivarfs",
+    "fusectl", "hugetlbfs", "mqueue", "nsfs", "proc", "pstore", "ramfs", "rpc_pipefs", "securityfs", "selinuxfs",
+    "squashfs", "sysfs", "tmpfs", "tracefs",
+))
+
+
+class Sample(NamedTuple):
+    time: float
+
+    load: Optional[List[float]]
+    mem_total: Optional[int]
+    mem_available: Optional[int]
+    swap_total: Optional[int]
+    swap_free: Optional[int]
+
+    # counters
+    cpu_busy: Optional[int]
+    cpu_total: Optional[int]
+    net_rx: Optional[int]
+    net_tx: Optional[int]
+    disk_read: Optional[int]
+    disk_write: Optional[int]
+
+    # bot process
+    proc_cpu: float
+    proc_rss: Optional[int]
+
+
+def read_loadavg() -> List[float]:
+    return [float(val) for val in pathlib.Path("/proc/loadavg").read_text().split()[:3]]
+
+
+def read_meminfo() -> Dict[str, int]:
+    output = {}
+
+    with open("/proc/meminfo") as fp:
+        for line in fp:
+            key, val = line.split(":", 1)
+            output[key] = int(val.split()[0]) * 1024
+
+    return output
+
+
+def read_cpu():
+    """
+    :return: Tuple of (busy jiffies, total jiffies)
+    """
+
+    with open("/proc/stat") as fp:
+        fields = [int(val) for val in fp.readline().split()[1:]]
+
+    # idle + iowait
+    idle = fields[3] + fields[4]
+    total = sum(fields[:8])
+
+    return total - idle, total
+
+
+def read_net_dev():
+    """
+    :return: Tuple of (received bytes, sent bytes) summed over all interfaces except loopback
+    """
+
+    rx = tx = 0
+
+    with open("/proc/net/dev") as fp:
+        # skip 2 header lines
+        for line in list(fp)[2:]:
+            name, data = line.split(":", 1)
+
+            if name.strip() == "lo":
+                continue
+
+            fields = data.split()
+            rx += int(fields[0])
+            tx += int(fields[8])
+
+    return rx, tx
+
+
+def list_disks() -> List[str]:
+    """
+    Lists whole physical disks, so partitions and virtual devices on top of them aren't counted twice.
+    """
+
+    try:
+        names = os.listdir("/sys/block")
+    except FileNotFoundError:
+        return []
+
+    return [name for name in names if not name.startswith(("loop", "ram", "zram", "dm-", "md"))]
+
+
+def read_diskstats(disks: List[str]):
+    """
+    :return: Tuple of (read bytes, written bytes) summed over given disks
+    """
+
+    read = written = 0
+
+    with open("/proc/diskstats") as fp:
+        for line in fp:
+            fields = line.split()
+
+            if fields[2] in disks:
+                read += int(fields[5])
+                written += int(fields[9])
+
+    return read * SECTOR_SIZE, written * SECTOR_SIZE
+
+
+def read_mounts(path: str = "/proc/mounts") -> List[str]:
+    """
+    Lists mount points of disk backed filesystems, only first one of each device like df does.
+    """
+
+    seen = set()
+    output = []
+
+    with open(path) as fp:
+        for line in fp:
+            device, mount_point, fs_type = line.split()[:3]
+
+            if fs_type in VIRTUAL_FS or device in seen:
+                continue
+
+            seen.add(device)
+
+            # whitespace in path is octal escaped, like \040 for space.
+            output.append(re.sub(r"\\([0-7]{3})", lambda match: chr(int(match.group(1), 8)), mount_point))
+
+    return output
+
+
+def read_rss() -> int:
+    with open("/proc/self/statm") as fp:
+        return int(fp.read().split()[1]) * PAGE_SIZE
+
+
+def read_uptime() -> float:
+    return float(pathlib.Path("/proc/uptime").read_text().split()[0])
+
+
+def read_os_release() -> Dict[str, str]:
+    """
+    Parses os-release, which is KEY="value" per line.
+    """
+
+    for path in ("/etc/os-release", "/usr/lib/os-release"):
+        try:
+            lines = pathlib.Path(path).read_text().splitlines()
+        except OSError:
+            continue
+
+        output = {}
+
+        for line in lines:
+            key, sep, val = line.partition("=")
+
+            if sep and not key.startswith("#"):
+                output[key.strip()] = val.strip().strip("\"'")
+
+        return output
+
+    return {}
+
+
+def read_cpu_model() -> Optional[str]:
+    with open("/proc/cpuinfo") as fp:
+        for line in fp:
+            key, _, val = line.partition(":")
+
+            if key.strip() == "model name":
+                return val.strip()
+
+    return None
+
+
+def count_routes(ipv6=False) -> int:
+    """
+    Counts routes in kernel's routing table, excluding loopback ones for IPv6 as `ip -6 route` mostly does.
+    """
+
+    if not ipv6:
+        with open("/proc/net/route") as fp:
+            # skip header
+            return sum(1 for _ in fp) - 1
+
+    with open("/proc/net/ipv6_route") as fp:
+        return sum(1 for line in fp if line.split()[-1] != "lo")
+
+
+def read_updates_available() -> Optional[str]:
+    """
+    Returns update count message of update-notifier, which is what motd shows, if system has one.
+    """
+
+    try:
+        return pathlib.Path("/var/lib/update-notifier/updates-available").read_text().strip() or None
+    except OSError:
+        return None
+
+
+class ProcCollector:
+    def __init__(self, history: int):
+        self.samples: Deque[Sample] = deque(maxlen=history)
+        self.disks = list_disks()
+
+    def sample(self) -> Sample:
+        def safe(func, *args, default=None):
+            try:
+                return func(*args)
+            except (OSError, ValueError, IndexError):
+                return default
+
+        load = safe(read_loadavg)
+        mem = safe(read_meminfo, default={})
+        cpu_busy, cpu_total = safe(read_cpu, default=(None, None))
+        net_rx, net_tx = safe(read_net_dev, default=(None, None))
+        disk_read, disk_write = safe(read_diskstats, self.disks, default=(None, None))
+
+        sample = Sample(
+            time.monotonic(),
+            load,
+            mem.get("MemTotal"),
+            mem.get("MemAvailable"),
+            mem.get("SwapTotal"),
+            mem.get("SwapFree"),
+            cpu_busy,
+            cpu_total,
+            net_rx,
+            net_tx,
+            disk_read,
+            disk_write,
+            time.process_time(),
+            safe(read_rss),
+        )
+
+        self.samples.append(sample)
+        return sample
+
+    @property
+    def latest(self) -> Optional[Sample]:
+        return self.samples[-1] if self.samples else None
+
+    def window(self, seconds: float) -> List[Sample]:
+        """
+        Returns samples within last given seconds, oldest first.
+        """
+
+        if not self.samples:
+            return []
+
+        since = self.samples[-1].time - seconds
+        output = [sample for sample in reversed(self.samples) if sample.time >= since]
+
+        return output[::-1]
+
+    def rates(self, seconds: float) -> Dict[str, Optional[float]]:
+        """
+        Computes per second rates of counters over last given seconds.
+        CPU usages are in percent, others in bytes/sec.
+        """
+
+        samples = self.window(seconds)
+
+        if len(samples) < 2:
+            return {}
+
+        first, last = samples[0], samples[-1]
+        elapsed = last.time - first.time
+
+        def per_sec(field: str) -> Optional[float]:
+            start, end = getattr(first, field), getattr(last, field)
+
+            if start is None or end is None:
+                return None
+
+            return (end - start) / elapsed
+
+        output = {key: per_sec(key) for key in ("net_rx", "net_tx", "disk_read", "disk_write")}
+
+        if first.cpu_total is not None and last.cpu_total != first.cpu_total:
+            output["cpu"] = (last.cpu_busy - first.cpu_busy) / (last.cpu_total - first.cpu_total) * 100
+        else:
+            output["cpu"] = None
+
+        output["proc_cpu"] = per_sec("proc_cpu") * 100
+
+        return output
+
+
+_collector: Optional[ProcCollector] = None
+
+
+def shared_collector(history: int) -> ProcCollector:
+    """
+    Returns collector kept across module reloads.
+    """
+
+    global _collector
+
+    if _collector is None or _collector.samples.maxlen != history:
+        _collector = ProcCollector(history)
+
+    return _collector
@@ -7,12 +7,14 @@ https://gist.github.com/jupiterbjy/dcf4dd27784c80369b76c65d2077b643
 
 import pathlib
 import asyncio
+import codecs
 import json
 
 from datetime import datetime
+from typing import AsyncGenerator, Tuple, Union
 
 from discord.ext.commands import Context, errors
-from discord import Embed, Colour
+from discord import Embed, Colour, Message, HTTPException
 from loguru import logger
 
 from .. import CommandRepresentation
@@ -25,6 +27,11 @@ end_signature_encoded = end_signature.encode(codec)
 config_path = pathlib.Path(__file__).parent.joinpath("config.json")
 config = json.loads(config_path.read_text())
 
+# streaming mode options, defaults are used when config doesn't have them.
+stream_output: bool = config.get("stream_output", True)
+stream_edit_interval: float = config.get("stream_edit_interval", 1.5)
+execution_deadline: float = config.get("execution_deadline", 60)
+
 
 def encode(string: str):
     string += end_signature
@@ -47,6 +54,170 @@ async def receive_data(reader: asyncio.StreamReader) -> bytes:
     return data
 
 
+async def receive_data_stream(reader: asyncio.StreamReader, deadline: float) -> AsyncGenerator[str, None]:
+    """
+    Yields decoded output chunks as they arrive, until end signature is received.
+
+    :param reader: StreamReader connected to execution server
+    :param deadline: loop time after which asyncio.TimeoutError is raised
+    """
+
+    loop = asyncio.get_running_loop()
+    decoder = codecs.getincrementaldecoder(codec)()
+    data = b""
+
+    while end_signature_encoded not in data:
+        remaining = deadline - loop.time()
+
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+
+        chunk = await asyncio.wait_for(reader.read(1024), timeout=remaining)
+
+        if not chunk:
+            # server closed connection without end signature, nothing more to wait for.
+            break
+
+        # keep only tail for signature check, signature may be split between chunks.
+        data = data[-len(end_signature_encoded):] + chunk
+
+        yield decoder.decode(chunk)
+
+    yield decoder.decode(b"", final=True)
+
+
+def parse_response(resp: str) -> Tuple[str, Union[int, str]]:
+    """
+    Strips return code line from server response.
+
+    :return: Tuple of (output, return code)
+    """
+
+    lines = resp.split("\n")
+
+    if "Return code" in lines[-1]:
+        try:
+            return_code = int(lines[-1].split()[-1])
+        except ValueError:
+            return_code = "No return code"
+
+        resp = "\n".join(lines[:-1])
+    else:
+        return_code = "No return code"
+
+    return resp, return_code
+
+
+def result_embed(return_code: Union[int, str], duration: float) -> Embed:
+
+    # prepare image and color
+    image_url = config["image_success"] if not return_code else config["image_failed"]
+    color = Colour.from_rgb(122, 196, 92) if not return_code else Colour.from_rgb(196, 92, 92)
+
+    # prepare embed
+    embed = Embed(colour=color)
+    embed.add_field(name="Return code", value=str(return_code))
+    embed.add_field(name="Duration(with Network)", value=f"{int(duration)}s")
+    embed.set_thumbnail(url=image_url)
+
+    return embed
+
+
+def limit_size(resp: str, limit: int = 2000) -> str:
+
+    # size limit
+    if len(resp) >= limit:
+        if resp.endswith("```"):
+            resp = resp[:limit - 7] + "\n...```"
+        else:
+            resp = resp[:limit - 4] + "\n..."
+
+    return resp
+
+
+class ThrottledReply:
+    """
+    Keeps single reply message updated with latest content,
+    coalescing edits so that message is edited at most once per interval.
+    """
+
+    def __init__(self, context: Context, interval: float):
+        self.context = context
+        self.interval = interval
+
+        self.message: Union[Message, None] = None
+        self.content = ""
+
+        self._last_edit = 0.0
+        self._pending: Union[asyncio.Task, None] = None
+
+        # whether pending task is past it's delay and sending, which must not be cancelled.
+        self._flushing = False
+
+    @staticmethod
+    def _format(content: str) -> str:
+        # show tail of output while running, that's what user is waiting for.
+        return f"```\n{content[-1900:]}\u200b```"
+
+    async def _flush(self):
+        self._last_edit = asyncio.get_running_loop().time()
+
+        try:
+            if self.message is None:
+                self.message = await self.context.reply(self._format(self.content))
+            else:
+                await self.message.edit(content=self._format(self.content))
+
+        except HTTPException as err:
+            # partial output only, next update or finish sends newer content anyway.
+            logger.warning("Failed to update partial output: {}", err)
+
+    async def _delayed_flush(self, delay: float):
+        await asyncio.sleep(delay)
+
+        self._flushing = True
+
+        try:
+            await self._flush()
+        finally:
+            self._flushing = False
+            self._pending = None
+
+    async def update(self, content: str):
+        self.content = content
+
+        elapsed = asyncio.get_running_loop().time() - self._last_edit
+
+        if elapsed >= self.interval:
+            await self._flush()
+
+        elif self._pending is None:
+            # schedule an edit for end of this interval, later updates will be picked up by it.
+            self._pending = asyncio.create_task(self._delayed_flush(self.interval - elapsed))
+
+    async def finish(self, content: str, embed: Union[Embed, None] = None):
+        pending, self._pending = self._pending, None
+
+        if pending is not None:
+            # reply already in flight is waited for instead, or it could be sent twice.
+            if not self._flushing:
+                pending.cancel()
+
+            try:
+                await pending
+            except asyncio.CancelledError:
+                pass
+
+        try:
+            if self.message is None:
+                self.message = await self.context.reply(content, embed=embed)
+            else:
+                await self.message.edit(content=content, embed=embed)
+
+        except HTTPException as err:
+            logger.warning("Failed to send final output: {}", err)
+
+
 async def run_script(context: Context, *, code: str):
     # Extract code
     striped = code.strip()
@@ -107,6 +278,14 @@ async def run_script(context: Context, *, code: str):
 
     logger.info("Sent {}", len(send_byte))
 
+    if stream_output:
+        try:
+            await relay_stream(context, reader, start_time)
+        finally:
+            writer.close()
+
+        return
+
     # read data until delim is received
     try:
         data = await receive_data(reader)
@@ -122,39 +301,54 @@ async def run_script(context: Context, *, code: str):
     logger.debug("Got response, size {}", len(data))
 
     # decode and get return code
-    resp = decode(data)
+    resp, return_code = parse_response(decode(data))
 
-    # strip and get return cord
-    lines = resp.split("\n")
+    embed = result_embed(return_code, (end_time - start_time).total_seconds())
 
-    if "Return code" in lines[-1]:
-        try:
-            return_code = int(lines[-1].split()[-1])
-        except ValueError:
-            return_code = "No return code"
+    await context.reply(limit_size(resp), embed=embed)
 
-        resp = "\n".join(lines[:-1])
-    else:
-        return_code = "No return code"
 
-    # prepare image and color
-    image_url = config["image_success"] if not return_code else config["image_failed"]
-    color = Colour.from_rgb(122, 196, 92) if not return_code else Colour.from_rgb(196, 92, 92)
+async def relay_stream(context: Context, reader: asyncio.StreamReader, start_time: datetime):
+    """
+    Relays partial output to a single reply message while script is running,
+    then finishes that message with return code embed.
+    """
 
-    # prepare embed
-    embed = Embed(colour=color)
-    embed.add_field(name="Return code", value=str(return_code))
-    embed.add_field(name="Duration(with Network)", value=f"{(end_time - start_time).seconds}s")
-    embed.set_thumbnail(url=image_url)
+    deadline = asyncio.get_running_loop().time() + execution_deadline
+    reply = ThrottledReply(context, stream_edit_interval)
 
-    # size limit
-    if len(resp) >= 2000:
-        if resp.endswith("```"):
-            resp = resp[:1993] + "\n...```"
-        else:
-            resp = resp[:1996] + "\n..."
+    received = []
+
+    # only tail is shown while running, so only tail is joined per chunk.
+    tail = ""
+    tail_size = 2000 + len(end_signature)
+
+    try:
+        async for chunk in receive_data_stream(reader, deadline):
+            if not chunk:
+                continue
+
+            received.append(chunk)
+            tail = (tail + chunk)[-tail_size:]
+
+            await reply.update(tail.replace(end_signature, ""))
+
+    except asyncio.TimeoutError:
+        notice = f"\nExecution exceeded {execution_deadline}s deadline, stopped waiting for results."
+
+        await reply.finish(limit_size("".join(received).replace(end_signature, ""), 2000 - len(notice)) + notice)
+        return
+
+    end_time = datetime.now()
+
+    resp = "".join(received).replace(end_signature, "")
+    logger.debug("Got streamed response, size {}", len(resp))
+
+    resp, return_code = parse_response(resp.rstrip("\n"))
+
+    embed = result_embed(return_code, (end_time - start_time).total_seconds())
 
-    await context.reply(resp, embed=embed)
+    await reply.finish(limit_size(resp), embed=embed)
 
 
 __all__ = [CommandRepresentation(run_script, name="py", help="Execute python code remotely.")]
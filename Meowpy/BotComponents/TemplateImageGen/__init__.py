@@ -0,0 +1,2 @@
+# imported on first use of these commands instead of at startup, see DynamicLoader.
+LAZY_COMMANDS = ["template"]
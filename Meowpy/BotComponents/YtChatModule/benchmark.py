@@ -0,0 +1,58 @@
+"""
+Replays ChatOutputExample.json through embed conversion and prints messages/sec.
+
+Run from Meowpy directory:
+python -m BotComponents.YtChatModule.benchmark -n 20000
+"""
+
+import argparse
+import json
+import pathlib
+import time
+
+from .module import build_embed, chat_from_dict
+
+
+EXAMPLE_PATH = pathlib.Path(__file__).parent.joinpath("ChatOutputExample.json")
+
+
+def prepare_chats(count: int):
+    example = json.loads(EXAMPLE_PATH.read_text())
+
+    example["message"] = "Hello :_cyanCute: meow :_cyanKusa:"
+    example["timestamp"] = int(time.time() * 1000)
+
+    return [chat_from_dict(example) for _ in range(count)]
+
+
+def run(name: str, func, chats):
+    start = time.perf_counter()
+
+    for chat in chats:
+        func(chat)
+
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {len(chats) / elapsed:>12.0f} messages/sec")
+
+
+def json_round_trip(chat):
+    # what callback used to do per chat before building embed.
+    json_data = json.loads(chat.json())
+    json.dumps(json_data, indent=2)
+
+    return build_embed(chat)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", type=int, default=20000, help="Number of chats to replay.")
+
+    args = parser.parse_args()
+    chats = prepare_chats(args.count)
+
+    run("json round trip", json_round_trip, chats)
+    run("attribute access", build_embed, chats)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,21 @@
 import asyncio
 import pathlib
 import json
+import re
+import time
+import random
+from collections import deque
 from datetime import datetime
-from typing import Dict, Union, List
+from types import SimpleNamespace
+from typing import Dict, Union, List, Deque, Tuple, Callable
 
 from pytchat import LiveChatAsync
+from pytchat.exceptions import ChatDataFinished, NoContents, InvalidVideoIdException
 from pytchat.processors.default.processor import Chatdata, Chat
 from discord.ext.commands import Cog, Bot, Context, command
 from discord.ext import tasks
 from discord.embeds import EmptyEmbed
-from discord import Embed, TextChannel, Colour
+from discord import Embed, TextChannel, Colour, HTTPException
 from loguru import logger
 
 
@@ -19,16 +25,35 @@ from .. import CogRepresentation
 config_path = pathlib.Path(__file__).parent.joinpath("config.json")
 config: Dict[str, Union[str, int]] = json.loads(config_path.read_text())
 
-yt_vid_id: str
-discord_ch_id: int
+# relays added/removed by commands are saved here, not in config.json,
+# so saving them doesn't look like source change to loader's file watcher.
+relays_path = pathlib.Path(__file__).parent.joinpath("cache", "relays.json")
+
+yt_vid_id = ""
+discord_ch_id = 0
+relays: Dict[str, int] = {}
 interval_sec: int
 timezone_str: str
 command_whitelist: List[int]
 role_symbol: Dict[str, str]
 emoji_mapping: Dict[str, str]
+batch_window_sec: float = 1.0
+backlog_threshold: int = 100
+restart_base_sec: float = 5
+restart_cap_sec: float = 300
 
 locals().update(config)
 
+# older config only had single stream to single channel.
+if not relays and yt_vid_id:
+    relays = {yt_vid_id: discord_ch_id}
+
+# config.json's relays are only initial ones, until first add/remove.
+if relays_path.exists():
+    relays = json.loads(relays_path.read_text())
+
+PRIORITY_TYPES = ("superChat", "superSticker", "newSponsor")
+
 
 def argb_to_rgb(argb: int):
     # what a mess..
@@ -39,82 +64,358 @@ def argb_to_rgb(argb: int):
     return int(hex(argb)[2:].zfill(8)[2:], base=16)
 
 
+class EmojiSubstitution:
+    """
+    Replaces all youtube emoji tokens in message with discord emojis in single pass,
+    using one alternation regex compiled from emoji mapping.
+    """
+
+    def __init__(self, mapping: Dict[str, str]):
+        self.mapping: Dict[str, str] = {}
+        self.pattern: Union[re.Pattern, None] = None
+
+        self.update(mapping)
+
+    def update(self, mapping: Dict[str, str]):
+        """
+        Rebuilds pattern if mapping differs from currently compiled one.
+        """
+
+        if mapping == self.mapping and self.pattern is not None:
+            return
+
+        self.mapping = dict(mapping)
+
+        # longest first, so token that is prefix of another won't shadow it.
+        tokens = sorted(self.mapping, key=len, reverse=True)
+        self.pattern = re.compile("|".join(map(re.escape, tokens))) if tokens else None
+
+        logger.debug("[ChatRelay] Compiled {} emoji mappings.", len(tokens))
+
+    def __call__(self, message: str) -> str:
+        if self.pattern is None:
+            return message
+
+        return self.pattern.sub(lambda match: self.mapping[match.group()], message)
+
+
+emoji_substitution = EmojiSubstitution(emoji_mapping)
+
+
 def error_to_embed(err: Exception):
     return Embed(title=str(type(err).__name__), description=err)
 
 
-class YoutubeChatRelayCog(Cog):
+def chat_from_dict(json_data: dict) -> SimpleNamespace:
+    """
+    Wraps chat json (format of ChatOutputExample.json) into object with same attributes as pytchat's Chat.
+    Used for feeding recorded chats to relay.
 
-    def __init__(self, bot: Bot):
-        self.bot = bot
-        self.vid_id = yt_vid_id
+    :param json_data: mapping type from message json.
+    """
 
-        logger.info("[ChatRelay] starting.")
+    chat = SimpleNamespace(**json_data)
+    chat.author = SimpleNamespace(**json_data["author"])
+    chat.json = lambda: json.dumps(json_data)
 
-        self.livechat: Union[LiveChatAsync, None] = None
+    return chat
 
-        self.load_livechat()
 
-    def cog_unload(self):
-        logger.info("[ChatRelay] Stopping.")
+async def check_whitelist(context: Context) -> bool:
+    if context.author.id not in command_whitelist:
+        await context.reply("Your user ID is not listed in whitelist.")
+        logger.warning("User '{}' is not in whitelist.", context.author.display_name)
+
+        return False
+
+    return True
+
+
+def embed_apply_type(embed: Embed, chat: Chat):
+    """
+    Adds corresponding stuffs to embed based on message's type.
+
+    :param embed: Discord embed
+    :param chat: pytchat Chat, or anything with same attributes.
+    """
+
+    type_: str = chat.type
+
+    # originally thought of using dict and lambda, but this was much simpler.
+    # obviously ordered to most frequent order.
+
+    if type_ == "textMessage":
+        pass
+
+    elif type_ == "superChat":
+        embed.title = chat.amountString
+
+    elif type_ == "newSponsor":
+        embed.title = "New member"
+        embed.colour = Colour(value=int("0f9d5", base=16))
+
+    elif type_ == "superSticker":
+        embed.title = chat.amountString
+        embed.set_thumbnail(url=chat.sticker)
+
+
+def embed_set_author(embed: Embed, chat: Chat):
+    """
+    Adds author fields to embed.
+
+    :param embed: Discord embed
+    :param chat: pytchat Chat, or anything with same attributes.
+    """
+
+    author = chat.author
+
+    # prep icon
+    icon = url if (url := author.imageUrl) else EmptyEmbed
+
+    # determine role
+    if author.isChatOwner:
+        role = "owner"
+    elif author.isChatModerator:
+        role = "moderator"
+    elif author.isChatSponsor:
+        role = "member"
+    else:
+        role = "default"
+
+    name = " ".join((author.name, role_symbol[role]))
+
+    embed.set_author(name=name, url=author.channelUrl, icon_url=icon)
+
+
+def build_embed(chat: Chat) -> Embed:
+    """
+    Converts single chat item to discord embed.
+
+    :param chat: pytchat Chat, or anything with same attributes.
+    """
+
+    # prepare message
+    message: str = emoji_substitution(chat.message)
+
+    bg_color: int = argb_to_rgb(chat.bgColor)
+
+    # Start writing embed
+    embed = Embed(description=message, colour=bg_color)
+
+    # write author and type specific stuffs
+    embed_apply_type(embed, chat)
+    embed_set_author(embed, chat)
+
+    # set utc time
+    embed.timestamp = datetime.utcfromtimestamp(chat.timestamp / 1000.0)
+    # embed.set_footer(text=f"{utc_aware.strftime(type_ + ' %Y-%m-%d %H:%M:%S (UTC)')}")
+
+    return embed
+
+
+class EmbedBatcher:
+    """
+    Collects embeds for single channel and sends them as few messages as possible,
+    up to 10 embeds or 6000 characters per message as discord allows.
 
-        self.livechat.terminate()
+    Priority embeds(superChat, newSponsor..) are sent ahead of plain text ones.
+    When plain text backlog grows past threshold, oldest ones are dropped and summarised.
+    """
 
-    @staticmethod
-    def embed_apply_type(embed: Embed, json_data: dict):
+    max_embeds = 10
+    max_chars = 6000
+
+    def __init__(self, channel_getter: Callable[[], Union[TextChannel, None]], threshold: int):
+        self.channel_getter = channel_getter
+        self.threshold = threshold
+
+        # (received monotonic time, embed)
+        self.priority: Deque[Tuple[float, Embed]] = deque()
+        self.normal: Deque[Tuple[float, Embed]] = deque()
+
+        # metrics
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.sent_messages = 0
+        self.sent_embeds = 0
+        self.skipped = 0
+        self._skipped_pending = 0
+
+    @property
+    def backlog(self) -> int:
+        return len(self.priority) + len(self.normal)
+
+    @property
+    def pending(self) -> bool:
+        return bool(self.backlog or self._skipped_pending)
+
+    def put(self, embed: Embed, priority=False, received: Union[float, None] = None):
+        received = time.monotonic() if received is None else received
+
+        (self.priority if priority else self.normal).append((received, embed))
+
+    def _trim_backlog(self):
+        excess = len(self.normal) - self.threshold
+
+        if excess <= 0:
+            return
+
+        for _ in range(excess):
+            self.normal.popleft()
+
+        self.skipped += excess
+        self._skipped_pending += excess
+
+        logger.warning("[ChatRelay] Backlog over {}, skipped {} messages.", self.threshold, excess)
+
+    def _next_batch(self) -> Tuple[List[Embed], float]:
         """
-        Adds corresponding stuffs to embed based on message's type.
+        Pops next batch of embeds.
 
-        :param embed: Discord embed
-        :param json_data: mapping type from message json.
+        :return: Tuple of (embeds, oldest received time in batch)
         """
 
-        type_: str = json_data["type"]
+        self._trim_backlog()
 
-        # originally thought of using dict and lambda, but this was much simpler.
-        # obviously ordered to most frequent order.
+        batch = []
+        size = 0
+        oldest = time.monotonic()
 
-        if type_ == "textMessage":
-            pass
+        if self._skipped_pending:
+            summary = Embed(description=f"Skipped {self._skipped_pending} message(s) to catch up with chat.")
+            self._skipped_pending = 0
 
-        elif type_ == "superChat":
-            embed.title = json_data["amountString"]
+            batch.append(summary)
+            size += len(summary)
 
-        elif type_ == "newSponsor":
-            embed.title = "New member"
-            embed.colour = Colour(value=int("0f9d5", base=16))
+        for queue in (self.priority, self.normal):
+            while queue and len(batch) < self.max_embeds:
+                received, embed = queue[0]
+                length = len(embed)
 
-        elif type_ == "superSticker":
-            embed.title = json_data["amountString"]
-            embed.set_thumbnail(url=json_data["sticker"])
+                # always send at least one, otherwise oversized embed will block the queue forever.
+                if batch and size + length > self.max_chars:
+                    return batch, oldest
 
-    @staticmethod
-    def embed_set_author(embed: Embed, json_data: dict):
-        """
-        Adds author fields to embed.
+                queue.popleft()
+                batch.append(embed)
+                size += length
+                oldest = min(oldest, received)
+
+        return batch, oldest
+
+    async def send_batch(self):
+        batch, oldest = self._next_batch()
+
+        if not batch:
+            return
+
+        channel = self.channel_getter()
+
+        if channel is None:
+            logger.critical("[ChatRelay] Unknown channel, dropping {} embeds. Check configuration!", len(batch))
+            return
+
+        try:
+            await channel.send(embeds=batch)
+
+        except HTTPException as err:
+            logger.warning("[ChatRelay] Failed to send {} embeds: {}", len(batch), err)
+            return
+
+        self.lag = time.monotonic() - oldest
+        self.max_lag = max(self.max_lag, self.lag)
+        self.sent_messages += 1
+        self.sent_embeds += len(batch)
+
+    def stats_text(self) -> str:
+        return (
+            f"Lag {self.lag:.2f}s (max {self.max_lag:.2f}s)\n"
+            f"Backlog {self.backlog}\n"
+            f"Sent {self.sent_embeds} embeds / {self.sent_messages} messages\n"
+            f"Skipped {self.skipped}"
+        )
 
-        :param embed: Discord embed
-        :param json_data: mapping type from message json.
+
+class DeliveryScheduler:
+    """
+    Single delivery loop shared by all relays, with one EmbedBatcher per discord channel.
+    Channels with pending embeds are served round-robin, one message each per turn.
+    """
+
+    def __init__(self, bot: Bot, window: float, threshold: int):
+        self.bot = bot
+        self.window = window
+        self.threshold = threshold
+
+        self.batchers: Dict[int, EmbedBatcher] = {}
+        self._event = asyncio.Event()
+
+    def batcher(self, channel_id: int) -> EmbedBatcher:
+        try:
+            return self.batchers[channel_id]
+        except KeyError:
+            batcher = EmbedBatcher(lambda: self.bot.get_channel(channel_id), self.threshold)
+            self.batchers[channel_id] = batcher
+
+            return batcher
+
+    def put(self, channel_id: int, embed: Embed, priority=False):
+        self.batcher(channel_id).put(embed, priority)
+        self._event.set()
+
+    def drop(self, channel_id: int):
         """
+        Removes batcher of channel no relay sends to anymore, discarding what's left in it.
+        """
+
+        self.batchers.pop(channel_id, None)
+
+    async def run(self):
+        while True:
+            await self._event.wait()
+
+            # give chats a moment to pile up so they fit in fewer messages.
+            await asyncio.sleep(self.window)
 
-        author_dict: dict = json_data["author"]
+            while pending := [batcher for batcher in self.batchers.values() if batcher.pending]:
+                for batcher in pending:
+                    await batcher.send_batch()
 
-        # prep icon
-        icon = url if (url := author_dict["imageUrl"]) else EmptyEmbed
+            self._event.clear()
 
-        # determine role
-        if author_dict["isChatOwner"]:
-            role = "owner"
-        elif author_dict["isChatModerator"]:
-            role = "moderator"
-        elif author_dict["isChatSponsor"]:
-            role = "member"
-        else:
-            role = "default"
 
-        name = " ".join((author_dict["name"], role_symbol[role]))
+class StreamRelay:
+    """
+    Relays chat of single youtube stream to single discord channel,
+    restarting it's LiveChatAsync independently of other relays.
+    """
 
-        embed.set_author(name=name, url=author_dict["channelUrl"], icon_url=icon)
+    # relay that stayed up this long is considered healthy, and backoff is reset.
+    healthy_after = 60
+
+    def __init__(self, bot: Bot, video_id: str, channel_id: int, scheduler: DeliveryScheduler):
+        self.bot = bot
+        self.video_id = video_id
+        self.channel_id = channel_id
+        self.scheduler = scheduler
+
+        self.livechat: Union[LiveChatAsync, None] = None
+        self.task: Union[asyncio.Task, None] = None
+
+        self.restart_count = 0
+        self.failures = 0
+
+        # accumulated downtime, and monotonic time when relay went down if currently down.
+        self.downtime = 0.0
+        self.down_since: Union[float, None] = None
+
+    @property
+    def channel(self) -> Union[TextChannel, None]:
+        return self.bot.get_channel(self.channel_id)
+
+    def is_alive(self) -> bool:
+        return self.livechat is not None and self.livechat.is_alive()
 
     async def callback(self, chat_data: Chatdata):
         """
@@ -124,126 +425,311 @@ class YoutubeChatRelayCog(Cog):
         :return:
         """
 
-        channel: TextChannel = self.bot.get_channel(discord_ch_id)
-
         async for chat in chat_data.async_items():
             chat: Chat
 
-            json_data: dict = json.loads(chat.json())
+            # only serialized when debug level is actually being logged.
+            logger.opt(lazy=True).debug("Received json:\n{}\n", chat.json)
 
-            logger.debug(f"Received json:\n{json.dumps(json_data, indent=2)}\n")
+            self.scheduler.put(self.channel_id, build_embed(chat), chat.type in PRIORITY_TYPES)
 
-            # prepare message
-            message: str = json_data["message"]
-
-            for yt_emoji, dc_image in emoji_mapping.items():
-                if yt_emoji in message:
-                    message = message.replace(yt_emoji, dc_image)
+    def load_livechat(self):
+        self.terminate()
 
-            bg_color: int = argb_to_rgb(json_data["bgColor"])
+        stream = LiveChatAsync(self.video_id, callback=self.callback)
+        stream.raise_for_status()
 
-            # Start writing embed
-            embed = Embed(description=message, colour=bg_color)
+        self.livechat = stream
 
-            # write author and type specific stuffs
-            self.embed_apply_type(embed, json_data)
-            self.embed_set_author(embed, json_data)
+    def terminate(self):
+        try:
+            # if self.livechat.is_alive():
+            self.livechat.terminate()
+        except (AttributeError, RuntimeError):
+            pass
 
-            # set utc time
-            timestamp = json_data["timestamp"] / 1000.0
+    def start(self):
+        self.task = asyncio.get_event_loop().create_task(self.supervise())
 
-            embed.timestamp = datetime.utcfromtimestamp(timestamp)
-            # embed.set_footer(text=f"{utc_aware.strftime(type_ + ' %Y-%m-%d %H:%M:%S (UTC)')}")
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
 
-            try:
-                await channel.send(embed=embed)
+        self.terminate()
 
-            except AttributeError:
-                logger.critical("Unknown channel ID {}, check configuration!", discord_ch_id)
+    async def report(self, *args, **kwargs):
+        """
+        Sends status message to relay channel. Never raises, so failing to report can't kill supervisor.
+        """
 
-    def load_livechat(self):
         try:
-            # if self.livechat.is_alive():
-            self.livechat.terminate()
-        except (AttributeError, RuntimeError):
-            pass
+            await self.channel.send(*args, **kwargs)
+        except AttributeError:
+            logger.critical("Unknown channel ID {}, check configuration!", self.channel_id)
+        except HTTPException as err:
+            logger.warning("Failed to report to channel {}: {}", self.channel_id, err)
 
-        stream = LiveChatAsync(self.vid_id, callback=self.callback)
-        stream.raise_for_status()
+    @property
+    def total_downtime(self) -> float:
+        if self.down_since is None:
+            return self.downtime
 
-        self.livechat = stream
+        return self.downtime + time.monotonic() - self.down_since
 
-    @tasks.loop(count=1)
-    async def relay_task(self):
-        channel: TextChannel = self.bot.get_channel(discord_ch_id)
+    def backoff_delay(self) -> float:
+        """
+        Exponential backoff with jitter, first retry being fast and later ones capped.
+        """
 
-        while True:
-            await channel.send("Chat relay started!")
+        # float overflows around 2 ** 1024, and delay is long capped by then anyway.
+        delay = min(restart_cap_sec, restart_base_sec * 2 ** min(self.failures, 32))
+
+        return delay * random.uniform(0.5, 1.0)
+
+    async def wait_closed(self):
+        """
+        Waits until LiveChatAsync's listening task finishes.
+        """
 
+        listen_task = getattr(self.livechat, "listen_task", None)
+
+        if listen_task is None:
+            # pytchat version without listen_task, fallback to polling.
             while self.livechat.is_alive():
-                await asyncio.sleep(5)
+                await asyncio.sleep(1)
+
+            return
+
+        await asyncio.wait((listen_task,))
+
+    def mark_up(self):
+        if self.down_since is not None:
+            self.downtime += time.monotonic() - self.down_since
+            self.down_since = None
+
+    def mark_down(self):
+        if self.down_since is None:
+            self.down_since = time.monotonic()
+
+    async def supervise(self):
+        while True:
+            if not self.is_alive():
+                try:
+                    self.load_livechat()
+
+                except InvalidVideoIdException as err:
+                    logger.critical("Invalid video id {}, stopping relay.\nDetails: {}", self.video_id, err)
+                    await self.report(embed=error_to_embed(err))
+
+                    self.mark_down()
+                    return
+
+                except Exception as err:
+                    logger.critical("Got {}.\nDetails: {}", type(err).__name__, err)
+                    await self.report(embed=error_to_embed(err))
+
+                    self.mark_down()
+                    self.failures += 1
+                    await asyncio.sleep(self.backoff_delay())
+                    continue
+
+            self.mark_up()
+            started = time.monotonic()
+
+            # restarts are already visible from error reports and list_relays.
+            if not self.restart_count:
+                await self.report("Chat relay started!")
+
+            await self.wait_closed()
+
+            self.mark_down()
+            self.restart_count += 1
+
+            if time.monotonic() - started >= self.healthy_after:
+                self.failures = 0
 
             try:
                 self.livechat.raise_for_status()
 
+            except (ChatDataFinished, NoContents) as err:
+                # stream is over, no point retrying fast. Wait for possible restart of stream.
+                delay = restart_cap_sec
+                logger.warning("Stream {} ended.\nDetail: {}", self.video_id, err)
+
             except Exception as err:
+                delay = self.backoff_delay()
+                self.failures += 1
+
                 logger.warning("Got {}.\nDetail: {}", type(err).__name__, err)
 
                 embed = error_to_embed(err)
-                embed.set_footer(text="Retrying in 1 minute")
-                await channel.send(embed=embed)
+                embed.set_footer(text=f"Retrying in {int(delay)} seconds")
+                await self.report(embed=embed)
 
-            logger.warning("Chat relaying of Stream {} ended. Restart in 5 minute", self.vid_id)
-            await asyncio.sleep(300)
+            else:
+                delay = self.backoff_delay()
+                self.failures += 1
 
-            try:
-                self.load_livechat()
+            logger.warning("Chat relaying of Stream {} ended. Restart in {:.1f}s", self.video_id, delay)
 
-            except Exception as err:
-                logger.critical("Got {}.\nDetails: {}", type(err).__name__, err)
-                await channel.send(embed=error_to_embed(err))
-                return
+            await asyncio.sleep(delay)
 
-    @command()
-    async def stop_relay(self, context: Context):
 
-        if context.author.id not in command_whitelist:
-            await context.reply("Your user ID is not listed in whitelist.")
-            logger.warning("User '{}' is not in whitelist.", context.author.display_name)
+class YoutubeChatRelayCog(Cog):
 
-            return
+    def __init__(self, bot: Bot):
+        self.bot = bot
+
+        logger.info("[ChatRelay] starting.")
+
+        self.scheduler = DeliveryScheduler(bot, batch_window_sec, backlog_threshold)
+        self.delivery_task.start()
+
+        self.relays: Dict[str, StreamRelay] = {}
+
+        for video_id, channel_id in relays.items():
+            relay = StreamRelay(bot, video_id, channel_id, self.scheduler)
+            relay.start()
 
-        self.relay_task.stop()
-        self.livechat.terminate()
-        await context.reply("Stopped!")
+            self.relays[video_id] = relay
+
+    def cog_unload(self):
+        logger.info("[ChatRelay] Stopping.")
+
+        self.delivery_task.cancel()
+
+        for relay in self.relays.values():
+            relay.stop()
+
+    def remove(self, video_id: str):
+        relay = self.relays.pop(video_id)
+        relay.stop()
+
+        if all(other.channel_id != relay.channel_id for other in self.relays.values()):
+            self.scheduler.drop(relay.channel_id)
+
+    def save_relays(self):
+        data = {video_id: relay.channel_id for video_id, relay in self.relays.items()}
+
+        relays_path.parent.mkdir(exist_ok=True)
+        relays_path.write_text(json.dumps(data, indent=2))
+
+    @tasks.loop(count=1)
+    async def delivery_task(self):
+        await self.scheduler.run()
 
     @command()
-    async def change_stream_id(self, context: Context, video_id: str):
+    async def add_relay(self, context: Context, video_id: str, channel_id: int = 0):
 
-        logger.info("Called. Param: {}", video_id)
+        logger.info("Called. Param: {}, {}", video_id, channel_id)
 
-        if context.author.id not in command_whitelist:
-            await context.reply("Your user ID is not listed in whitelist.")
-            logger.warning("User '{}' is not in whitelist.", context.author.display_name)
+        if not await check_whitelist(context):
+            return
 
+        if video_id in self.relays:
+            await context.reply(f"Stream {video_id} is already relayed!")
             return
 
+        relay = StreamRelay(self.bot, video_id, channel_id or context.channel.id, self.scheduler)
+
         try:
-            self.relay_task.stop()
-            self.load_livechat()
-            self.relay_task.start()
+            relay.load_livechat()
 
         except Exception as err:
             message = f"Got {type(err).__name__}.\nDetails: {err}"
             logger.critical(message)
 
-        else:
-            message = "Reload complete!"
+            await context.reply(message)
+            return
+
+        relay.start()
+
+        self.relays[video_id] = relay
+        self.save_relays()
+
+        await context.reply(f"Relaying {video_id} to <#{relay.channel_id}>!")
+
+    @command()
+    async def remove_relay(self, context: Context, video_id: str):
+
+        logger.info("Called. Param: {}", video_id)
+
+        if not await check_whitelist(context):
+            return
+
+        try:
+            self.remove(video_id)
+        except KeyError:
+            await context.reply(f"Stream {video_id} is not relayed!")
+            return
+
+        self.save_relays()
+
+        await context.reply(f"Removed relay of {video_id}!")
+
+    @command()
+    async def stop_relay(self, context: Context):
+
+        if not await check_whitelist(context):
+            return
+
+        logger.info("called by {}", context.author.id)
+
+        for video_id in list(self.relays):
+            self.remove(video_id)
+
+        self.save_relays()
+
+        await context.reply("Stopped and removed all relays!")
+
+    @command()
+    async def list_relays(self, context: Context):
+
+        logger.info("called by {}", context.author.id)
+
+        embed = Embed(title="Chat relays")
+
+        for video_id, relay in self.relays.items():
+            state = "Alive" if relay.is_alive() else "Not running"
+
+            embed.add_field(
+                name=video_id,
+                value=f"<#{relay.channel_id}>\n{state}, restarted {relay.restart_count} time(s)\n"
+                f"Downtime {int(relay.total_downtime)}s",
+                inline=False,
+            )
+
+        await context.reply(embed=embed)
+
+    @command()
+    async def relay_stats(self, context: Context):
+
+        logger.info("called by {}", context.author.id)
+
+        embed = Embed(title="Chat relay delivery")
+
+        for channel_id, batcher in self.scheduler.batchers.items():
+            embed.add_field(name=f"#{channel_id}", value=batcher.stats_text(), inline=False)
+
+        await context.reply(embed=embed)
+
+    @command()
+    async def reload_emoji(self, context: Context):
+
+        if not await check_whitelist(context):
+            return
+
+        try:
+            mapping = json.loads(config_path.read_text())["emoji_mapping"]
+        except Exception as err:
+            await context.reply(f"Got {type(err).__name__}.\nDetails: {err}")
+            return
 
-            config["yt_vid_id"] = video_id
-            config_path.write_text(json.dumps(config))
+        config["emoji_mapping"] = mapping
+        emoji_substitution.update(mapping)
 
-        await context.reply(message)
+        await context.reply(f"Loaded {len(mapping)} emoji mappings!")
 
 
 # async def wrap():
@@ -0,0 +1,215 @@
+"""
+Replays recorded chat through relay and delivery scheduler with a fake discord channel,
+so relay changes can be measured without live stream.
+
+Accepts format of ChatOutputExample.json (single chat or list of them), or JSONL capture with one chat per line.
+Single chat recordings are repeated `--count` times at `--rate` chats/sec.
+
+Run from Meowpy directory:
+python -m BotComponents.YtChatModule.replay -s 10 path/to/capture.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import timezone
+from itertools import groupby
+from typing import List
+
+from discord import Embed
+from loguru import logger
+
+from .module import DeliveryScheduler, StreamRelay, chat_from_dict, batch_window_sec, backlog_threshold
+
+
+EXAMPLE_PATH = pathlib.Path(__file__).parent.joinpath("ChatOutputExample.json")
+CHANNEL_ID = 0
+
+
+def load_records(path: pathlib.Path) -> List[dict]:
+    text = path.read_text(encoding="utf8")
+
+    if path.suffix == ".jsonl":
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    loaded = json.loads(text)
+
+    return loaded if isinstance(loaded, list) else [loaded]
+
+
+def synthesize(record: dict, count: int, rate: float) -> List[dict]:
+    """
+    Repeats single record with timestamps spaced by given rate.
+    """
+
+    start = int(time.time() * 1000)
+    interval = 1000 / rate
+
+    records = []
+
+    for n in range(count):
+        copied = dict(record, timestamp=start + int(n * interval), id=str(n))
+        copied["message"] = copied["message"] or f"Meow {n} :_cyanCute:"
+
+        records.append(copied)
+
+    return records
+
+
+class Clock:
+    """
+    Maps chat timestamps to monotonic time at which they're fed to relay.
+    """
+
+    def __init__(self, first_timestamp: int, speed: float):
+        self.first_timestamp = first_timestamp
+        self.speed = speed
+        self.start = time.monotonic()
+
+    def feed_time(self, timestamp_ms: float) -> float:
+        if not self.speed:
+            return self.start
+
+        return self.start + (timestamp_ms - self.first_timestamp) / 1000 / self.speed
+
+
+class FakeChannel:
+    def __init__(self, clock: Clock, latency: float):
+        self.clock = clock
+        self.latency = latency
+
+        self.messages = 0
+        self.embeds = 0
+        self.lags: List[float] = []
+
+    async def send(self, content=None, *, embed: Embed = None, embeds: List[Embed] = None):
+        embeds = embeds or ([embed] if embed else [])
+
+        await asyncio.sleep(self.latency)
+
+        now = time.monotonic()
+
+        for embed_ in embeds:
+            # summary embeds have no timestamp
+            if not embed_.timestamp:
+                continue
+
+            # embed timestamp is naive utc
+            timestamp = embed_.timestamp.replace(tzinfo=embed_.timestamp.tzinfo or timezone.utc).timestamp()
+            self.lags.append(now - self.clock.feed_time(timestamp * 1000))
+
+        self.messages += 1
+        self.embeds += len(embeds)
+
+
+class FakeBot:
+    def __init__(self, channel: FakeChannel):
+        self.channel = channel
+
+    def get_channel(self, _):
+        return self.channel
+
+
+class FakeChatdata:
+    def __init__(self, chats):
+        self.chats = chats
+
+    async def async_items(self):
+        for chat in self.chats:
+            yield chat
+
+
+async def replay(records: List[dict], speed: float, poll_interval: float, latency: float):
+    records = sorted(records, key=lambda x: x["timestamp"])
+    clock = Clock(records[0]["timestamp"], speed)
+
+    channel = FakeChannel(clock, latency)
+    bot = FakeBot(channel)
+
+    scheduler = DeliveryScheduler(bot, batch_window_sec, backlog_threshold)
+    relay = StreamRelay(bot, "replay", CHANNEL_ID, scheduler)
+
+    delivery = asyncio.get_event_loop().create_task(scheduler.run())
+
+    # pytchat hands chats over per poll, group them the same way.
+    def poll_key(record):
+        return int((record["timestamp"] - records[0]["timestamp"]) / 1000 // poll_interval)
+
+    tracemalloc.start()
+    mem_start, _ = tracemalloc.get_traced_memory()
+
+    callback_time = 0.0
+
+    for _, group in groupby(records, key=poll_key):
+        chats = [chat_from_dict(record) for record in group]
+
+        # pytchat delivers poll after it's over, so wait until last chat in it.
+        delay = clock.feed_time(chats[-1].timestamp) - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        started = time.perf_counter()
+        await relay.callback(FakeChatdata(chats))
+        callback_time += time.perf_counter() - started
+
+    # wait for delivery to drain
+    batcher = scheduler.batcher(CHANNEL_ID)
+
+    while batcher.pending or len(channel.lags) + batcher.skipped < len(records):
+        await asyncio.sleep(0.05)
+
+    mem_end, mem_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    delivery.cancel()
+
+    elapsed = time.monotonic() - clock.start
+
+    print(f"Replayed            {len(records)} chats in {elapsed:.2f}s (speed x{speed or 'max'})")
+    print(f"Embeds built/sec    {len(records) / callback_time:.0f}")
+    print(f"Delivered           {channel.embeds} embeds in {channel.messages} messages, skipped {batcher.skipped}")
+
+    if channel.lags:
+        lags = sorted(channel.lags)
+        p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+
+        print(f"End-to-end lag      mean {statistics.mean(lags):.3f}s / p99 {p99:.3f}s / max {lags[-1]:.3f}s")
+
+    print(f"Memory growth       {(mem_end - mem_start) / 1024:.1f} KiB (peak {(mem_peak - mem_start) / 1024:.1f} KiB)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "path", type=pathlib.Path, nargs="?", default=EXAMPLE_PATH, help="Recorded chat, .json or .jsonl."
+    )
+    parser.add_argument("-s", "--speed", type=float, default=1.0, help="Speed multiplier, 0 for no pacing.")
+    parser.add_argument("-n", "--count", type=int, default=1000, help="Chats to generate from single chat recordings.")
+    parser.add_argument("-r", "--rate", type=float, default=20.0, help="Chats/sec for generated chats.")
+    parser.add_argument("-p", "--poll-interval", type=float, default=1.0, help="Seconds between pytchat polls.")
+    parser.add_argument("-l", "--latency", type=float, default=0.05, help="Simulated discord send latency.")
+    parser.add_argument(
+        "--log-level", default="WARNING", help="Relay logs debug line per batch, which would dominate timing if shown."
+    )
+
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    records = load_records(args.path)
+
+    if len(records) == 1:
+        records = synthesize(records[0], args.count, args.rate)
+
+    asyncio.run(replay(records, args.speed, args.poll_interval, args.latency))
+
+
+if __name__ == "__main__":
+    main()
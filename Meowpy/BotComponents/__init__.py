@@ -4,6 +4,8 @@ from loguru import logger
 
 from discord.ext.commands import Bot, Cog
 
+from .instrumentation import instrument, instrument_cog, module_of
+
 
 class RepresentationBase:
     name = ""
@@ -30,7 +32,8 @@ class CommandRepresentation(RepresentationBase):
 
         logger.info("Adding {}", self.name)
 
-        applied = bot.command(*self.args, **self.kwargs)(self.func)
+        func = instrument(self.func, module_of(self.func), self.name)
+        applied = bot.command(*self.args, **self.kwargs)(func)
 
         if self.err_handler:
             applied.error(self.err_handler)
@@ -51,7 +54,10 @@ class CogRepresentation(RepresentationBase):
 
         logger.info("Adding {}", self.name)
 
-        bot.add_cog(self.cog(bot))
+        cog = self.cog(bot)
+        instrument_cog(cog)
+
+        bot.add_cog(cog)
 
     def unload(self, bot: Bot):
 
@@ -78,7 +84,8 @@ class EventRepresentation(RepresentationBase):
 
         logger.info("Adding {}", self.name)
 
-        bot.add_listener(self.func, self.listen_name)
+        func = instrument(self.func, module_of(self.func), self.listen_name or self.func.__name__)
+        bot.add_listener(func, self.listen_name)
 
         # Event's Error handler is not tested at all, no guarantee it works.
         if self.err_handler:
@@ -0,0 +1,369 @@
+"""
+Timing instrumentation for handlers registered by dynamically loaded modules.
+
+Handlers registered through RepresentationBase.add are wrapped, recording per handler and per module:
+- latency: wall time from call until done, awaits included.
+- blocking: longest stretch handler ran without yielding to event loop. This is what stalls the bot.
+
+Event loop lag monitor catches blocking outside of handlers too, like tasks.loop bodies.
+
+Module's handlers can also be profiled with cProfile for a while, which only costs a dict lookup per step when off.
+
+This file is not reloaded by DynamicLoader, so stats accumulate across module reloads.
+"""
+
+import asyncio
+import cProfile
+import functools
+import io
+import os
+import pathlib
+import pstats
+import time
+import types
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+
+# histogram upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+# blocking longer than this is reported as slow callback
+slow_callback_sec = 0.1
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+
+        if value > self.max:
+            self.max = value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates quantile as upper bound of the bucket it falls in, capped by max.
+        """
+
+        target = q * self.count
+        running = 0
+
+        for bound, count in zip(BUCKETS, self.counts):
+            running += count
+
+            if running >= target:
+                return min(bound, self.max)
+
+        return self.max
+
+
+class HandlerStats:
+    __slots__ = ("latency", "blocking", "errors")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.blocking = Histogram()
+        self.errors = 0
+
+    def summary(self) -> str:
+        def ms(value):
+            return f"{value * 1000:.1f}"
+
+        return (
+            f"{self.latency.count} calls | latency p50 {ms(self.latency.quantile(0.5))} "
+            f"p95 {ms(self.latency.quantile(0.95))} max {ms(self.latency.max)}ms | "
+            f"blocking p95 {ms(self.blocking.quantile(0.95))} max {ms(self.blocking.max)}ms | "
+            f"errors {self.errors}"
+        )
+
+
+class SlowCallback(NamedTuple):
+    time: datetime
+    module: str
+    name: str
+    duration: float
+
+
+class Registry:
+    def __init__(self):
+        self.handlers: Dict[Tuple[str, str], HandlerStats] = {}
+        self.modules: Dict[str, HandlerStats] = {}
+
+        self.loop_lag = Histogram()
+        self.slow: Deque[SlowCallback] = deque(maxlen=50)
+
+        # (monotonic time, lag) of recent measurements, for windowed views.
+        self.recent_lag: Deque[Tuple[float, float]] = deque(maxlen=2000)
+
+    def handler(self, module: str, name: str) -> HandlerStats:
+        try:
+            return self.handlers[module, name]
+        except KeyError:
+            self.modules.setdefault(module, HandlerStats())
+
+            stats = self.handlers[module, name] = HandlerStats()
+            return stats
+
+    def lag_since(self, since: float) -> List[float]:
+        """
+        Returns event loop lags measured after given monotonic time, oldest first.
+        """
+
+        return [lag for measured, lag in self.recent_lag if measured >= since]
+
+    def record_slow(self, module: str, name: str, duration: float):
+        self.slow.append(SlowCallback(datetime.now(), module, name, duration))
+
+        logger.warning("{}.{} blocked event loop for {:.1f}ms", module, name, duration * 1000)
+
+
+registry = Registry()
+
+# module: profiler collecting it's handler steps
+profilers: Dict[str, cProfile.Profile] = {}
+
+# only one profiler can be enabled at once, this tracks if one already is by outer handler.
+_active_profiler: Optional[cProfile.Profile] = None
+
+
+def module_of(obj) -> str:
+    """
+    Returns component name from object's module path, which is `BotComponents.<component>.module`.
+    """
+
+    parts = getattr(obj, "__module__", "").split(".")
+
+    if len(parts) > 2 and parts[0] == "BotComponents":
+        return parts[1]
+
+    return parts[0]
+
+
+@types.coroutine
+def _drive(coro, stats: HandlerStats, module: str, name: str):
+    """
+    Same as `await coro`, but times each step coroutine runs between yields to event loop.
+    """
+
+    global _active_profiler
+
+    value, error = None, None
+    longest = 0.0
+
+    try:
+        while True:
+            profiler = profilers.get(module)
+
+            if profiler and not _active_profiler:
+                _active_profiler = profiler
+                profiler.enable()
+            else:
+                profiler = None
+
+            start = time.perf_counter()
+
+            try:
+                yielded = coro.send(value) if error is None else coro.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                step = time.perf_counter() - start
+
+                if profiler:
+                    profiler.disable()
+                    _active_profiler = None
+
+                if step > longest:
+                    longest = step
+
+            try:
+                value, error = (yield yielded), None
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as err:
+                value, error = None, err
+
+    finally:
+        stats.blocking.observe(longest)
+        registry.modules[module].blocking.observe(longest)
+
+        if longest >= slow_callback_sec:
+            registry.record_slow(module, name, longest)
+
+
+def instrument(func: Callable, module: str, name: str) -> Callable:
+    """
+    Wraps coroutine function to record it's latency and blocking time.
+    """
+
+    stats = registry.handler(module, name)
+    module_stats = registry.modules[module]
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+
+        try:
+            return await _drive(func(*args, **kwargs), stats, module, name)
+
+        except Exception:
+            stats.errors += 1
+            module_stats.errors += 1
+            raise
+
+        finally:
+            latency = time.perf_counter() - start
+
+            stats.latency.observe(latency)
+            module_stats.latency.observe(latency)
+
+    return wrapper
+
+
+def instrument_cog(cog):
+    """
+    Wraps cog's commands and listeners in place. Must be called before adding cog to bot.
+    """
+
+    module = module_of(type(cog))
+    cog_name = type(cog).__name__
+
+    for command in cog.walk_commands():
+        command.callback = instrument(command.callback, module, command.qualified_name)
+
+    # instance attribute shadows the method, and add_cog/remove_cog both look listeners up by attribute name.
+    for listen_name, method_name in cog.__cog_listeners__:
+        setattr(cog, method_name, instrument(getattr(cog, method_name), module, f"{cog_name}.{method_name}"))
+
+
+async def profile_module(module: str, seconds: float, top: int = 50) -> str:
+    """
+    Profiles given module's handlers for given seconds.
+
+    :return: Report of top functions by cumulative time
+    """
+
+    if module in profilers:
+        raise RuntimeError(f"{module} is already being profiled.")
+
+    calls = registry.modules[module].latency.count
+
+    profiler = profilers[module] = cProfile.Profile()
+
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        del profilers[module]
+
+    header = f"Profile of {module} for {seconds}s, {registry.modules[module].latency.count - calls} handler call(s).\n"
+
+    stream = io.StringIO()
+
+    try:
+        stats = pstats.Stats(profiler, stream=stream)
+    except TypeError:
+        # pstats refuses empty profile
+        return header + "No handler ran while profiling.\n"
+
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+
+    return header + stream.getvalue()
+
+
+async def monitor_loop_lag(interval: float = 0.5):
+    """
+    Measures how late event loop wakes up from sleep, which is how long something blocked it.
+    """
+
+    loop = asyncio.get_event_loop()
+
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+
+        lag = max(0.0, loop.time() - expected)
+        registry.loop_lag.observe(lag)
+        registry.recent_lag.append((time.monotonic(), lag))
+
+        if lag >= slow_callback_sec:
+            registry.record_slow("EventLoop", "lag", lag)
+
+
+def _histogram_lines(metric: str, labels: str, histogram: Histogram) -> List[str]:
+    lines = []
+    running = 0
+
+    for bound, count in zip(BUCKETS, histogram.counts):
+        running += count
+        le = "+Inf" if bound == float("inf") else repr(bound)
+
+        lines.append(f'{metric}_bucket{{{labels}{"," if labels else ""}le="{le}"}} {running}')
+
+    suffix = f"{{{labels}}}" if labels else ""
+
+    lines.append(f"{metric}_sum{suffix} {histogram.total}")
+    lines.append(f"{metric}_count{suffix} {running}")
+
+    return lines
+
+
+def prometheus_text() -> str:
+    lines = [
+        "# HELP meowpy_event_loop_lag_seconds Event loop wake up delay.",
+        "# TYPE meowpy_event_loop_lag_seconds histogram",
+        *_histogram_lines("meowpy_event_loop_lag_seconds", "", registry.loop_lag),
+    ]
+
+    for metric, attr, help_ in (
+        ("meowpy_handler_latency_seconds", "latency", "Handler wall time until done."),
+        ("meowpy_handler_blocking_seconds", "blocking", "Longest time handler held event loop per call."),
+    ):
+        lines.append(f"# HELP {metric} {help_}")
+        lines.append(f"# TYPE {metric} histogram")
+
+        for (module, name), stats in registry.handlers.items():
+            lines.extend(_histogram_lines(metric, f'module="{module}",handler="{name}"', getattr(stats, attr)))
+
+    lines.append("# HELP meowpy_handler_errors_total Handler calls raised exception.")
+    lines.append("# TYPE meowpy_handler_errors_total counter")
+
+    for (module, name), stats in registry.handlers.items():
+        lines.append(f'meowpy_handler_errors_total{{module="{module}",handler="{name}"}} {stats.errors}')
+
+    return "\n".join(lines) + "\n"
+
+
+async def export_prometheus(path: pathlib.Path, interval: float):
+    """
+    Periodically writes stats in Prometheus text format, e.g. for node exporter's textfile collector.
+    """
+
+    temp_path = path.with_name(path.name + ".tmp")
+
+    while True:
+        try:
+            temp_path.write_text(prometheus_text())
+
+            # atomic, so collector never reads half written file.
+            os.replace(temp_path, path)
+
+        except OSError as err:
+            logger.warning("Could not export metrics to {}: {}", path.as_posix(), err)
+
+        await asyncio.sleep(interval)
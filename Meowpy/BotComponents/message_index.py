@@ -0,0 +1,222 @@
+"""
+Optional local index of which member sent which message where.
+
+Lets purge and per-member history look up a member's message ids directly, instead of
+paging through every channel's history and filtering by author.
+
+Only ids are stored. Message's creation time is encoded in it's snowflake id, so time ranges and
+retention are queried on message id rather than on a separate timestamp column.
+
+This file is not reloaded by DynamicLoader, so opened index survives module reloads.
+"""
+
+import pathlib
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from discord.utils import time_snowflake
+from loguru import logger
+
+
+class MessageIndex:
+    """
+    SQLite table of (guild, channel, message, author) with per channel coverage.
+
+    A channel is covered from `oldest_id` up to now only while it's in `synced` - that is, after it was
+    backfilled or caught up in this session and the on_message listener kept running since.
+    """
+
+    def __init__(self, db_path: pathlib.Path, retention_days: int = 0):
+        self.path = db_path
+        self.retention_days = retention_days
+
+        self.con = sqlite3.connect(db_path)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+
+        # message id is unique across discord, author lookup uses secondary index which includes it.
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS MESSAGES("
+            "message_id INTEGER PRIMARY KEY, guild_id INTEGER, channel_id INTEGER, author_id INTEGER"
+            ") WITHOUT ROWID"
+        )
+        self.con.execute("CREATE INDEX IF NOT EXISTS MESSAGES_AUTHOR ON MESSAGES(guild_id, author_id)")
+
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS CHANNELS(channel_id INTEGER PRIMARY KEY, oldest_id INTEGER, newest_id INTEGER)"
+        )
+
+        self.con.commit()
+
+        self.pending: List[Tuple[int, int, int, int]] = []
+        self.synced: Set[int] = set()
+
+    def add(self, guild_id: int, channel_id: int, author_id: int, message_id: int):
+        """
+        Buffers message to be written on next flush, this is called for every message.
+        """
+
+        self.pending.append((message_id, guild_id, channel_id, author_id))
+
+    def flush(self):
+        if not self.pending:
+            return
+
+        pending, self.pending = self.pending, []
+
+        newest: Dict[int, int] = {}
+        for message_id, _, channel_id, _ in pending:
+            newest[channel_id] = max(newest.get(channel_id, 0), message_id)
+
+        with self.con:
+            self.con.executemany("INSERT OR IGNORE INTO MESSAGES VALUES(?, ?, ?, ?)", pending)
+            self.con.executemany(
+                "UPDATE CHANNELS SET newest_id = MAX(newest_id, ?) WHERE channel_id = ?",
+                ((message_id, channel_id) for channel_id, message_id in newest.items()),
+            )
+
+    def remove(self, message_ids: Iterable[int]):
+        with self.con:
+            self.con.executemany("DELETE FROM MESSAGES WHERE message_id = ?", ((id_,) for id_ in message_ids))
+
+    def mark_synced(self, channel_id: int, oldest_id: Optional[int] = None):
+        """
+        Marks channel as completely indexed from oldest_id to now.
+        Pass oldest_id after full backfill, omit after catching up already known channel.
+        """
+
+        self.flush()
+
+        with self.con:
+            if oldest_id is not None:
+                self.con.execute(
+                    "INSERT OR REPLACE INTO CHANNELS VALUES(?, ?, "
+                    "(SELECT IFNULL(MAX(message_id), 0) FROM MESSAGES WHERE channel_id = ?))",
+                    (channel_id, oldest_id, channel_id),
+                )
+
+        self.synced.add(channel_id)
+
+    def channel_range(self, channel_id: int) -> Optional[Tuple[int, int]]:
+        """
+        Returns (oldest_id, newest_id) channel was indexed for, None if never backfilled.
+        """
+
+        return self.con.execute(
+            "SELECT oldest_id, newest_id FROM CHANNELS WHERE channel_id = ?", (channel_id,)
+        ).fetchone()
+
+    def coverage_start(self, channel_id: int) -> Optional[int]:
+        """
+        Returns message id from which index is complete for channel, None if it can't be trusted.
+        """
+
+        if channel_id not in self.synced:
+            return None
+
+        range_ = self.channel_range(channel_id)
+        return range_[0] if range_ else None
+
+    def message_ids(
+        self,
+        guild_id: int,
+        author_id: int,
+        channel_id: Optional[int] = None,
+        after: Union[datetime, int, None] = None,
+        before: Union[datetime, int, None] = None,
+    ) -> List[Tuple[int, int]]:
+        """
+        Lists (channel id, message id) sent by author, newest first. Dates are naive UTC like discord.py's.
+        """
+
+        self.flush()
+
+        after_id = time_snowflake(after, high=True) if isinstance(after, datetime) else (after or 0)
+        before_id = time_snowflake(before) if isinstance(before, datetime) else (before or (1 << 63) - 1)
+
+        query = (
+            "SELECT channel_id, message_id FROM MESSAGES "
+            "WHERE guild_id = ? AND author_id = ? AND message_id > ? AND message_id < ?"
+        )
+        params = [guild_id, author_id, after_id, before_id]
+
+        if channel_id is not None:
+            query += " AND channel_id = ?"
+            params.append(channel_id)
+
+        return self.con.execute(query + " ORDER BY message_id DESC", params).fetchall()
+
+    def apply_retention(self) -> int:
+        """
+        Drops entries older than retention period, returns number of dropped entries.
+        """
+
+        if not self.retention_days:
+            return 0
+
+        self.flush()
+
+        cutoff = time_snowflake(datetime.utcnow() - timedelta(days=self.retention_days))
+
+        with self.con:
+            dropped = self.con.execute("DELETE FROM MESSAGES WHERE message_id < ?", (cutoff,)).rowcount
+            self.con.execute("UPDATE CHANNELS SET oldest_id = ? WHERE oldest_id < ?", (cutoff, cutoff))
+
+        return dropped
+
+    def stats(self) -> Tuple[int, int, int]:
+        """
+        :return: Tuple of (entries, backfilled channels, db file size in bytes)
+        """
+
+        entries = self.con.execute("SELECT COUNT(*) FROM MESSAGES").fetchone()[0] + len(self.pending)
+        channels = self.con.execute("SELECT COUNT(*) FROM CHANNELS").fetchone()[0]
+
+        return entries, channels, self.path.stat().st_size
+
+    def close(self):
+        try:
+            self.flush()
+            self.con.close()
+        except sqlite3.ProgrammingError:
+            pass
+
+
+_index: Optional[MessageIndex] = None
+
+
+def open_index(db_path: pathlib.Path, retention_days: int = 0) -> MessageIndex:
+    """
+    Opens index at given path, or returns already opened one.
+    """
+
+    global _index
+
+    if _index and _index.path == db_path:
+        _index.retention_days = retention_days
+        return _index
+
+    close_index()
+
+    db_path.parent.mkdir(exist_ok=True)
+    _index = MessageIndex(db_path, retention_days)
+
+    logger.info("Opened message index {}", db_path.as_posix())
+    return _index
+
+
+def get_index() -> Optional[MessageIndex]:
+    """
+    Returns opened index, None if index is disabled.
+    """
+
+    return _index
+
+
+def close_index():
+    global _index
+
+    if _index:
+        _index.close()
+        _index = None
@@ -1,12 +1,28 @@
 """
 Dynamic module re-loader to load modules again.
+
+Modules imported for the first time are imported concurrently in worker threads, unless module's package
+`__init__.py` sets `THREADED_IMPORT = False` or it's listed by set_serial_modules. Module whose `__init__.py` lists `LAZY_COMMANDS` is not imported
+at all until one of those commands is used, which are registered as stubs meanwhile.
+
+Optionally, watch_modules polls module files' stat and reloads only modules that changed.
 """
 
+import os
+import sys
+import json
+import time
+import asyncio
 import pathlib
 import importlib
-from typing import List, Iterable, Tuple, Generator, Dict
+import py_compile
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from hashlib import blake2b
+from types import ModuleType
+from typing import Awaitable, Callable, List, Iterable, Tuple, Generator, Dict, Optional, Set
 from loguru import logger
-from discord.ext.commands import Bot
+from discord.ext.commands import Bot, Context
 
 from BotComponents import RepresentationBase
 
@@ -15,17 +31,390 @@ FOLDER_NAME = "BotComponents"
 LOCATION = pathlib.Path(__file__).parent.joinpath(FOLDER_NAME)
 LOADED_MODULE = {}
 LOADED_LIST = {}
-LOADED_FILE_HASH: Dict[pathlib.Path, int] = {}
+LOADED_FILE_HASH: Dict[pathlib.Path, str] = {}
+
+# files counted for change detection unless module has it's own patterns.
+SOURCE_PATTERNS = ("*.py", "config.json")
+
+# module folder name: (include patterns, exclude patterns)
+MODULE_PATTERNS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+
+# file path: ((size, mtime_ns, inode), digest)
+FILE_STATES: Dict[pathlib.Path, Tuple[Tuple[int, int, int], bytes]] = {}
+
+HASH_CHUNK_SIZE = 1 << 16
+
+# persisted file digests and import results, so restart doesn't need to re-read unchanged files.
+MANIFEST_PATH = pathlib.Path(__file__).parent.joinpath("cache", "loader_manifest.json")
+MANIFEST_VERSION = 1
+
+# module folder name: (digest, import state) as of last import attempt, including failed ones.
+MODULE_RESULTS: Dict[str, Tuple[str, str]] = {}
+
+SYNTAX_ERROR_STATE = "Reason: SyntaxError"
+
+# module folder name: seconds last import took
+IMPORT_TIMES: Dict[str, float] = {}
+
+# module.py path: stub of lazy module not imported yet
+LAZY_PENDING: Dict[pathlib.Path, "LazyRepresentation"] = {}
+
+# module folder names that must be imported in main thread, e.g. ones touching event loop at import.
+SERIAL_MODULES: Set[str] = set()
+
+IMPORT_WORKERS = 4
+
+_executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="loader")
+
+# load_command yields while importing, this keeps reload command and file watcher from interleaving.
+# created on first use, so it belongs to bot's event loop.
+_load_lock: Optional[asyncio.Lock] = None
+
+# files modified this recently may change again within same mtime tick, so their stat isn't trusted.
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+
+def load_lock() -> asyncio.Lock:
+    global _load_lock
+
+    if _load_lock is None:
+        _load_lock = asyncio.Lock()
+
+    return _load_lock
+
+
+def load_manifest(path: pathlib.Path = None):
+    """
+    Restores file digests and import results of last run. Restored results are shown by module list until loaded.
+    """
+
+    path = path or MANIFEST_PATH
+
+    try:
+        data = json.loads(path.read_text())
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as err:
+        logger.warning("Discarding broken loader manifest: {}", err)
+        return
+
+    # bytecode and syntax errors differ between python versions, so does import result.
+    if data.get("version") != MANIFEST_VERSION or data.get("python") != sys.version:
+        logger.info("Loader manifest is from different version, ignoring.")
+        return
+
+    for rel_path, (size, mtime_ns, inode, digest) in data["files"].items():
+        FILE_STATES[LOCATION.joinpath(rel_path)] = (size, mtime_ns, inode), bytes.fromhex(digest)
+
+    for name, (digest, state) in data["modules"].items():
+        MODULE_RESULTS[name] = digest, state
+        LOADED_LIST[name] = f"{state} (last run)"
+
+    IMPORT_TIMES.update(data.get("import_times", {}))
+
+    logger.debug("Loader manifest restored, {} files / {} modules.", len(FILE_STATES), len(MODULE_RESULTS))
+
+
+def save_manifest(path: pathlib.Path = None):
+    path = path or MANIFEST_PATH
+
+    data = {
+        "version": MANIFEST_VERSION,
+        "python": sys.version,
+        "files": {
+            file.relative_to(LOCATION).as_posix(): [*key, digest.hex()]
+            for file, (key, digest) in FILE_STATES.items()
+            if file.exists()
+        },
+        "modules": MODULE_RESULTS,
+        "import_times": IMPORT_TIMES,
+    }
+
+    temp_path = path.with_name(path.name + ".tmp")
+
+    try:
+        path.parent.mkdir(exist_ok=True)
+        temp_path.write_text(json.dumps(data))
+        os.replace(temp_path, path)
+
+    except OSError as err:
+        logger.warning("Could not save loader manifest: {}", err)
+
+
+def set_serial_modules(names: Iterable[str]):
+    SERIAL_MODULES.clear()
+    SERIAL_MODULES.update(names)
+
+
+def set_module_patterns(patterns: Dict[str, Dict[str, List[str]]]):
+    """
+    Sets which files count for change detection per module, as {module: {"include": [...], "exclude": [...]}}.
+    """
+
+    MODULE_PATTERNS.clear()
+
+    for name, val in patterns.items():
+        MODULE_PATTERNS[name] = (tuple(val.get("include", SOURCE_PATTERNS)), tuple(val.get("exclude", ())))
+
+
+def tracked_files(module_dir: pathlib.Path) -> List[os.DirEntry]:
+    """
+    Lists top level files of module that counts for change detection, sorted by name.
+    """
+
+    include, exclude = MODULE_PATTERNS.get(module_dir.name, (SOURCE_PATTERNS, ()))
+
+    def filter_(entry: os.DirEntry):
+        return (
+            entry.is_file()
+            and any(fnmatch(entry.name, pattern) for pattern in include)
+            and not any(fnmatch(entry.name, pattern) for pattern in exclude)
+        )
+
+    with os.scandir(module_dir) as entries:
+        return sorted(filter(filter_, entries), key=lambda x: x.name)
+
+
+def stat_key(entry: os.DirEntry) -> Tuple[int, int, int]:
+    stat = entry.stat()
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def file_digest(entry: os.DirEntry) -> bytes:
+    """
+    Returns digest of file, only reading it if it's stat changed since last time.
+    """
+
+    path = pathlib.Path(entry.path)
+    key = stat_key(entry)
+
+    try:
+        cached_key, digest = FILE_STATES[path]
+    except KeyError:
+        pass
+    else:
+        if cached_key == key and time.time_ns() - key[1] > RACY_WINDOW_NS:
+            return digest
+
+    hash_ = blake2b(digest_size=16)
+
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(HASH_CHUNK_SIZE), b""):
+            hash_.update(chunk)
+
+    digest = hash_.digest()
+    FILE_STATES[path] = key, digest
+
+    return digest
+
+
+def module_digest(module_dir: pathlib.Path) -> str:
+    hash_ = blake2b(digest_size=16)
+
+    for entry in tracked_files(module_dir):
+        hash_.update(entry.name.encode("utf8"))
+        hash_.update(file_digest(entry))
+
+    return hash_.hexdigest()
+
+
+def module_name(script_path: pathlib.Path) -> str:
+    return ".".join((FOLDER_NAME, script_path.parent.stem, script_path.stem))
+
+
+def precompile(module_dir: pathlib.Path):
+    """
+    Writes bytecode of module's python files ahead, so later import only has to unmarshal it.
+    """
+
+    if sys.dont_write_bytecode:
+        return
+
+    for entry in tracked_files(module_dir):
+        if entry.name.endswith(".py"):
+            try:
+                py_compile.compile(entry.path, doraise=True)
+            except (py_compile.PyCompileError, OSError):
+                # import will report it.
+                pass
+
+
+def import_script(script_path: pathlib.Path) -> Tuple[Optional[ModuleType], Optional[Exception], float]:
+    """
+    Imports or reloads module. Safe to call from worker thread, as it touches nothing but import system.
+
+    :return: Tuple of (module or None, exception or None, seconds taken)
+    """
+
+    start = time.perf_counter()
+
+    try:
+        if script_path in LOADED_MODULE:
+            module = importlib.reload(LOADED_MODULE[script_path])
+        else:
+            module = importlib.import_module(module_name(script_path))
+
+    except Exception as err:
+        return None, err, time.perf_counter() - start
+
+    return module, None, time.perf_counter() - start
 
 
-def load_command(bot: Bot) -> List[RepresentationBase]:
+def record_import(
+    script_path: pathlib.Path, hashed: str, module: Optional[ModuleType], error: Optional[Exception], elapsed: float
+) -> List[RepresentationBase]:
     """
-    Dynamically loads extensions in BotComponents.
+    Updates loader state with result of import_script.
+
+    :return: List of CommandRepresentation module exports
+    """
+
+    name = script_path.parent.name
+    fetched_list = []
+
+    IMPORT_TIMES[name] = elapsed
+
+    if isinstance(error, SyntaxError):
+        logger.critical("Got syntax error in {} at line {}, skipping", script_path.name, error.lineno)
+        state = SYNTAX_ERROR_STATE
 
+    elif error is not None:
+        logger.critical("Got {} while importing expansion {}\n{}", type(error).__name__, name, error)
+        state = f"Reason: {type(error).__name__}"
+
+    else:
+        # update reference
+        LOADED_MODULE[script_path] = module
+        LOADED_FILE_HASH[script_path] = hashed
+
+        try:
+            command_list = getattr(module, "__all__")
+        except (NameError, AttributeError):
+            logger.critical("Missing name __all__ in global scope of the script {}, skipping.", script_path.name)
+            state = "Reason: Missing __all__"
+        else:
+            fetched_list.extend(command_list)
+            state = ", ".join(str(command.name) for command in command_list)
+
+        logger.debug("Imported {} in {:.1f}ms", name, elapsed * 1000)
+
+    LOADED_LIST[name] = state
+    MODULE_RESULTS[name] = hashed, state
+
+    return fetched_list
+
+
+class LazyRepresentation(RepresentationBase):
+    """
+    Stub commands of lazy module. First use of any of them imports the module and runs the command again.
+    """
+
+    def __init__(self, script_path: pathlib.Path, command_names: List[str], threaded: bool):
+        self.name = f"{script_path.parent.name}[Lazy]"
+        self.script_path = script_path
+        self.command_names = command_names
+        self.threaded = threaded
+
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, bot: Bot):
+
+        logger.info("Adding {}", self.name)
+
+        for name in self.command_names:
+
+            async def stub(context: Context, *_):
+                await self.invoke(bot, context)
+
+            bot.command(name=name, help=f"Loads {self.script_path.parent.name} module on first use.")(stub)
+
+    def unload(self, bot: Bot):
+
+        logger.info("Unloading {}", self.name)
+
+        for name in self.command_names:
+            bot.remove_command(name)
+
+    async def invoke(self, bot: Bot, context: Context):
+        # commands invoked while importing all wait for same import.
+        if self._task is None:
+            self._task = bot.loop.create_task(self.load(bot))
+
+        loaded = await asyncio.shield(self._task)
+
+        # parse message again, so it goes to real command with it's own arguments and checks.
+        new_context = await bot.get_context(context.message)
+
+        if not loaded or new_context.command is None:
+            name = self.script_path.parent.name
+
+            await context.reply(f"Module {name} failed to load: {LOADED_LIST.get(name)}")
+            return
+
+        await bot.invoke(new_context)
+
+    async def load(self, bot: Bot) -> bool:
+        """
+        Imports module and replaces stubs with it's commands. Stubs stay if import fails, so next use tries again.
+
+        :return: True if imported successfully, or stubs were already replaced by reload meanwhile.
+        """
+
+        # reload of same module at the same time would register it's commands twice.
+        async with load_lock():
+            if LAZY_PENDING.get(self.script_path) is not self:
+                logger.info("{} was replaced while waiting to load", self.name)
+
+                self._task = None
+                return True
+
+            return await self._load(bot)
+
+    async def _load(self, bot: Bot) -> bool:
+        logger.info("Lazy loading {}", self.script_path.parent.name)
+
+        hashed = module_digest(self.script_path.parent)
+
+        if self.threaded:
+            module, error, elapsed = await bot.loop.run_in_executor(_executor, import_script, self.script_path)
+        else:
+            module, error, elapsed = import_script(self.script_path)
+
+        if error is not None:
+            record_import(self.script_path, hashed, module, error, elapsed)
+            save_manifest()
+
+            self._task = None
+            return False
+
+        self.unload(bot)
+        LAZY_PENDING.pop(self.script_path, None)
+
+        for representation in record_import(self.script_path, hashed, module, error, elapsed):
+            try:
+                representation.add(bot)
+            except Exception as err:
+                logger.critical(err)
+
+        save_manifest()
+        return True
+
+
+async def load_command(bot: Bot, names: Iterable[str] = None) -> List[RepresentationBase]:
+    """
+    Dynamically loads extensions in BotComponents. Event loop keeps running while threaded imports run.
+
+    :param bot: Bot to unload reloaded modules' commands from
+    :param names: Module folder names to check, checks all if omitted
     :return: List of CommandRepresentation
     """
 
-    script_hash_pairs = fetch_scripts()
+    async with load_lock():
+        return await _load_command(bot, names)
+
+
+async def _load_command(bot: Bot, names: Optional[Iterable[str]]) -> List[RepresentationBase]:
+    script_hash_pairs = fetch_scripts(names)
 
     # if no scripts then quickly return empty list
     if not script_hash_pairs:
@@ -37,76 +426,110 @@ def load_command(bot: Bot) -> List[RepresentationBase]:
 
     fetched_list = []
 
+    # script path, hash, and whether it's safe to import in worker thread
+    to_import: List[Tuple[pathlib.Path, str, bool]] = []
+
     for script_path, hashed in script_hash_pairs:
 
-        try:
-            # check if it's already loaded. if so, reload.
-            if script_path in LOADED_MODULE.keys():
+        name = script_path.parent.name
 
-                for representation in LOADED_MODULE[script_path].__all__:
-                    representation: RepresentationBase
-                    representation.unload(bot)
+        # same source failed to compile last time, no point trying again until it changes.
+        if script_path not in LOADED_MODULE and MODULE_RESULTS.get(name) == (hashed, SYNTAX_ERROR_STATE):
+            logger.critical("{} still has syntax error, skipping", name)
 
-                module = importlib.reload(LOADED_MODULE[script_path])
+            LOADED_FILE_HASH[script_path] = hashed
+            LOADED_LIST[name] = SYNTAX_ERROR_STATE
+            continue
+
+        # check if it's already loaded. if so, reload.
+        if script_path in LOADED_MODULE:
 
-            else:
-                module = importlib.import_module(".".join((FOLDER_NAME, script_path.parent.stem, script_path.stem)))
+            for representation in LOADED_MODULE[script_path].__all__:
+                representation: RepresentationBase
+                representation.unload(bot)
 
-        except SyntaxError as err:
-            logger.critical("Got syntax error in {} at line {}, skipping", script_path.name, err.lineno)
-            state = "Reason: SyntaxError"
+            fetched_list.extend(record_import(script_path, hashed, *import_script(script_path)))
+            continue
 
+        # package __init__ is tiny and never reloaded, module declares how it wants to be loaded there.
+        try:
+            package = importlib.import_module(".".join((FOLDER_NAME, name)))
         except Exception as err:
-            logger.critical("Got {} while importing expansion {}\n{}", type(err).__name__, script_path.parent.name, err)
-            state = f"Reason: {type(err).__name__}"
+            fetched_list.extend(record_import(script_path, hashed, None, err, 0.0))
+            continue
+
+        threaded = getattr(package, "THREADED_IMPORT", True) and name not in SERIAL_MODULES
+        lazy_commands = getattr(package, "LAZY_COMMANDS", [])
+
+        if lazy_commands:
+            # changed while still waiting for first use, replace stubs.
+            if script_path in LAZY_PENDING:
+                LAZY_PENDING.pop(script_path).unload(bot)
+
+            lazy = LAZY_PENDING[script_path] = LazyRepresentation(script_path, lazy_commands, threaded)
+            fetched_list.append(lazy)
 
-        else:
-            # update reference
-            LOADED_MODULE[script_path] = module
             LOADED_FILE_HASH[script_path] = hashed
+            LOADED_LIST[name] = f"Lazy, not imported yet: {', '.join(lazy_commands)}"
+            IMPORT_TIMES.pop(name, None)
 
-            try:
-                command_list = getattr(module, "__all__")
-            except (NameError, AttributeError):
-                logger.critical("Missing name __all__ in global scope of the script {}, skipping.", script_path.name)
-                state = "Reason: Missing __all__"
-            else:
-                fetched_list.extend(command_list)
-                state = ", ".join(str(command.name) for command in command_list)
+            _executor.submit(precompile, script_path.parent)
+            continue
+
+        to_import.append((script_path, hashed, threaded))
+
+    futures = {
+        script_path: _executor.submit(import_script, script_path)
+        for script_path, hashed, threaded in to_import
+        if threaded
+    }
+
+    # keep found order, so commands are added in same order as before.
+    for script_path, hashed, threaded in to_import:
+        if threaded:
+            result = await asyncio.wrap_future(futures[script_path])
+        else:
+            result = import_script(script_path)
 
-        LOADED_LIST[f"{script_path.parent.name}"] = state
+        fetched_list.extend(record_import(script_path, hashed, *result))
+
+    save_manifest()
 
     return fetched_list
 
 
-def fetch_scripts() -> List[Tuple[pathlib.Path, int]]:
+def fetch_scripts(names: Iterable[str] = None) -> List[Tuple[pathlib.Path, str]]:
     """
     Dynamically search and load all scripts in BotComponents.
 
     THIS WILL NOT RELOAD __init__.py! This is limitation of importlib.
 
+    :param names: Module folder names to check, checks all if omitted
     :return: List[ScheduledTask]
     """
 
     logger.debug(f"Loader looking for scripts inside {LOCATION.as_posix()}")
 
     def path_gen():
-        for path_ in (p for p in LOCATION.iterdir() if p.is_dir()):
+        if names is None:
+            dirs = (p for p in LOCATION.iterdir() if p.is_dir())
+        else:
+            dirs = (LOCATION.joinpath(name) for name in names)
+
+        for path_ in dirs:
             cur = path_.joinpath("module.py")
             if cur.exists():
                 yield cur
 
     # check hash and only return non-existing/changed ones.
-    def hash_validation_gen(paths: Iterable[pathlib.Path]) -> Generator[Tuple[pathlib.Path, int], None, None]:
+    def hash_validation_gen(paths: Iterable[pathlib.Path]) -> Generator[Tuple[pathlib.Path, str], None, None]:
 
         for path_ in paths:
             # find all file in top folder, this it NOT recursive.
 
             logger.debug("Checking module {}", path_)
 
-            files = [p for p in path_.parent.iterdir() if p.is_file()]
-
-            hashed = hash(b"".join(p.read_bytes() for p in files))
+            hashed = module_digest(path_.parent)
 
             try:
                 if LOADED_FILE_HASH[path_] != hashed:
@@ -121,3 +544,74 @@ def fetch_scripts() -> List[Tuple[pathlib.Path, int]]:
     logger.debug(f"Found {len(filtered)} modified/new modules.")
 
     return filtered
+
+
+def module_stat(module_dir: pathlib.Path) -> Tuple[Tuple[str, int, int, int], ...]:
+    """
+    Returns stat of module's tracked files, which changes whenever any of them is edited, added or removed.
+    """
+
+    return tuple((entry.name, *stat_key(entry)) for entry in tracked_files(module_dir))
+
+
+def scan_module_stats() -> Dict[str, Tuple]:
+    output = {}
+
+    with os.scandir(LOCATION) as entries:
+        dirs = [entry for entry in entries if entry.is_dir() and entry.name != "__pycache__"]
+
+    for entry in dirs:
+        try:
+            output[entry.name] = module_stat(pathlib.Path(entry.path))
+        except OSError:
+            # removed while scanning
+            pass
+
+    return output
+
+
+async def watch_modules(on_change: Callable[[List[str]], Awaitable], interval: float = 0.2, quiet: float = 0.5):
+    """
+    Polls stat of module files, and calls on_change with names of changed modules once they stayed
+    unchanged for quiet seconds, so editor saving several files in a row causes single reload.
+
+    Nothing is read here, on_change's load_command still compares digests,
+    so touched but unchanged module isn't reloaded.
+    """
+
+    known = scan_module_stats()
+
+    # module folder name: monotonic time of last seen change
+    pending: Dict[str, float] = {}
+
+    while True:
+        await asyncio.sleep(interval)
+
+        now = time.monotonic()
+
+        try:
+            current = scan_module_stats()
+        except OSError as err:
+            logger.warning("Could not scan modules: {}", err)
+            continue
+
+        for name, key in current.items():
+            if known.get(name) != key:
+                pending[name] = now
+
+        known = current
+
+        due = sorted(name for name, changed in pending.items() if now - changed >= quiet)
+
+        if not due:
+            continue
+
+        for name in due:
+            del pending[name]
+
+        logger.info("Detected change in {}, reloading.", ", ".join(due))
+
+        try:
+            await on_change(due)
+        except Exception as err:
+            logger.critical("Got {} while reloading {}\n{}", type(err).__name__, ", ".join(due), err)
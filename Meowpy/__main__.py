@@ -7,12 +7,23 @@ Modular discord bot that supports dynamic reload of modularized commands.
 import json
 import pathlib
 import argparse
+from io import BytesIO
 
 from discord.ext import commands
-from discord import DiscordException, Embed, Game, Intents, Member
+from discord import DiscordException, Embed, Game, Intents, Member, File
 from loguru import logger
 
-from DynamicLoader import load_command, LOADED_LIST, LOADED_FILE_HASH
+from DynamicLoader import (
+    load_command,
+    load_manifest,
+    set_module_patterns,
+    set_serial_modules,
+    watch_modules,
+    LOADED_LIST,
+    LOADED_FILE_HASH,
+    IMPORT_TIMES,
+)
+from BotComponents import instrumentation
 
 
 def assign_basic_commands(bot: commands.bot):
@@ -23,13 +34,44 @@ def assign_basic_commands(bot: commands.bot):
 
     async def first_call():
 
-        assign_expansion_commands()
+        await assign_expansion_commands()
+        start_instrumentation()
+
+        if config.get("loader_watch", False):
+            logger.info("Watching modules for changes")
+
+            bot.loop.create_task(
+                watch_modules(
+                    assign_expansion_commands,
+                    config.get("loader_watch_interval_sec", 0.2),
+                    config.get("loader_watch_quiet_sec", 0.5),
+                )
+            )
 
         activity = config["bot_activity"]
 
         if activity:
             await bot.change_presence(activity=Game(name=activity))
 
+    # --------------------------------------
+
+    def start_instrumentation():
+
+        instrumentation.slow_callback_sec = config.get("slow_callback_ms", 100) / 1000
+
+        bot.loop.create_task(instrumentation.monitor_loop_lag(config.get("loop_lag_interval_sec", 0.5)))
+
+        export_path = config.get("metrics_export_path", "")
+
+        if export_path:
+            logger.info("Exporting metrics to {}", export_path)
+
+            bot.loop.create_task(
+                instrumentation.export_prometheus(
+                    pathlib.Path(export_path), config.get("metrics_export_interval_sec", 15)
+                )
+            )
+
     # --------------------------------------
     logger.info("Adding event on_ready")
 
@@ -57,13 +99,17 @@ def assign_basic_commands(bot: commands.bot):
 
     add_failed = {}
 
-    def assign_expansion_commands():
+    async def assign_expansion_commands(names=None):
 
-        add_failed.clear()
+        # reloading only some modules keeps failures of others.
+        if names is None:
+            add_failed.clear()
 
-        loaded = load_command(bot)
+        loaded = await load_command(bot, names)
 
         for representation in loaded:
+            add_failed.pop(representation.name, None)
+
             try:
                 representation.add(bot)
             except Exception as err_:
@@ -77,13 +123,37 @@ def assign_basic_commands(bot: commands.bot):
     @bot.command(
         name="module",
         help="Shows/reload dynamically loaded commands. "
-        "Use parameter 'reload' to reload edited/newly added modules.",
+        "Use parameter 'reload' to reload edited/newly added modules. "
+        "Use 'profile <module> [seconds]' to profile module's commands and listeners.",
     )
-    async def module(context: commands.Context, action: str = "list", target: str = ""):
+    async def module(context: commands.Context, action: str = "list", target: str = "", seconds: float = 30):
 
         logger.info("called, param: {}, {}", action, target)
         member: Member = context.author
 
+        if action == "profile":
+
+            if member.id not in config["reload_whitelist"]:
+                logger.warning("Unauthorised profile call from '{}'", member.display_name)
+                return
+
+            if target not in instrumentation.registry.modules:
+                await context.reply(f"Module '{target}' has no registered handlers!")
+                return
+
+            seconds = min(max(seconds, 1), 600)
+
+            await context.reply(f"Profiling {target} for {seconds}s.")
+
+            try:
+                report = await instrumentation.profile_module(target, seconds)
+            except RuntimeError as err:
+                await context.reply(str(err))
+                return
+
+            await context.reply(file=File(BytesIO(report.encode("utf8")), filename=f"profile_{target}.txt"))
+            return
+
         if action == "reload":
 
             if member.id in config["reload_whitelist"]:
@@ -99,7 +169,7 @@ def assign_basic_commands(bot: commands.bot):
                     except (KeyError, IndexError):
                         embed.description = f"Reload fail: {target} is not found."
 
-                new, failed = assign_expansion_commands()
+                new, failed = await assign_expansion_commands()
 
                 embed.add_field(name="Newly Loaded", value="\n".join(new - failed) + "\u200b")
                 embed.add_field(name="Failed to load", value="\n".join(failed) + "\u200b")
@@ -123,6 +193,9 @@ def assign_basic_commands(bot: commands.bot):
             for key, val in LOADED_LIST.items():
                 mark = " ❌" if "Error" in val else ""
 
+                if key in IMPORT_TIMES:
+                    val = f"{val}\nImported in {IMPORT_TIMES[key] * 1000:.0f}ms"
+
                 embed.add_field(name=f"{key}{mark}", value=val, inline=False)
 
             if add_failed:
@@ -136,6 +209,49 @@ def assign_basic_commands(bot: commands.bot):
 
     # --------------------------------------
 
+    logger.info("Adding command stats")
+
+    @bot.command(
+        name="stats",
+        help="Shows event loop lag and latency of modules. "
+        "Pass module name to show it's commands and listeners instead.",
+    )
+    async def stats(context: commands.Context, target: str = ""):
+
+        logger.info("called, param: {}", target)
+
+        registry = instrumentation.registry
+        lag = registry.loop_lag
+
+        embed = Embed(title="Instrumentation" + (f" - {target}" if target else ""))
+
+        embed.add_field(
+            name="Event loop lag",
+            value=f"p50 {lag.quantile(0.5) * 1000:.1f} p99 {lag.quantile(0.99) * 1000:.1f} "
+            f"max {lag.max * 1000:.1f}ms",
+            inline=False,
+        )
+
+        if target:
+            rows = {name: stat for (module, name), stat in registry.handlers.items() if module == target}
+        else:
+            rows = registry.modules
+
+        # busiest first
+        for name, stat in sorted(rows.items(), key=lambda x: x[1].latency.total, reverse=True)[:20]:
+            embed.add_field(name=name, value=stat.summary(), inline=False)
+
+        if registry.slow:
+            text = "\n".join(
+                f"{slow.time:%H:%M:%S} {slow.module}.{slow.name} {slow.duration * 1000:.0f}ms"
+                for slow in list(registry.slow)[-5:]
+            )
+            embed.add_field(name="Slow callbacks", value=text, inline=False)
+
+        await context.reply(embed=embed)
+
+    # --------------------------------------
+
 
 if __name__ == "__main__":
 
@@ -172,6 +288,10 @@ if __name__ == "__main__":
         intents=intent,
     )
 
+    set_module_patterns(config.get("loader_patterns", {}))
+    set_serial_modules(config.get("loader_serial_modules", []))
+    load_manifest()
+
     logger.info("Assigning submodules")
 
     # log config
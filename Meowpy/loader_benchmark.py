@@ -0,0 +1,105 @@
+"""
+Measures cold and warm startup time of DynamicLoader.
+
+Each scenario runs in a fresh interpreter over a temporary copy of this directory, so caches in tree are left alone.
+Cold start has no loader manifest nor bytecode cache, warm start has both from the cold run before it.
+Warm run must take file digests from the manifest cold run wrote, benchmark fails if it re-read any file.
+
+Run from Meowpy directory:
+python loader_benchmark.py -n 5
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+ROOT = pathlib.Path(__file__).parent
+
+RUN_SCRIPT = """
+import asyncio, json, time
+
+start = time.perf_counter()
+
+import DynamicLoader
+loader = time.perf_counter()
+
+DynamicLoader.load_manifest()
+manifest = time.perf_counter()
+
+restored = dict(DynamicLoader.FILE_STATES)
+
+scripts = DynamicLoader.fetch_scripts()
+fetch = time.perf_counter()
+
+# state is replaced only when file is read and hashed again.
+rehashed = sum(1 for path, state in DynamicLoader.FILE_STATES.items() if restored.get(path) is not state)
+
+asyncio.run(DynamicLoader.load_command(None))
+load = time.perf_counter()
+
+print(json.dumps({
+    "loader": loader - start, "manifest": manifest - loader, "fetch": fetch - manifest, "import": load - fetch,
+    "total": load - start, "files": len(DynamicLoader.FILE_STATES), "restored": len(restored), "rehashed": rehashed,
+}))
+"""
+
+PHASES = ("loader", "manifest", "fetch", "import", "total")
+
+
+def run_once(work_dir: pathlib.Path) -> dict:
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    output = subprocess.run(
+        [sys.executable, "-c", RUN_SCRIPT], cwd=work_dir, env=env, capture_output=True, text=True, check=True
+    )
+
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def report(name: str, results):
+    print(name)
+
+    for key in PHASES:
+        values = [result[key] * 1000 for result in results]
+        print(f"  {key:<10} median {statistics.median(values):>8.1f}ms  min {min(values):>8.1f}ms")
+
+    print(f"  files re-read {max(result['rehashed'] for result in results)}/{results[0]['files']} at most")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", type=int, default=5, help="Runs per scenario.")
+
+    args = parser.parse_args()
+
+    cold, warm = [], []
+
+    for _ in range(args.count):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            work_dir = pathlib.Path(temp_dir).joinpath(ROOT.name)
+            shutil.copytree(ROOT, work_dir, ignore=shutil.ignore_patterns("__pycache__", "cache"))
+
+            cold.append(run_once(work_dir))
+
+            if not work_dir.joinpath("cache", "loader_manifest.json").exists():
+                sys.exit("Cold run wrote no loader manifest, warm run would measure cold start again.")
+
+            warm.append(run_once(work_dir))
+
+            if not warm[-1]["restored"] or warm[-1]["rehashed"]:
+                sys.exit(f"Warm run re-read {warm[-1]['rehashed']}/{warm[-1]['files']} files, manifest wasn't used.")
+
+    report("Cold start", cold)
+    report("Warm start", warm)
+
+
+if __name__ == "__main__":
+    main()
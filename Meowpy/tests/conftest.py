@@ -0,0 +1,6 @@
+import pathlib
+import sys
+
+
+# modules import each other through top level BotComponents package, same as when bot runs from Meowpy directory.
+sys.path.insert(0, pathlib.Path(__file__).parent.parent.as_posix())
@@ -0,0 +1,355 @@
+import asyncio
+import itertools
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import BotComponents
+import DynamicLoader
+
+
+@pytest.fixture
+def loader(tmp_path, monkeypatch):
+    monkeypatch.setattr(DynamicLoader, "LOCATION", tmp_path)
+
+    for name in ("FILE_STATES", "MODULE_PATTERNS", "MODULE_RESULTS", "IMPORT_TIMES", "LOADED_LIST"):
+        monkeypatch.setattr(DynamicLoader, name, {})
+
+    return DynamicLoader
+
+
+@pytest.fixture
+def module_dir(tmp_path):
+    path = tmp_path.joinpath("SomeModule")
+    path.mkdir()
+
+    path.joinpath("__init__.py").write_text("")
+    path.joinpath("module.py").write_text("__all__ = []\n")
+    path.joinpath("config.json").write_text("{}")
+
+    return path
+
+
+def age(path, seconds: int = 60):
+    # files modified within racy window are always re-read, push mtime out of it.
+    mtime_ns = path.stat().st_mtime_ns - seconds * 10 ** 9
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_digest_is_stable(loader, module_dir):
+    assert loader.module_digest(module_dir) == loader.module_digest(module_dir)
+
+
+def test_digest_changes_with_content(loader, module_dir):
+    before = loader.module_digest(module_dir)
+    module_dir.joinpath("module.py").write_text("__all__ = [1]\n")
+
+    assert loader.module_digest(module_dir) != before
+
+
+def test_digest_changes_with_rename(loader, module_dir):
+    before = loader.module_digest(module_dir)
+    module_dir.joinpath("module.py").rename(module_dir.joinpath("other.py"))
+
+    assert loader.module_digest(module_dir) != before
+
+
+def test_untracked_files_are_ignored(loader, module_dir):
+    before = loader.module_digest(module_dir)
+
+    module_dir.joinpath("notes.txt").write_text("hello")
+    module_dir.joinpath("cache").mkdir()
+    module_dir.joinpath("cache", "state.json").write_text("{}")
+
+    assert loader.module_digest(module_dir) == before
+
+
+def test_excluded_patterns_are_ignored(loader, module_dir):
+    loader.set_module_patterns({"SomeModule": {"include": ["*.py", "*.json"], "exclude": ["state*.json"]}})
+    before = loader.module_digest(module_dir)
+
+    module_dir.joinpath("state.json").write_text("{}")
+    assert loader.module_digest(module_dir) == before
+
+    module_dir.joinpath("data.json").write_text("{}")
+    assert loader.module_digest(module_dir) != before
+
+
+def test_unchanged_stat_skips_reading(loader, module_dir):
+    path = module_dir.joinpath("module.py")
+    age(path)
+
+    loader.module_digest(module_dir)
+    key, _ = loader.FILE_STATES[path]
+
+    # digest is trusted as long as stat matches, so planted one is returned as is.
+    loader.FILE_STATES[path] = key, b"planted"
+    entry = next(entry for entry in loader.tracked_files(module_dir) if entry.name == "module.py")
+
+    assert loader.file_digest(entry) == b"planted"
+
+
+def test_recent_file_is_read_again(loader, module_dir):
+    path = module_dir.joinpath("module.py")
+
+    loader.module_digest(module_dir)
+    key, digest = loader.FILE_STATES[path]
+
+    loader.FILE_STATES[path] = key, b"planted"
+    entry = next(entry for entry in loader.tracked_files(module_dir) if entry.name == "module.py")
+
+    assert loader.file_digest(entry) == digest
+
+
+def test_manifest_round_trip(loader, module_dir, tmp_path):
+    manifest = tmp_path.joinpath("cache", "manifest.json")
+
+    digest = loader.module_digest(module_dir)
+    loader.MODULE_RESULTS["SomeModule"] = digest, "some_command"
+    loader.IMPORT_TIMES["SomeModule"] = 0.25
+
+    files = dict(loader.FILE_STATES)
+    loader.save_manifest(manifest)
+
+    loader.FILE_STATES.clear()
+    loader.MODULE_RESULTS.clear()
+    loader.IMPORT_TIMES.clear()
+
+    loader.load_manifest(manifest)
+
+    assert loader.FILE_STATES == files
+    assert loader.MODULE_RESULTS == {"SomeModule": (digest, "some_command")}
+    assert loader.IMPORT_TIMES == {"SomeModule": 0.25}
+    assert loader.LOADED_LIST["SomeModule"] == "some_command (last run)"
+
+
+def test_manifest_skips_deleted_files(loader, module_dir, tmp_path):
+    manifest = tmp_path.joinpath("manifest.json")
+
+    loader.module_digest(module_dir)
+    module_dir.joinpath("config.json").unlink()
+
+    loader.save_manifest(manifest)
+    loader.FILE_STATES.clear()
+    loader.load_manifest(manifest)
+
+    assert sorted(path.name for path in loader.FILE_STATES) == ["__init__.py", "module.py"]
+
+
+def test_manifest_of_other_version_is_ignored(loader, module_dir, tmp_path, monkeypatch):
+    manifest = tmp_path.joinpath("manifest.json")
+
+    loader.module_digest(module_dir)
+    loader.save_manifest(manifest)
+    loader.FILE_STATES.clear()
+
+    monkeypatch.setattr(loader, "MANIFEST_VERSION", loader.MANIFEST_VERSION + 1)
+    loader.load_manifest(manifest)
+
+    assert not loader.FILE_STATES
+
+
+@pytest.mark.parametrize("content", ["", "{not json", '{"version": 1'])
+def test_broken_or_missing_manifest_is_ignored(loader, tmp_path, content):
+    manifest = tmp_path.joinpath("manifest.json")
+
+    loader.load_manifest(manifest)
+
+    manifest.write_text(content)
+    loader.load_manifest(manifest)
+
+    assert not loader.FILE_STATES
+    assert not loader.MODULE_RESULTS
+
+
+GOOD_MODULE = """
+from BotComponents import RepresentationBase
+
+
+class Hello(RepresentationBase):
+    name = "hello"
+
+    def add(self, bot):
+        bot.commands["hello"] = "real"
+
+    def unload(self, bot):
+        bot.commands.pop("hello", None)
+
+
+__all__ = [Hello()]
+"""
+
+_lazy_names = itertools.count()
+
+
+class FakeBot:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.commands = {}
+        self.invoked = []
+
+    def command(self, name, help=""):
+        def decorator(func):
+            self.commands[name] = func
+            return func
+
+        return decorator
+
+    def remove_command(self, name):
+        self.commands.pop(name, None)
+
+    async def get_context(self, message):
+        return SimpleNamespace(command=self.commands.get(message), message=message)
+
+    async def invoke(self, context):
+        self.invoked.append(context.command)
+
+
+class FakeContext:
+    def __init__(self, message):
+        self.message = message
+        self.replies = []
+
+    async def reply(self, content):
+        self.replies.append(content)
+
+
+@pytest.fixture
+def lazy_module(loader, tmp_path, monkeypatch):
+    """
+    Lazy module with broken module.py, importable as BotComponents.<name>.
+    """
+
+    for name in ("LOADED_MODULE", "LOADED_FILE_HASH", "LAZY_PENDING"):
+        monkeypatch.setattr(loader, name, {})
+
+    monkeypatch.setattr(loader, "MANIFEST_PATH", tmp_path.joinpath("cache", "manifest.json"))
+    monkeypatch.setattr(loader, "_load_lock", None)
+    monkeypatch.setattr(BotComponents, "__path__", [*BotComponents.__path__, str(tmp_path)])
+
+    name = f"LazyModule{next(_lazy_names)}"
+    path = tmp_path.joinpath(name)
+    path.mkdir()
+
+    path.joinpath("__init__.py").write_text('LAZY_COMMANDS = ["hello"]\n')
+    path.joinpath("module.py").write_text('raise RuntimeError("broken")\n')
+
+    yield path.joinpath("module.py")
+
+    for module_name in [key for key in sys.modules if key.startswith(f"BotComponents.{name}")]:
+        del sys.modules[module_name]
+
+
+async def add_stub(bot, script_path):
+    (stub,) = await DynamicLoader.load_command(bot, [script_path.parent.name])
+    stub.add(bot)
+
+    return stub
+
+
+def test_failed_lazy_import_keeps_stub_for_retry(lazy_module):
+    async def main():
+        bot = FakeBot()
+        stub = await add_stub(bot, lazy_module)
+
+        context = FakeContext("hello")
+        await bot.commands["hello"](context)
+
+        assert "RuntimeError" in context.replies[0]
+        assert DynamicLoader.LAZY_PENDING[lazy_module] is stub
+        assert bot.commands["hello"] != "real"
+
+        lazy_module.write_text(GOOD_MODULE)
+        await bot.commands["hello"](FakeContext("hello"))
+
+        assert lazy_module not in DynamicLoader.LAZY_PENDING
+        assert bot.commands["hello"] == "real"
+        assert bot.invoked == ["real"]
+
+    asyncio.run(main())
+
+
+def test_lazy_load_replaced_while_waiting_does_not_import(lazy_module):
+    lazy_module.write_text(GOOD_MODULE)
+
+    async def main():
+        bot = FakeBot()
+        stub = await add_stub(bot, lazy_module)
+
+        async with DynamicLoader.load_lock():
+            task = asyncio.ensure_future(stub.load(bot))
+            await asyncio.sleep(0)
+
+            # reload took the lock first and put new stub in place.
+            DynamicLoader.LAZY_PENDING[lazy_module] = object()
+
+        assert await task is True
+        assert lazy_module not in DynamicLoader.LOADED_MODULE
+
+    asyncio.run(main())
+
+
+def run_watcher(on_change, edits, duration: float = 0.4):
+    """
+    Runs watch_modules while applying edits, which are (delay, function) pairs, then stops it.
+    """
+
+    async def main():
+        watcher = asyncio.ensure_future(DynamicLoader.watch_modules(on_change, interval=0.01, quiet=0.1))
+        await asyncio.sleep(0.05)
+
+        for delay, edit in edits:
+            await asyncio.sleep(delay)
+            edit()
+
+        await asyncio.sleep(duration)
+        watcher.cancel()
+
+    asyncio.run(main())
+
+
+def test_watcher_debounces_burst_of_saves(loader, module_dir):
+    calls = []
+
+    async def on_change(names):
+        calls.append(names)
+
+    run_watcher(on_change, [
+        (0, lambda: module_dir.joinpath("module.py").write_text("__all__ = ['a']\n")),
+        (0.03, lambda: module_dir.joinpath("config.json").write_text('{"a": 1}')),
+        (0.03, lambda: module_dir.joinpath("module.py").write_text("__all__ = ['a', 'b']\n")),
+    ])
+
+    assert calls == [["SomeModule"]]
+
+
+def test_watcher_ignores_files_outside_module_top_level(loader, module_dir):
+    calls = []
+
+    async def on_change(names):
+        calls.append(names)
+
+    def save_cache():
+        module_dir.joinpath("cache").mkdir()
+        module_dir.joinpath("cache", "relays.json").write_text("{}")
+
+    run_watcher(on_change, [(0, save_cache)])
+
+    assert calls == []
+
+
+def test_watcher_survives_failed_reload(loader, module_dir):
+    calls = []
+
+    async def on_change(names):
+        calls.append(names)
+        raise ValueError("broken")
+
+    run_watcher(on_change, [
+        (0, lambda: module_dir.joinpath("module.py").write_text("__all__ = ['a']\n")),
+        (0.2, lambda: module_dir.joinpath("module.py").write_text("__all__ = ['b']\n")),
+    ])
+
+    assert calls == [["SomeModule"], ["SomeModule"]]
@@ -0,0 +1,80 @@
+import json
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from BotComponents.CyanServerCommands.graph_render import load_series, min_max_buckets, render
+
+
+def write_data(path, data: dict):
+    path.write_text(json.dumps({"data": data}))
+    return path
+
+
+def test_load_series_converts_missing_samples_to_nan(tmp_path):
+    series = load_series(write_data(tmp_path.joinpath("r.json"), {"viewCount": [1, None, 3]}))
+
+    assert list(series) == ["viewCount"]
+    assert np.isnan(series["viewCount"][1])
+    assert series["viewCount"][2] == 3
+
+
+def test_load_series_skips_non_numeric_series(tmp_path):
+    path = write_data(
+        tmp_path.joinpath("r.json"),
+        {
+            "viewCount": [1, 2],
+            "time": ["2024-01-01T00:00:00", "2024-01-01T00:00:01"],
+            "mixed": [None, "a"],
+            "nested": [[1, 2], [3, 4]],
+            "empty": [],
+            "scalar": 3,
+        },
+    )
+
+    assert list(load_series(path)) == ["viewCount"]
+
+
+def test_min_max_buckets_keeps_spikes():
+    series = np.zeros(10000)
+    series[1234] = 100
+    series[5678] = -100
+
+    x, mins, maxs = min_max_buckets(series, 100)
+
+    assert len(x) == len(mins) == len(maxs) == 100
+    assert maxs.max() == 100
+    assert mins.min() == -100
+
+
+def test_min_max_buckets_passes_short_series_through():
+    series = np.arange(5, dtype=np.float64)
+
+    x, mins, maxs = min_max_buckets(series, 100)
+
+    assert x[0] == 0 and x[-1] == 1
+    assert mins is series and maxs is series
+
+
+@pytest.mark.parametrize("width, height", [(200, 200), (1200, 600), (200, 10), (20, 20)])
+def test_render_many_series_at_any_size(tmp_path, width, height):
+    data = {f"series{idx}": [1, 2, None, 4] for idx in range(12)}
+    path = write_data(tmp_path.joinpath("r.json"), data)
+
+    image = Image.open(BytesIO(render(path, width, height)))
+
+    assert image.size == (width, height)
+
+
+def test_render_without_numeric_data(tmp_path):
+    path = write_data(tmp_path.joinpath("r.json"), {"time": ["a", "b"]})
+
+    assert Image.open(BytesIO(render(path, 300, 200))).size == (300, 200)
+
+
+def test_render_all_nan_series(tmp_path):
+    path = write_data(tmp_path.joinpath("r.json"), {"viewCount": [None, None]})
+
+    assert render(path, 300, 200)
@@ -0,0 +1,177 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from BotComponents import instrumentation
+from BotComponents.instrumentation import BUCKETS, Histogram, Registry, _histogram_lines
+
+
+def test_empty_histogram():
+    histogram = Histogram()
+
+    assert histogram.count == 0
+    assert histogram.quantile(0.5) == 0.0
+
+
+def test_value_on_bound_goes_to_that_bucket():
+    histogram = Histogram()
+    histogram.observe(0.01)
+
+    assert histogram.counts[BUCKETS.index(0.01)] == 1
+
+
+def test_huge_value_goes_to_inf_bucket():
+    histogram = Histogram()
+    histogram.observe(120.0)
+
+    assert histogram.counts[-1] == 1
+    assert histogram.quantile(0.99) == 120.0
+
+
+def test_count_total_max():
+    histogram = Histogram()
+
+    for value in (0.002, 0.003, 0.2, 0.004):
+        histogram.observe(value)
+
+    assert histogram.count == 4
+    assert histogram.total == pytest.approx(0.209)
+    assert histogram.max == 0.2
+
+
+def test_quantile_is_bucket_bound_capped_by_max():
+    histogram = Histogram()
+
+    for _ in range(90):
+        histogram.observe(0.003)
+
+    for _ in range(10):
+        histogram.observe(0.07)
+
+    assert histogram.quantile(0.5) == 0.005
+    assert histogram.quantile(0.9) == 0.005
+    assert histogram.quantile(0.95) == 0.07
+    assert histogram.quantile(1.0) == 0.07
+
+
+def test_prometheus_buckets_are_cumulative():
+    histogram = Histogram()
+
+    for value in (0.0005, 0.0005, 0.3, 50.0):
+        histogram.observe(value)
+
+    lines = _histogram_lines("metric", 'module="x"', histogram)
+
+    assert lines[0] == 'metric_bucket{module="x",le="0.001"} 2'
+    assert lines[len(BUCKETS) - 1] == 'metric_bucket{module="x",le="+Inf"} 4'
+    assert lines[-1] == 'metric_count{module="x"} 4'
+
+
+def test_lag_since_filters_by_time():
+    registry = Registry()
+    now = time.monotonic()
+
+    registry.recent_lag.extend(((now - 20, 0.5), (now - 5, 0.1), (now - 1, 0.2)))
+
+    assert registry.lag_since(now - 10) == [0.1, 0.2]
+
+
+def test_instrument_records_latency_blocking_and_errors():
+    async def handler(fail: bool):
+        time.sleep(0.02)
+        await asyncio.sleep(0.05)
+
+        if fail:
+            raise ValueError
+
+    wrapped = instrumentation.instrument(handler, "TestModule", "handler")
+    stats = instrumentation.registry.handlers["TestModule", "handler"]
+
+    async def main():
+        await wrapped(False)
+
+        with pytest.raises(ValueError):
+            await wrapped(True)
+
+    asyncio.run(main())
+
+    assert stats.latency.count == 2
+    assert stats.errors == 1
+
+    # sleeping in event loop is not blocking, time.sleep is.
+    assert stats.blocking.max >= 0.02
+    assert stats.latency.max - stats.blocking.max >= 0.04
+    assert instrumentation.registry.modules["TestModule"].latency.count == 2
+
+
+class FakeCog:
+    __module__ = "BotComponents.FakeComponent.module"
+    __cog_listeners__ = [("on_message", "on_message")]
+
+    def __init__(self):
+        self.command = SimpleNamespace(callback=self.ping, qualified_name="ping")
+
+    def walk_commands(self):
+        return [self.command]
+
+    async def ping(self):
+        return "pong"
+
+    async def on_message(self):
+        return "seen"
+
+
+def test_module_of_component():
+    assert instrumentation.module_of(FakeCog) == "FakeComponent"
+    assert instrumentation.module_of(SimpleNamespace) == "types"
+
+
+def test_instrument_cog_wraps_commands_and_listeners():
+    cog = FakeCog()
+    instrumentation.instrument_cog(cog)
+
+    async def main():
+        return await cog.command.callback(), await cog.on_message()
+
+    assert asyncio.run(main()) == ("pong", "seen")
+
+    handlers = instrumentation.registry.handlers
+    assert handlers["FakeComponent", "ping"].latency.count == 1
+    assert handlers["FakeComponent", "FakeCog.on_message"].latency.count == 1
+
+
+def busy_handler_body():
+    return sum(range(10000))
+
+
+def test_profile_module_reports_handler_calls():
+    async def handler():
+        busy_handler_body()
+        await asyncio.sleep(0)
+
+    wrapped = instrumentation.instrument(handler, "ProfiledModule", "handler")
+
+    async def main():
+        profiling = asyncio.ensure_future(instrumentation.profile_module("ProfiledModule", 0.1))
+        await asyncio.sleep(0)
+
+        with pytest.raises(RuntimeError):
+            await instrumentation.profile_module("ProfiledModule", 0.1)
+
+        await wrapped()
+        return await profiling
+
+    report = asyncio.run(main())
+
+    assert report.startswith("Profile of ProfiledModule for 0.1s, 1 handler call(s).")
+    assert "busy_handler_body" in report
+    assert "ProfiledModule" not in instrumentation.profilers
+
+
+def test_profile_without_calls():
+    instrumentation.registry.handler("IdleModule", "handler")
+    report = asyncio.run(instrumentation.profile_module("IdleModule", 0.01))
+
+    assert "No handler ran while profiling." in report
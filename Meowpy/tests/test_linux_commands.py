@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import pytest
+
+from BotComponents.LinuxCommands import module
+
+
+@pytest.fixture(autouse=True)
+def output_cache(monkeypatch):
+    monkeypatch.setattr(module, "_output_cache", {})
+
+
+def test_run_command_output():
+    assert asyncio.run(module.run_command("echo hello", 5)).strip() == "hello"
+
+
+def test_timeout_kills_whole_pipeline():
+    start = time.monotonic()
+    output = asyncio.run(module.run_command("sleep 5 | sleep 5", 0.2))
+
+    assert output == "Timed out after 0.2s"
+    assert time.monotonic() - start < 2
+
+
+def test_concurrent_calls_share_one_run(tmp_path):
+    counter = tmp_path.joinpath("runs")
+    command = f"echo x >> {counter}; sleep 0.1; wc -l < {counter}"
+
+    async def main():
+        return await asyncio.gather(*(module.cached_output(command, 5, 30) for _ in range(5)))
+
+    outputs = asyncio.run(main())
+
+    assert {output.strip() for output in outputs} == {"1"}
+    assert counter.read_text() == "x\n"
+
+
+def test_output_expires_after_ttl(tmp_path):
+    counter = tmp_path.joinpath("runs")
+    command = f"echo x >> {counter}; wc -l < {counter}"
+
+    async def main():
+        first = await module.cached_output(command, 5, 0)
+        second = await module.cached_output(command, 5, 0)
+        return first.strip(), second.strip()
+
+    assert asyncio.run(main()) == ("1", "2")
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from discord.utils import time_snowflake
+
+from BotComponents import message_index
+from BotComponents.BasicCommands import module
+
+
+@pytest.fixture
+def index(tmp_path):
+    opened = message_index.open_index(tmp_path.joinpath("index", "messages.db"))
+    yield opened
+    message_index.close_index()
+
+
+def test_open_index_reuses_opened_index(tmp_path, index):
+    assert message_index.open_index(index.path, 7) is index
+    assert message_index.get_index() is index
+    assert index.retention_days == 7
+
+
+def test_message_ids_filter_by_author_and_channel(index):
+    for message_id, channel_id, author_id in ((1, 10, 100), (2, 10, 200), (3, 11, 100), (4, 10, 100)):
+        index.add(1, channel_id, author_id, message_id)
+
+    assert index.message_ids(1, 100) == [(10, 4), (11, 3), (10, 1)]
+    assert index.message_ids(1, 100, channel_id=10, after=1) == [(10, 4)]
+    assert index.message_ids(1, 100, before=3) == [(10, 1)]
+
+
+def test_coverage_is_trusted_only_after_sync(index):
+    index.add(1, 10, 100, 5)
+    index.add(1, 10, 100, 9)
+    index.mark_synced(10, 3)
+
+    assert index.channel_range(10) == (3, 9)
+    assert index.coverage_start(10) == 3
+
+    index.synced.clear()
+    assert index.coverage_start(10) is None
+
+
+def test_retention_drops_old_entries(index):
+    old = time_snowflake(datetime.utcnow() - timedelta(days=10))
+    new = time_snowflake(datetime.utcnow())
+
+    index.retention_days = 5
+    index.add(1, 10, 100, old)
+    index.add(1, 10, 100, new)
+
+    assert index.apply_retention() == 1
+    assert index.message_ids(1, 100) == [(10, new)]
+
+
+class FakeChannel:
+    def __init__(self, messages):
+        self.id = 10
+        self.guild = SimpleNamespace(id=1)
+        self.messages = messages
+        self.requests = 0
+
+    async def history(self, limit, after, oldest_first):
+        assert oldest_first
+        self.requests += 1
+
+        for message in [message for message in self.messages if message.id > after.id][:limit]:
+            yield message
+
+
+def test_indexed_history_pages_from_next_indexed_message(index):
+    member = SimpleNamespace(id=100, joined_at=datetime.now() - timedelta(days=1))
+    other = SimpleNamespace(id=200)
+
+    base = time_snowflake(datetime.utcnow())
+    written = {5, 6, 7, 250}
+    messages = [SimpleNamespace(id=base + n, author=member if n in written else other) for n in range(300)]
+
+    for message in messages:
+        index.add(1, 10, message.author.id, message.id)
+
+    index.mark_synced(10, 0)
+    channel = FakeChannel(messages)
+
+    async def collect():
+        return [message async for message in module.member_chat_history_gen(channel, member)]
+
+    found = asyncio.run(collect())
+
+    assert [message.id - base for message in found] == [5, 6, 7, 250]
+    # first page covers 5..104, second one starts right at 250 instead of paging through the gap.
+    assert channel.requests == 2
@@ -0,0 +1,108 @@
+import pytest
+
+from BotComponents.LinuxCommands import proc_metrics
+
+
+@pytest.fixture
+def proc_files(monkeypatch, tmp_path):
+    """
+    Redirects parsers' open() of given absolute paths to files with given content.
+    """
+
+    files = {}
+
+    def fake_open(path, *args, **kwargs):
+        return open(files[path], *args, **kwargs)
+
+    def write(path: str, text: str):
+        files[path] = tmp_path.joinpath(path.strip("/").replace("/", "_"))
+        files[path].write_text(text)
+
+    monkeypatch.setattr(proc_metrics, "open", fake_open, raising=False)
+    return write
+
+
+MOUNTS = """\
+/dev/sda1 / ext4 rw,relatime 0 0
+proc /proc proc rw,nosuid 0 0
+tmpfs /run tmpfs rw,nosuid 0 0
+/dev/sdb1 /mnt/my\\040data xfs rw 0 0
+/dev/sda1 /var/lib/docker ext4 rw,relatime 0 0
+cgroup2 /sys/fs/cgroup cgroup2 rw 0 0
+"""
+
+
+def test_mounts_skip_virtual_and_repeated_devices(tmp_path):
+    path = tmp_path.joinpath("mounts")
+    path.write_text(MOUNTS)
+
+    assert proc_metrics.read_mounts(path.as_posix()) == ["/", "/mnt/my data"]
+
+
+def test_meminfo_in_bytes(proc_files):
+    proc_files("/proc/meminfo", "MemTotal:       16384 kB\nMemAvailable:    8192 kB\nHugePages_Total:       0\n")
+
+    assert proc_metrics.read_meminfo() == {
+        "MemTotal": 16384 * 1024, "MemAvailable": 8192 * 1024, "HugePages_Total": 0
+    }
+
+
+def test_cpu_counts_idle_and_iowait_as_not_busy(proc_files):
+    # user nice system idle iowait irq softirq steal guest guest_nice
+    proc_files("/proc/stat", "cpu  100 10 50 800 40 0 0 0 30 0\ncpu0 100 10 50 800 40 0 0 0 30 0\n")
+
+    assert proc_metrics.read_cpu() == (160, 1000)
+
+
+def test_net_dev_skips_loopback(proc_files):
+    proc_files("/proc/net/dev", (
+        "Inter-|   Receive                                                |  Transmit\n"
+        " face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets\n"
+        "    lo:  5000      10    0    0    0     0          0         0     5000      10\n"
+        "  eth0:  1000       5    0    0    0     0          0         0      300       3\n"
+        " wlan0:    20       1    0    0    0     0          0         0        4       1\n"
+    ))
+
+    assert proc_metrics.read_net_dev() == (1020, 304)
+
+
+def test_diskstats_sums_given_disks_in_bytes(proc_files):
+    proc_files("/proc/diskstats", (
+        "   8       0 sda 10 0 100 0 5 0 40 0 0 0 0\n"
+        "   8       1 sda1 10 0 100 0 5 0 40 0 0 0 0\n"
+        "   8      16 sdb 1 0 8 0 1 0 2 0 0 0 0\n"
+    ))
+
+    assert proc_metrics.read_diskstats(["sda", "sdb"]) == (108 * 512, 42 * 512)
+
+
+def test_cpu_model(proc_files):
+    proc_files("/proc/cpuinfo", "processor\t: 0\nmodel name\t: Fancy CPU @ 3.00GHz\n")
+
+    assert proc_metrics.read_cpu_model() == "Fancy CPU @ 3.00GHz"
+
+
+def test_ipv6_routes_exclude_loopback(proc_files):
+    proc_files("/proc/net/ipv6_route", "00 40 00 00 00000001 00000000 00000001 eth0\n00 80 00 00 0 0 0 lo\n")
+    proc_files("/proc/net/route", "Iface\tDestination\n" "eth0\t00000000\n" "eth0\t0000A8C0\n")
+
+    assert proc_metrics.count_routes(ipv6=True) == 1
+    assert proc_metrics.count_routes() == 2
+
+
+def make_sample(time, cpu_busy, cpu_total, net_rx):
+    return proc_metrics.Sample(time, None, None, None, None, None, cpu_busy, cpu_total, net_rx, 0, None, None, time, 0)
+
+
+def test_rates_over_window():
+    collector = proc_metrics.ProcCollector(10)
+
+    for sample in (make_sample(0, 0, 0, 0), make_sample(10, 50, 100, 1000), make_sample(20, 150, 200, 3000)):
+        collector.samples.append(sample)
+
+    rates = collector.rates(10)
+
+    assert rates["cpu"] == 100
+    assert rates["net_rx"] == 200
+    assert rates["disk_read"] is None
+    assert collector.rates(60)["net_rx"] == 150
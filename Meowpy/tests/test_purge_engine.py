@@ -0,0 +1,324 @@
+import asyncio
+import itertools
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from discord import errors
+from discord.utils import time_snowflake
+
+from BotComponents.AdminManagements import module
+from BotComponents.AdminManagements.module import PurgeEngine, PurgeIncomplete
+from BotComponents.AdminManagements.purge_jobs import PurgeJob
+
+
+TARGET = 1
+OTHER = 2
+
+NOW = datetime.utcnow()
+_seconds = itertools.count()
+
+
+class FakeMessage:
+    def __init__(self, channel, author_id: int, days: float):
+        self.channel = channel
+        self.author = SimpleNamespace(id=author_id)
+
+        # seconds offset keeps ids unique across whole guild.
+        self.created_at = NOW - timedelta(days=days, seconds=next(_seconds))
+        self.id = time_snowflake(self.created_at)
+
+    async def delete(self):
+        await asyncio.sleep(0.001)
+
+        if self.channel.delete_error:
+            raise self.channel.delete_error
+
+        self.channel.single_deletes += 1
+        self.channel.remove([self])
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.name = str(channel_id)
+        self.messages = []
+
+        self.bulk_sizes = []
+        self.single_deletes = 0
+        self.missing_once = False
+        self.delete_error = None
+
+        # history raises server error after yielding this many messages, this many times.
+        self.history_errors = 0
+        self.history_fail_after = 0
+
+    def add(self, author_id: int, days: float, count: int = 1):
+        self.messages.extend(FakeMessage(self, author_id, days) for _ in range(count))
+        self.messages.sort(key=lambda message: -message.id)
+
+    def remove(self, messages):
+        ids = {message.id for message in messages}
+        self.messages = [message for message in self.messages if message.id not in ids]
+
+    def authored(self, author_id: int):
+        return [message for message in self.messages if message.author.id == author_id]
+
+    async def history(self, after, before, **_):
+        yielded = 0
+
+        for message in list(self.messages):
+            if after.id < message.id < before.id:
+                if self.history_errors and yielded == self.history_fail_after:
+                    self.history_errors -= 1
+                    raise errors.HTTPException(SimpleNamespace(status=503, reason="Unavailable"), "try again")
+
+                await asyncio.sleep(0)
+                yielded += 1
+                yield message
+
+    async def delete_messages(self, messages):
+        if self.missing_once:
+            self.missing_once = False
+            raise errors.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Message")
+
+        await asyncio.sleep(0.001)
+        self.bulk_sizes.append(len(messages))
+        self.remove(messages)
+
+
+def make_job(**kwargs) -> PurgeJob:
+    after_id = time_snowflake(NOW - timedelta(days=30))
+    before_id = time_snowflake(NOW + timedelta(minutes=1))
+
+    return PurgeJob(0, TARGET, "target", "test", after_id, before_id, **kwargs)
+
+
+def make_engine(channels, job=None) -> PurgeEngine:
+    guild = SimpleNamespace(id=0, text_channels=channels)
+    return PurgeEngine(guild, job or make_job())
+
+
+def test_recent_messages_bulk_old_one_by_one():
+    channel = FakeChannel(10)
+    channel.add(TARGET, days=1, count=150)
+    channel.add(TARGET, days=20, count=3)
+    channel.add(OTHER, days=1, count=40)
+
+    engine = make_engine([channel])
+    asyncio.run(engine.run())
+
+    assert not channel.authored(TARGET)
+    assert len(channel.authored(OTHER)) == 40
+
+    assert channel.bulk_sizes == [100, 50]
+    assert channel.single_deletes == 3
+    assert engine.job.deleted == 153
+    assert engine.job.scanned == 193
+
+
+def test_message_past_bulk_age_is_not_bulked():
+    channel = FakeChannel(10)
+    channel.add(TARGET, days=1, count=2)
+    channel.add(TARGET, days=14, count=2)
+
+    engine = make_engine([channel])
+    asyncio.run(engine.run())
+
+    assert channel.bulk_sizes == [2]
+    assert channel.single_deletes == 2
+
+
+def test_missing_message_in_bulk_falls_back_to_single():
+    channel = FakeChannel(10)
+    channel.add(TARGET, days=1, count=5)
+    channel.missing_once = True
+
+    engine = make_engine([channel])
+    asyncio.run(engine.run())
+
+    assert not channel.messages
+    assert channel.bulk_sizes == []
+    assert channel.single_deletes == 5
+    assert engine.job.deleted == 5
+    assert engine.job.failed == 0
+
+
+def test_every_channel_is_purged():
+    channels = [FakeChannel(channel_id) for channel_id in range(10, 16)]
+
+    for channel in channels:
+        channel.add(TARGET, days=2, count=30)
+        channel.add(OTHER, days=2, count=10)
+
+    engine = make_engine(channels)
+    asyncio.run(engine.run())
+
+    assert all(not channel.authored(TARGET) for channel in channels)
+    assert all(len(channel.authored(OTHER)) == 10 for channel in channels)
+    assert engine.job.done_channels == {channel.id for channel in channels}
+
+
+def test_unexpected_delete_error_counts_as_failed():
+    channel = FakeChannel(10)
+    channel.add(TARGET, days=20, count=5)
+    channel.add(TARGET, days=1, count=3)
+    channel.delete_error = ConnectionResetError("reset by peer")
+
+    engine = make_engine([channel])
+    asyncio.run(asyncio.wait_for(engine.run(), 3))
+
+    assert channel.bulk_sizes == [3]
+    assert engine.job.deleted == 3
+    assert engine.job.failed == 5
+    assert engine.job.done_channels == {10}
+
+
+def test_stopped_worker_fails_instead_of_hanging():
+    async def dead_worker():
+        raise RuntimeError("worker crashed")
+
+    async def main():
+        worker = asyncio.ensure_future(dead_worker())
+        await PurgeEngine.wait_with(asyncio.Event().wait(), [worker])
+
+    with pytest.raises(RuntimeError, match="worker crashed"):
+        asyncio.run(asyncio.wait_for(main(), 3))
+
+
+def test_cursor_starts_at_job_range_or_saved_cursor():
+    job = make_job(cursors={"10": 12345})
+    engine = make_engine([], job)
+
+    assert engine.cursor(10) == 12345
+    assert engine.cursor(11) == job.before_id
+
+
+def test_cursor_stays_above_undeleted_requests():
+    engine = make_engine([])
+
+    engine.scan_pos[10] = 500
+    assert engine.cursor(10) == 500
+
+    # scan went further than deletes, resume must not skip queued messages.
+    engine.in_flight[10] = {1: 900, 2: 700}
+    assert engine.cursor(10) == 901
+
+
+def test_checkpoint_marks_only_drained_channels_done():
+    engine = make_engine([])
+
+    engine.scan_pos.update({10: 500, 11: 600, 12: 700})
+    engine.in_flight.update({10: {}, 11: {1: 800}})
+    engine.scan_finished.update({10, 11})
+
+    engine.checkpoint()
+
+    assert engine.job.done_channels == {10}
+    assert engine.job.cursors == {11: 801, 12: 700}
+
+
+def test_cancelled_purge_resumes_without_missing_messages():
+    channels = [FakeChannel(channel_id) for channel_id in range(10, 14)]
+
+    for channel in channels:
+        channel.add(TARGET, days=1, count=120)
+        channel.add(TARGET, days=20, count=20)
+        channel.add(OTHER, days=5, count=60)
+
+    job = make_job()
+    runs = []
+
+    async def run_for(seconds: float):
+        runs.append(seconds)
+        engine = make_engine(channels, job)
+        task = asyncio.ensure_future(engine.run())
+
+        try:
+            await asyncio.wait_for(asyncio.shield(task), seconds)
+        except asyncio.TimeoutError:
+            task.cancel()
+
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def main():
+        for _ in range(100):
+            await run_for(0.005)
+
+            if len(job.done_channels) == len(channels):
+                return
+
+    asyncio.run(main())
+
+    assert len(runs) > 1
+    assert job.done_channels == {channel.id for channel in channels}
+    assert not job.cursors
+    assert all(not channel.authored(TARGET) for channel in channels)
+    assert all(len(channel.authored(OTHER)) == 60 for channel in channels)
+
+
+def test_scan_retries_server_error_from_where_it_got():
+    channel = FakeChannel(10)
+    channel.add(TARGET, days=1, count=50)
+    channel.add(OTHER, days=1, count=50)
+    channel.history_errors = 1
+    channel.history_fail_after = 60
+
+    engine = make_engine([channel])
+    asyncio.run(engine.run())
+
+    assert not channel.authored(TARGET)
+    assert len(channel.authored(OTHER)) == 50
+    assert engine.job.done_channels == {10}
+
+
+def test_unscannable_channel_leaves_job_resumable(monkeypatch):
+    monkeypatch.setattr(module, "purge_max_retries", 1)
+
+    broken, fine = FakeChannel(10), FakeChannel(11)
+
+    for channel in (broken, fine):
+        channel.add(TARGET, days=1, count=30)
+
+    broken.history_errors = 1
+    job = make_job()
+
+    with pytest.raises(PurgeIncomplete):
+        asyncio.run(make_engine([broken, fine], job).run())
+
+    assert job.done_channels == {11}
+    assert not fine.authored(TARGET)
+    assert len(broken.authored(TARGET)) == 30
+
+    asyncio.run(make_engine([broken, fine], job).run())
+
+    assert job.done_channels == {10, 11}
+    assert not broken.authored(TARGET)
+
+
+def test_failed_scan_cancels_other_scans():
+    broken, slow = FakeChannel(10), FakeChannel(11)
+    broken.add(TARGET, days=1)
+    slow.add(OTHER, days=1, count=5000)
+
+    async def failing_history(**_):
+        raise ValueError("unexpected")
+        yield
+
+    broken.history = failing_history
+    job = make_job()
+
+    async def main():
+        with pytest.raises(ValueError):
+            await make_engine([broken, slow], job).run()
+
+        scanned = job.scanned
+        await asyncio.sleep(0.05)
+
+        assert job.scanned == scanned < 5000
+
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+import asyncio
+from types import SimpleNamespace
+
+from discord import HTTPException
+
+from BotComponents.PythonExecution.module import ThrottledReply, limit_size
+
+
+class FakeMessage:
+    def __init__(self, log, failing_edits=0):
+        self.log = log
+        self.failing_edits = failing_edits
+
+    async def edit(self, content, embed=None):
+        await asyncio.sleep(0.01)
+
+        if self.failing_edits:
+            self.failing_edits -= 1
+            raise HTTPException(SimpleNamespace(status=500, reason="Internal Server Error"), "edit failed")
+
+        self.log.append(("edit", content))
+
+
+class FakeContext:
+    def __init__(self, failing_edits=0):
+        self.log = []
+        self.failing_edits = failing_edits
+
+    async def reply(self, content, embed=None):
+        await asyncio.sleep(0.01)
+        self.log.append(("reply", content))
+
+        return FakeMessage(self.log, self.failing_edits)
+
+
+def test_limit_size_keeps_short_text():
+    assert limit_size("hello") == "hello"
+
+
+def test_limit_size_cuts_to_limit():
+    assert len(limit_size("x" * 5000)) <= 2000
+    assert len(limit_size("x" * 5000, 1500)) <= 1500
+
+
+def test_limit_size_keeps_code_block_closed():
+    assert limit_size("```" + "x" * 5000 + "```").endswith("...```")
+
+
+def test_updates_within_interval_are_coalesced():
+    async def main():
+        context = FakeContext()
+        reply = ThrottledReply(context, 0.1)
+
+        for idx in range(20):
+            await reply.update(str(idx))
+
+        await asyncio.sleep(0.2)
+        return context.log
+
+    log = asyncio.run(main())
+
+    # first update is sent right away, rest collapse into one edit with latest content.
+    assert [kind for kind, _ in log] == ["reply", "edit"]
+    assert "19" in log[-1][1]
+
+
+def test_finish_waits_for_flush_in_flight():
+    async def main():
+        context = FakeContext()
+        reply = ThrottledReply(context, 0.05)
+
+        await reply.update("first")
+        await reply.update("second")
+
+        # delayed flush is now past it's delay and editing.
+        await asyncio.sleep(0.055)
+        await reply.finish("done")
+
+        return context.log
+
+    log = asyncio.run(main())
+
+    assert [kind for kind, _ in log].count("reply") == 1
+    assert log[-1] == ("edit", "done")
+
+
+def test_finish_without_updates_replies_once():
+    async def main():
+        context = FakeContext()
+        await ThrottledReply(context, 1).finish("done")
+
+        return context.log
+
+    assert asyncio.run(main()) == [("reply", "done")]
+
+
+def test_failed_edit_does_not_stop_updates():
+    async def main():
+        context = FakeContext(failing_edits=2)
+        reply = ThrottledReply(context, 0)
+
+        for content in ("first", "second", "third", "fourth"):
+            await reply.update(content)
+
+        await reply.finish("done")
+
+        return context.log
+
+    log = asyncio.run(main())
+
+    assert log[0][0] == "reply"
+    assert [entry[1] for entry in log[1:]] == ["```\nfourth\u200b```", "done"]
+
+
+def test_failed_final_edit_is_not_raised():
+    async def main():
+        context = FakeContext(failing_edits=1)
+        reply = ThrottledReply(context, 0)
+
+        await reply.update("partial")
+        await reply.finish("done")
+
+        return context.log
+
+    assert [kind for kind, _ in asyncio.run(main())] == ["reply"]
@@ -0,0 +1,134 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from BotComponents.CyanServerCommands.record_index import RecordIndex, StreamRecord
+
+
+def write_record(record_dir, name, samples=3, png=False):
+    data = {"stream_title": f"title {name}", "interval": 1, "data": {"viewCount": list(range(samples))}}
+    record_dir.joinpath(name + ".json").write_text(json.dumps(data))
+
+    if png:
+        record_dir.joinpath(name + ".png").write_bytes(b"")
+
+
+def touch_dir(path, offset: int):
+    # mtime resolution of file system may be coarse, so make sure directory is seen as changed.
+    mtime_ns = path.stat().st_mtime_ns + offset * 10 ** 9
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def count_parses(monkeypatch):
+    calls = []
+    original = StreamRecord.from_file.__func__
+
+    def counting(cls, json_path, has_png):
+        calls.append(json_path.stem)
+        return original(cls, json_path, has_png)
+
+    monkeypatch.setattr(StreamRecord, "from_file", classmethod(counting))
+
+    return calls
+
+
+def test_refresh_lists_records_newest_first(tmp_path):
+    record_dir = tmp_path.joinpath("records")
+    record_dir.mkdir()
+
+    write_record(record_dir, "20240101_100_aaa", png=True)
+    write_record(record_dir, "20240102_200_bbb")
+    record_dir.joinpath("notes.txt").write_text("")
+
+    index = RecordIndex(record_dir, tmp_path.joinpath("index.json"))
+    index.refresh()
+
+    assert [record.video_id for record in index.records] == ["bbb", "aaa"]
+    assert [record.has_png for record in index.records] == [False, True]
+    assert index[0].title == "title 20240102_200_bbb"
+
+
+def test_restored_index_does_not_parse_records_again(tmp_path, monkeypatch):
+    write_record(tmp_path, "20240101_100_aaa")
+
+    index_path = tmp_path.joinpath("cache", "index.json")
+    RecordIndex(tmp_path, index_path).refresh()
+
+    calls = count_parses(monkeypatch)
+
+    # fresh instance, like after restart, restores from index file.
+    index = RecordIndex(tmp_path, index_path)
+    index.refresh()
+
+    assert len(index) == 1
+    assert calls == []
+
+
+def test_only_new_records_are_parsed(tmp_path, monkeypatch):
+    write_record(tmp_path, "20240101_100_aaa")
+
+    index = RecordIndex(tmp_path, tmp_path.joinpath("cache", "index.json"))
+    index.refresh()
+
+    calls = count_parses(monkeypatch)
+
+    write_record(tmp_path, "20240102_200_bbb")
+    touch_dir(tmp_path, 1)
+    index.refresh()
+
+    assert calls == ["20240102_200_bbb"]
+    assert len(index) == 2
+
+
+def test_removed_records_are_dropped(tmp_path):
+    write_record(tmp_path, "20240101_100_aaa")
+    write_record(tmp_path, "20240102_200_bbb")
+
+    index = RecordIndex(tmp_path, tmp_path.joinpath("cache", "index.json"))
+    index.refresh()
+
+    tmp_path.joinpath("20240102_200_bbb.json").unlink()
+    touch_dir(tmp_path, 1)
+    index.refresh()
+
+    assert [record.video_id for record in index.records] == ["aaa"]
+
+
+def test_broken_record_is_skipped(tmp_path):
+    write_record(tmp_path, "20240101_100_aaa")
+    tmp_path.joinpath("20240102_200_bbb.json").write_text("{")
+
+    index = RecordIndex(tmp_path, tmp_path.joinpath("cache", "index.json"))
+    index.refresh()
+
+    assert [record.video_id for record in index.records] == ["aaa"]
+
+
+def test_getitem_rereads_changed_record(tmp_path):
+    write_record(tmp_path, "20240101_100_aaa", samples=3)
+
+    index = RecordIndex(tmp_path, tmp_path.joinpath("cache", "index.json"))
+    index.refresh()
+
+    json_path = tmp_path.joinpath("20240101_100_aaa.json")
+    write_record(tmp_path, "20240101_100_aaa", samples=10)
+
+    mtime_ns = index.records[0].json_mtime_ns + 10 ** 9
+    os.utime(json_path, ns=(mtime_ns, mtime_ns))
+
+    assert index[0].samples == 10
+
+
+def test_concurrent_refresh_parses_each_record_once(tmp_path, monkeypatch):
+    for idx in range(50):
+        write_record(tmp_path, f"20240101_{idx:03}_video{idx}")
+
+    index = RecordIndex(tmp_path, tmp_path.joinpath("cache", "index.json"))
+    calls = count_parses(monkeypatch)
+
+    with ThreadPoolExecutor(4) as executor:
+        for future in [executor.submit(index.refresh) for _ in range(8)]:
+            future.result()
+
+    assert len(calls) == 50
+    assert len(index) == 50
@@ -0,0 +1,346 @@
+import asyncio
+import datetime
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from BotComponents.CyanServerCommands import youtube_api_client
+from BotComponents.CyanServerCommands.youtube_api_client import QuotaCounter, ResponseCache, STALE_FACTOR
+
+
+class Fetcher:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+
+        return self.calls
+
+
+def test_concurrent_gets_share_single_fetch():
+    async def main():
+        cache, fetch = ResponseCache(), Fetcher()
+        results = await asyncio.gather(*(cache.get(("key",), 10, fetch) for _ in range(5)))
+
+        return results, fetch.calls, cache.misses
+
+    results, calls, misses = asyncio.run(main())
+
+    assert results == [1] * 5
+    assert calls == 1
+    assert misses == 5
+
+
+def test_fresh_entry_is_served_from_cache():
+    async def main():
+        cache, fetch = ResponseCache(), Fetcher()
+
+        await cache.get(("key",), 10, fetch)
+        value = await cache.get(("key",), 10, fetch)
+
+        return value, fetch.calls, cache.hits
+
+    assert asyncio.run(main()) == (1, 1, 1)
+
+
+def test_different_keys_are_fetched_separately():
+    async def main():
+        cache, fetch = ResponseCache(), Fetcher()
+
+        await cache.get(("a",), 10, fetch)
+        await cache.get(("b",), 10, fetch)
+
+        return fetch.calls
+
+    assert asyncio.run(main()) == 2
+
+
+def test_stale_entry_is_served_while_refreshing():
+    ttl = 0.05
+
+    async def main():
+        cache, fetch = ResponseCache(), Fetcher()
+
+        await cache.get(("key",), ttl, fetch)
+        await asyncio.sleep(ttl * 1.5)
+
+        # expired but within stale window, old value comes back right away.
+        stale = await cache.get(("key",), ttl, fetch)
+
+        # let background refresh finish
+        await asyncio.sleep(0.03)
+        fresh = await cache.get(("key",), ttl, fetch)
+
+        return stale, fresh, cache.stale_hits
+
+    assert asyncio.run(main()) == (1, 2, 1)
+
+
+def test_entry_past_stale_window_is_fetched_again():
+    ttl = 0.02
+
+    async def main():
+        cache, fetch = ResponseCache(), Fetcher()
+
+        await cache.get(("key",), ttl, fetch)
+        await asyncio.sleep(ttl * STALE_FACTOR + 0.02)
+
+        return await cache.get(("key",), ttl, fetch), cache.stale_hits
+
+    assert asyncio.run(main()) == (2, 0)
+
+
+def test_zero_ttl_bypasses_cache():
+    async def main():
+        cache, fetch = ResponseCache(), Fetcher()
+
+        await cache.get(("key",), 0, fetch)
+        await cache.get(("key",), 0, fetch)
+
+        return fetch.calls
+
+    assert asyncio.run(main()) == 2
+
+
+def test_failed_fetch_is_not_cached():
+    async def main():
+        cache = ResponseCache()
+
+        async def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            await cache.get(("key",), 10, fail)
+
+        return await cache.get(("key",), 10, Fetcher())
+
+    assert asyncio.run(main()) == 1
+
+
+def test_quota_counts_method_cost():
+    counter = QuotaCounter()
+
+    counter.add("youtube.videos.list")
+    counter.add("youtube.videos.list")
+    counter.add("youtube.search.list")
+
+    assert counter.used["youtube.videos.list"] == 2
+    assert counter.used["youtube.search.list"] == 100
+    assert counter.total == 102
+
+
+def test_quota_resets_on_new_quota_day(monkeypatch):
+    counter = QuotaCounter()
+    counter.add("youtube.search.list")
+
+    tomorrow = counter.day + datetime.timedelta(days=1)
+    monkeypatch.setattr(counter, "_today", lambda: tomorrow)
+
+    assert counter.total == 0
+
+    counter.add("youtube.channels.list")
+    assert counter.total == 1
+
+
+def test_fresh_subscriber_counts_bypass_cache(monkeypatch):
+    resource = SimpleNamespace(videos=dict, channels=dict, search=dict, playlistItems=dict)
+    monkeypatch.setattr(youtube_api_client, "build_youtube_resource", lambda api_key=None: resource)
+
+    client = youtube_api_client.AsyncGoogleClient("key", workers=1)
+    calls = []
+
+    def get_subscribers_counts(*channel_ids):
+        calls.append(channel_ids)
+        return {channel_id: len(calls) for channel_id in channel_ids}
+
+    client.client.get_subscribers_counts = get_subscribers_counts
+
+    async def main():
+        cached = [await client.get_subscribers_counts("a") for _ in range(2)]
+        fresh = [await client.get_subscribers_counts("a", fresh=True) for _ in range(2)]
+
+        return cached, fresh
+
+    try:
+        cached, fresh = asyncio.run(main())
+    finally:
+        client.close()
+
+    assert cached == [{"a": 1}, {"a": 1}]
+    assert fresh == [{"a": 2}, {"a": 3}]
+
+
+def video_item(video_id: str, published_at: str = "2024-01-01T00:00:00Z") -> dict:
+    snippet = {
+        "title": f"title {video_id}",
+        "description": "",
+        "channelTitle": "channel",
+        "publishedAt": published_at,
+        "channelId": "UC" + video_id,
+        "thumbnails": {},
+    }
+
+    return {"id": video_id, "snippet": snippet, "statistics": {"viewCount": 1, "likeCount": 1}}
+
+
+class FakeRequest:
+    def __init__(self, method_id: str, response: dict):
+        self.methodId = method_id
+        self.response = response
+
+    def execute(self, http=None):
+        return self.response
+
+
+class FakeApi:
+    def __init__(self, name: str, respond):
+        self.name = name
+        self.respond = respond
+        self.calls = []
+
+    def list(self, **kwargs):
+        self.calls.append(kwargs)
+        return FakeRequest(f"youtube.{self.name}.list", self.respond(**kwargs))
+
+
+@pytest.fixture
+def youtube(monkeypatch):
+    """
+    Fake youtube resource, videos.list answers with an item per requested id.
+    """
+
+    apis = SimpleNamespace(
+        videos=FakeApi("videos", lambda id, **_: {"items": [video_item(id_) for id_ in id.split(",")]}),
+        channels=FakeApi("channels", lambda **_: {"items": []}),
+        search=FakeApi("search", lambda **_: {"items": []}),
+        playlistItems=FakeApi("playlistItems", lambda playlistId, **_: {"items": [video_item(playlistId[2:])]}),
+    )
+    resource = SimpleNamespace(**{name: (lambda api=api: api) for name, api in vars(apis).items()})
+
+    builds = []
+
+    def build(api_key=None):
+        builds.append(api_key)
+        return resource
+
+    monkeypatch.setattr(youtube_api_client, "build_youtube_resource", build)
+    monkeypatch.setattr(youtube_api_client, "build_http", lambda: None)
+    monkeypatch.setattr(youtube_api_client, "_shared_clients", {})
+
+    apis.builds = builds
+    return apis
+
+
+def test_calls_run_off_event_loop_thread(youtube):
+    client = youtube_api_client.AsyncGoogleClient("key", workers=2)
+    threads = []
+
+    def get_video_title(video_id):
+        threads.append(threading.get_ident())
+        return video_id
+
+    client.client.get_video_title = get_video_title
+
+    async def main():
+        await client.get_video_title("a")
+        return threading.get_ident()
+
+    try:
+        loop_thread = asyncio.run(main())
+    finally:
+        client.close()
+
+    assert threads and loop_thread not in threads
+
+
+def test_slow_call_times_out(youtube):
+    client = youtube_api_client.AsyncGoogleClient("key", workers=1, timeout=0.05)
+
+    def get_video_title(video_id):
+        time.sleep(0.3)
+        return video_id
+
+    client.client.get_video_title = get_video_title
+
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(client.get_video_title("a"))
+    finally:
+        client.close()
+
+
+def test_shared_client_is_reused_for_same_key(youtube):
+    first = youtube_api_client.shared_client("key", timeout=5)
+    second = youtube_api_client.shared_client("key", timeout=20, cache_ttl={"get_video_title": 1})
+
+    assert second is first
+    assert youtube.builds == ["key"]
+
+    # settings of reloaded config apply to shared client.
+    assert first.timeout == 20
+    assert first.cache_ttl["get_video_title"] == 1
+    assert first.cache_ttl["get_channel_id"] == youtube_api_client.CACHE_TTL["get_channel_id"]
+
+    first.close()
+
+
+def test_shared_client_is_rebuilt_when_key_changes(youtube, monkeypatch):
+    first = youtube_api_client.shared_client("old")
+
+    closed = []
+    monkeypatch.setattr(first, "close", lambda: closed.append(first))
+
+    second = youtube_api_client.shared_client("new")
+
+    assert second is not first
+    assert closed == [first]
+    assert youtube.builds == ["old", "new"]
+
+    second.close()
+
+
+def test_video_lookups_are_chunked_by_id_limit(youtube):
+    client = youtube_api_client.AsyncGoogleClient("key", workers=4)
+    video_ids = tuple(f"video{idx}" for idx in range(120))
+
+    try:
+        infos = asyncio.run(client.get_videos_info(*video_ids))
+    finally:
+        client.close()
+
+    assert [info.video_id for info in infos] == list(video_ids)
+    assert sorted(len(call["id"].split(",")) for call in youtube.videos.calls) == [20, 50, 50]
+    assert client.quota.total == 3
+
+
+def test_latest_videos_of_channels_fetched_together(youtube):
+    client = youtube_api_client.AsyncGoogleClient("key", workers=4)
+    channel_ids = ["UCaaa", "UCbbb", "UCccc"]
+
+    try:
+        latest = asyncio.run(client.get_latest_videos_batch(channel_ids, 1))
+    finally:
+        client.close()
+
+    assert list(latest) == channel_ids
+    assert [videos[0].video_id for videos in latest.values()] == ["aaa", "bbb", "ccc"]
+    assert len(youtube.playlistItems.calls) == 3
+
+def test_subscriber_counts_cost_one_request_per_chunk(youtube):
+    youtube.channels.respond = lambda id, **_: {
+        "items": [{"id": id_, "statistics": {"subscriberCount": str(len(id_))}} for id_ in id.split(",")]
+    }
+
+    client = youtube_api_client.GoogleClient("key")
+    channel_ids = [f"UC{idx}" for idx in range(60)]
+
+    counts = client.get_subscribers_counts(*channel_ids)
+
+    assert counts == {channel_id: len(channel_id) for channel_id in channel_ids}
+    assert len(youtube.channels.calls) == 2
+    assert client.quota.total == 2
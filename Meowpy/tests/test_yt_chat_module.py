@@ -0,0 +1,237 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from discord import Embed
+
+from BotComponents.YtChatModule import module
+
+
+def make_relay() -> module.StreamRelay:
+    return module.StreamRelay(None, "video_id", 0, None)
+
+
+@pytest.mark.parametrize("failures", [0, 1, 3])
+def test_backoff_grows_with_jitter(failures):
+    relay = make_relay()
+    relay.failures = failures
+
+    delay = module.restart_base_sec * 2 ** failures
+
+    assert delay / 2 <= relay.backoff_delay() <= delay
+
+
+@pytest.mark.parametrize("failures", [20, 1100, 10 ** 6])
+def test_backoff_is_capped_without_overflow(failures):
+    relay = make_relay()
+    relay.failures = failures
+
+    assert module.restart_cap_sec / 2 <= relay.backoff_delay() <= module.restart_cap_sec
+
+
+def test_emoji_tokens_replaced_in_one_pass():
+    substitute = module.EmojiSubstitution({":cat:": "<:cat:1>", ":dog:": "<:dog:2>"})
+
+    assert substitute("hi :cat::dog: :cat:") == "hi <:cat:1><:dog:2> <:cat:1>"
+
+
+def test_longer_emoji_token_wins_over_prefix():
+    substitute = module.EmojiSubstitution({":_cyan:": "A", ":_cyanCute:": "B"})
+
+    assert substitute(":_cyanCute: :_cyan:") == "B A"
+
+
+def test_replacement_is_not_substituted_again():
+    substitute = module.EmojiSubstitution({":a:": ":b:", ":b:": "B"})
+
+    assert substitute(":a:") == ":b:"
+
+
+def test_empty_mapping_passes_message_through():
+    assert module.EmojiSubstitution({})("hello :cat:") == "hello :cat:"
+
+
+def test_update_recompiles_only_on_change():
+    substitute = module.EmojiSubstitution({":cat:": "C"})
+    pattern = substitute.pattern
+
+    substitute.update({":cat:": "C"})
+    assert substitute.pattern is pattern
+
+    substitute.update({":cat:": "K"})
+    assert substitute("meow :cat:") == "meow K"
+
+
+def make_embed(length: int = 10, text: str = "x") -> Embed:
+    return Embed(description=(text * length)[:length])
+
+
+def drain(batcher: module.EmbedBatcher):
+    batches = []
+
+    while batcher.pending:
+        batch, _ = batcher._next_batch()
+        batches.append(batch)
+
+    return batches
+
+
+def test_batches_hold_at_most_ten_embeds():
+    batcher = module.EmbedBatcher(lambda: None, 100)
+
+    for _ in range(25):
+        batcher.put(make_embed())
+
+    assert [len(batch) for batch in drain(batcher)] == [10, 10, 5]
+
+
+def test_batches_stay_under_character_limit():
+    batcher = module.EmbedBatcher(lambda: None, 100)
+
+    for _ in range(5):
+        batcher.put(make_embed(2500))
+
+    batches = drain(batcher)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert all(sum(map(len, batch)) <= batcher.max_chars for batch in batches)
+
+
+def test_oversized_embed_is_sent_alone_instead_of_blocking():
+    batcher = module.EmbedBatcher(lambda: None, 100)
+
+    batcher.put(make_embed(7000))
+    batcher.put(make_embed())
+
+    assert [len(batch) for batch in drain(batcher)] == [1, 1]
+
+
+def test_priority_embeds_go_first():
+    batcher = module.EmbedBatcher(lambda: None, 100)
+    normal, priority = make_embed(text="n"), make_embed(text="p")
+
+    batcher.put(normal)
+    batcher.put(priority, priority=True)
+
+    assert drain(batcher) == [[priority, normal]]
+
+
+def test_backlog_over_threshold_drops_oldest_and_summarises():
+    batcher = module.EmbedBatcher(lambda: None, 5)
+    embeds = [make_embed() for _ in range(8)]
+
+    for embed in embeds:
+        batcher.put(embed)
+
+    # priority embeds are never dropped.
+    superchat = make_embed(text="$")
+    batcher.put(superchat, priority=True)
+
+    (batch,) = drain(batcher)
+
+    assert "Skipped 3" in batch[0].description
+    assert batch[1:] == [superchat, *embeds[3:]]
+    assert batcher.skipped == 3
+
+
+class FakeChannel:
+    def __init__(self, error=None):
+        self.sent = []
+        self.error = error
+
+    async def send(self, embeds):
+        if self.error:
+            raise self.error
+
+        self.sent.append(embeds)
+
+
+def test_send_batch_updates_stats():
+    channel = FakeChannel()
+    batcher = module.EmbedBatcher(lambda: channel, 100)
+
+    for _ in range(3):
+        batcher.put(make_embed())
+
+    asyncio.run(batcher.send_batch())
+
+    assert [len(embeds) for embeds in channel.sent] == [3]
+    assert (batcher.sent_messages, batcher.sent_embeds, batcher.backlog) == (1, 3, 0)
+
+
+def test_failed_send_is_not_raised():
+    channel = FakeChannel(module.HTTPException(SimpleNamespace(status=500, reason="Server Error"), "failed"))
+    batcher = module.EmbedBatcher(lambda: channel, 100)
+    batcher.put(make_embed())
+
+    asyncio.run(batcher.send_batch())
+
+    assert batcher.sent_messages == 0
+    assert not batcher.pending
+
+
+class LoggingChannel:
+    def __init__(self, channel_id, log):
+        self.channel_id = channel_id
+        self.log = log
+
+    async def send(self, embeds):
+        self.log.append((self.channel_id, len(embeds)))
+
+
+def test_scheduler_serves_channels_round_robin():
+    log = []
+    channels = {channel_id: LoggingChannel(channel_id, log) for channel_id in (1, 2)}
+    scheduler = module.DeliveryScheduler(SimpleNamespace(get_channel=channels.get), 0, 100)
+
+    async def main():
+        for _ in range(15):
+            scheduler.put(1, make_embed())
+
+        for _ in range(3):
+            scheduler.put(2, make_embed())
+
+        task = asyncio.ensure_future(scheduler.run())
+
+        while any(batcher.pending for batcher in scheduler.batchers.values()) or len(log) < 3:
+            await asyncio.sleep(0.01)
+
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(main(), 3))
+
+    # busy channel can't hold back the other one.
+    assert log == [(1, 10), (2, 3), (1, 5)]
+
+
+def test_removing_relay_drops_batcher_only_when_channel_is_unused():
+    scheduler = module.DeliveryScheduler(None, 0, 100)
+    relays = {
+        video_id: module.StreamRelay(None, video_id, channel_id, scheduler)
+        for video_id, channel_id in (("a", 1), ("b", 1), ("c", 2))
+    }
+
+    for relay in relays.values():
+        scheduler.batcher(relay.channel_id)
+
+    cog = SimpleNamespace(relays=relays, scheduler=scheduler)
+
+    module.YoutubeChatRelayCog.remove(cog, "a")
+    assert set(scheduler.batchers) == {1, 2}
+
+    module.YoutubeChatRelayCog.remove(cog, "b")
+    assert set(scheduler.batchers) == {2}
+    assert set(relays) == {"c"}
+
+
+def test_relays_are_saved_outside_watched_files(tmp_path, monkeypatch):
+    path = tmp_path.joinpath("cache", "relays.json")
+    monkeypatch.setattr(module, "relays_path", path)
+
+    relays = {
+        video_id: module.StreamRelay(None, video_id, channel_id, None) for video_id, channel_id in (("a", 1), ("b", 2))
+    }
+    module.YoutubeChatRelayCog.save_relays(SimpleNamespace(relays=relays))
+
+    assert json.loads(path.read_text()) == {"a": 1, "b": 2}